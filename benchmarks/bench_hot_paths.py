@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарки горячих путей бота с историей результатов
+
+Замеряются:
+  certificate.*  - грамота: загрузка шаблона и шрифтов (decode), отрисовка
+                   текста (draw) и кодирование (encode) для каждого формата
+  scoring.*      - подсчет баллов одной сессии и пачки сессий
+  results.*      - экран результатов show_results и возврат к нему back_to_results
+  questions.*    - ответ на вопрос handle_answer и сборка экранов вопросов
+  stats.*        - сохранение и загрузка статистики (save_stats_to_file и
+                   load_stats_from_file) на 1k/100k/1M синтетических пользователей
+  admin.*        - сборка текста /stats
+
+Обработчики вызываются с поддельными update/context, без сети. Для каждого
+замера берется медиана нескольких повторов. Результат дописывается в
+JSON-историю и сравнивается с последним прогоном без регрессий: если медиана
+какого-то замера выросла больше чем на --threshold, скрипт завершается с
+кодом 1. Сравнивать имеет смысл прогоны на одной машине.
+
+Использование:
+  python3 benchmarks/bench_hot_paths.py
+  python3 benchmarks/bench_hot_paths.py --only stats --sizes 1000,100000
+  python3 benchmarks/bench_hot_paths.py --threshold 0.1 --history /tmp/history.json
+  python3 benchmarks/bench_hot_paths.py --no-save
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_HISTORY = os.path.join(ROOT, 'benchmarks', 'history.json')
+DEFAULT_SIZES = '1000,100000,1000000'
+# Быстрые замеры повторяются в цикле, пока один повтор не займет столько секунд
+MIN_SAMPLE_TIME = 0.05
+# Записей журнала между сохранениями статистики в замере save
+STATS_JOURNAL_RECORDS = 100
+ADMIN_USER_ID = 156568560
+FIRST_USER_ID = 5000000000
+
+# Бот импортируется с временными путями статистики и логов
+WORK_DIR = tempfile.mkdtemp(prefix='bench_hot_paths_')
+os.environ.update({
+    'BOT_TOKEN': '123456:BENCHMARK',
+    'BOT_WORKERS': '1',
+    'STATS_BACKEND': 'journal',
+    'STATS_SNAPSHOT_PATH': os.path.join(WORK_DIR, 'bot_stats.json'),
+    'STATS_JOURNAL_PATH': os.path.join(WORK_DIR, 'bot_stats.journal'),
+    'STATS_DB_PATH': os.path.join(WORK_DIR, 'bot_stats.db'),
+    'LOG_DIR': os.path.join(WORK_DIR, 'logs'),
+    'LOG_LEVEL': 'WARNING',
+    'LOG_CONSOLE_LEVEL': 'CRITICAL',
+})
+os.chdir(ROOT)
+
+import bot  # noqa: E402
+from certificate import OUTPUT_FORMATS, CertificateRenderer  # noqa: E402
+from config import TEST_QUESTIONS  # noqa: E402
+from questionnaire import Questionnaire  # noqa: E402
+from scoring import LEVEL_NAMES, score_batch, score_session  # noqa: E402
+from sessions import PHASE_SIZES, TOTAL_QUESTIONS, TestSession  # noqa: E402
+from stats_store import JournalStatsStore, SQLiteStatsStore, add_hourly, empty_stats  # noqa: E402
+
+
+def summarize(samples, number: int) -> dict:
+    """Медиана, минимум и p95 одного вызова в миллисекундах"""
+    per_call = sorted(sample / number * 1000 for sample in samples)
+    return {
+        'median_ms': statistics.median(per_call),
+        'min_ms': per_call[0],
+        'p95_ms': per_call[min(len(per_call) - 1, int(len(per_call) * 0.95))],
+        'repeat': len(per_call),
+        'number': number,
+    }
+
+
+def measure(batch, repeat: int, number: int = None) -> dict:
+    """Замер batch(n) - n вызовов горячего пути; n подбирается, если не задано"""
+    if number is None:
+        number = 1
+        while True:
+            started = time.perf_counter()
+            batch(number)
+            if time.perf_counter() - started >= MIN_SAMPLE_TIME or number >= 1_000_000:
+                break
+            number *= 10
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        batch(number)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, number)
+
+
+def measure_async(loop, make_call, repeat: int) -> dict:
+    """Замер корутины: n вызовов выполняются в одном проходе цикла событий"""
+    async def run(number: int) -> None:
+        for _ in range(number):
+            await make_call()
+
+    return measure(lambda number: loop.run_until_complete(run(number)), repeat)
+
+
+def random_session(full_test: bool = True) -> TestSession:
+    """Полностью пройденная сессия со случайными ответами"""
+    answered = (1 << TOTAL_QUESTIONS) - 1 if full_test else (1 << PHASE_SIZES[0]) - 1
+    return TestSession(phase=len(PHASE_SIZES) - 1 if full_test else 0, full_test=full_test,
+                       question=PHASE_SIZES[-1] if full_test else PHASE_SIZES[0],
+                       answers=random.getrandbits(TOTAL_QUESTIONS) & answered, answered=answered)
+
+
+async def noop(*args, **kwargs):
+    return None
+
+
+def fake_update(user_id: int, data: str = None):
+    user = SimpleNamespace(id=user_id, username=f'bench{user_id}', first_name='Замер', last_name='Скорости')
+    query = SimpleNamespace(data=data, answer=noop, edit_message_text=noop)
+    message = SimpleNamespace(reply_text=noop)
+    return SimpleNamespace(effective_user=user, callback_query=query if data is not None else None, message=message)
+
+
+def fake_context():
+    update_processor = SimpleNamespace(pending=0, in_flight=0, peak_in_flight=0, concurrency_limit=256, processed=0)
+    application = SimpleNamespace(update_processor=update_processor, update_queue=asyncio.Queue())
+    return SimpleNamespace(user_data={'full_name': 'Замер Скорости'}, args=[], application=application,
+                           bot=SimpleNamespace(send_message=noop, rate_limiter=None))
+
+
+def bench_certificate(results: dict, repeat: int) -> None:
+    for output_format in OUTPUT_FORMATS:
+        results[f'certificate.decode.{output_format}'] = measure(
+            lambda number: [CertificateRenderer(output_format=output_format) for _ in range(number)],
+            max(3, repeat // 2), number=1
+        )
+        renderer = CertificateRenderer(output_format=output_format)
+        draw_times, encode_times = [], []
+        for _ in range(repeat):
+            _, draw_time, encode_time = renderer.render_timed('Замер Скоростев', 'Средний Пиздец', '18.10.2026')
+            draw_times.append(draw_time)
+            encode_times.append(encode_time)
+        results[f'certificate.draw.{output_format}'] = summarize(draw_times, 1)
+        results[f'certificate.encode.{output_format}'] = summarize(encode_times, 1)
+
+
+def bench_scoring(results: dict, repeat: int) -> None:
+    session = random_session()
+    results['scoring.score_session'] = measure(
+        lambda number: [score_session(session) for _ in range(number)], repeat
+    )
+    sessions = [random_session() for _ in range(10000)]
+    answers = [s.answers for s in sessions]
+    answered = [s.answered for s in sessions]
+    results['scoring.score_batch.10k'] = measure(lambda number: [score_batch(answers, answered) for _ in range(number)],
+                                                 repeat)
+
+
+def bench_results(results: dict, repeat: int, loop) -> None:
+    user_id = FIRST_USER_ID
+    context = fake_context()
+    update = fake_update(user_id, 'check_subscription')
+    back_update = fake_update(user_id, 'back_to_results')
+
+    async def first_show():
+        # Каждый показ - новая пройденная сессия, как после ответа на последний вопрос
+        bot.user_answers[user_id] = random_session()
+        await bot.show_results(update, context, generate_certificate_flag=False)
+
+    async def back():
+        await bot.back_to_results(back_update, context)
+
+    results['results.show_results'] = measure_async(loop, first_show, repeat)
+    bot.user_answers[user_id] = random_session()
+    results['results.back_to_results'] = measure_async(loop, back, repeat)
+    del bot.user_answers[user_id]
+
+
+def bench_questions(results: dict, repeat: int, loop) -> None:
+    user_id = FIRST_USER_ID + 1
+    context = fake_context()
+    update = fake_update(user_id, 'answer_1')
+    session = bot.user_answers[user_id] = TestSession(phase=0, full_test=True)
+
+    async def answer():
+        # Остаемся внутри фазы: ответ показывает следующий вопрос
+        if session.question >= PHASE_SIZES[session.phase] - 1:
+            session.question = 0
+        await bot.handle_answer(update, context)
+
+    results['questions.handle_answer'] = measure_async(loop, answer, repeat)
+    results['questions.build_screens'] = measure(
+        lambda number: [Questionnaire(TEST_QUESTIONS) for _ in range(number)], repeat
+    )
+    del bot.user_answers[user_id]
+
+
+def synthetic_stats(count: int) -> dict:
+    """Статистика count пользователей с прохождениями за последние 30 дней"""
+    data = empty_stats()
+    now = datetime.now()
+    users = data['users']
+    for index in range(count):
+        level = LEVEL_NAMES[random.choice(('low', 'medium', 'high'))]
+        score = random.randint(0, 30)
+        test_date = (now - timedelta(minutes=(count - index) * 43200 // count)).isoformat()
+        users[str(FIRST_USER_ID + index)] = {
+            'username': f'user{index}',
+            'first_name': 'Имя',
+            'last_name': f'Фамилия{index % 1000}',
+            'test_date': test_date,
+            'test_result': {'level': level, 'score': score,
+                            'answers': [random.getrandbits(TOTAL_QUESTIONS), (1 << TOTAL_QUESTIONS) - 1]},
+        }
+        data['test_results'][level] += 1
+        data['score_sum'] += score
+        add_hourly(data['hourly_counts'], test_date)
+    data['total_users'] = data['completed_tests'] = data['score_count'] = count
+    return data
+
+
+def record_completions(store, count: int) -> None:
+    for _ in range(count):
+        user_id = FIRST_USER_ID + random.randrange(10_000_000)
+        store.record_completion(user_id, LEVEL_NAMES['medium'], 15, {'username': 'bench', 'first_name': 'Замер'},
+                                (random.getrandbits(TOTAL_QUESTIONS), (1 << TOTAL_QUESTIONS) - 1))
+
+
+def bench_stats(results: dict, repeat: int, sizes) -> None:
+    for count in sizes:
+        label = f'{count // 1000}k' if count < 1_000_000 else f'{count // 1_000_000}m'
+        # Большие объемы повторяются реже: один повтор на 1M занимает секунды
+        size_repeat = max(3, repeat // max(1, count // 100_000))
+        data = synthetic_stats(count)
+        stats_dir = tempfile.mkdtemp(prefix='stats_', dir=WORK_DIR)
+
+        journal = JournalStatsStore(os.path.join(stats_dir, 'stats.json'), os.path.join(stats_dir, 'stats.journal'))
+        journal._write_snapshot(data, 0)
+
+        def journal_save(number: int) -> None:
+            for _ in range(number):
+                record_completions(journal, STATS_JOURNAL_RECORDS)
+                journal.compact()
+
+        def journal_load(number: int) -> None:
+            for _ in range(number):
+                JournalStatsStore(journal.snapshot_path, journal.journal_path).load()
+
+        results[f'stats.journal.save.{label}'] = measure(journal_save, size_repeat, number=1)
+        results[f'stats.journal.load.{label}'] = measure(journal_load, size_repeat, number=1)
+
+        db = SQLiteStatsStore(os.path.join(stats_dir, 'stats.db'))
+        db.load()
+        db.import_stats(data)
+
+        def sqlite_save(number: int) -> None:
+            for _ in range(number):
+                record_completions(db, STATS_JOURNAL_RECORDS)
+                db.compact()
+
+        def sqlite_load(number: int) -> None:
+            for _ in range(number):
+                store = SQLiteStatsStore(db.db_path)
+                store.load()
+                store.conn.close()
+
+        results[f'stats.sqlite.save.{label}'] = measure(sqlite_save, size_repeat, number=1)
+        results[f'stats.sqlite.load.{label}'] = measure(sqlite_load, size_repeat, number=1)
+        db.conn.close()
+        shutil.rmtree(stats_dir, ignore_errors=True)
+
+
+def bench_admin(results: dict, repeat: int, loop) -> None:
+    bot.stats_store.load()
+    record_completions(bot.stats_store, 1000)
+    update = fake_update(ADMIN_USER_ID)
+    context = fake_context()
+    results['admin.stats_command'] = measure_async(loop, lambda: bot.stats_command(update, context), repeat)
+
+
+SUITES = ('certificate', 'scoring', 'results', 'questions', 'stats', 'admin')
+
+
+def run_suites(args) -> dict:
+    random.seed(args.seed)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    selected = [suite for suite in SUITES if not args.only or any(suite.startswith(item) for item in args.only)]
+    results = {}
+    loop = asyncio.new_event_loop()
+    try:
+        for suite in selected:
+            started = time.perf_counter()
+            if suite == 'certificate':
+                bench_certificate(results, args.repeat)
+            elif suite == 'scoring':
+                bench_scoring(results, args.repeat)
+            elif suite == 'results':
+                bench_results(results, args.repeat, loop)
+            elif suite == 'questions':
+                bench_questions(results, args.repeat, loop)
+            elif suite == 'stats':
+                bench_stats(results, args.repeat, sizes)
+            elif suite == 'admin':
+                bench_admin(results, args.repeat, loop)
+            print(f"{suite}: {time.perf_counter() - started:.1f} с", file=sys.stderr)
+    finally:
+        loop.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(path: str, history: list) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def find_baseline(history: list):
+    """Последний прогон без регрессий"""
+    for entry in reversed(history):
+        if not entry.get('regressions'):
+            return entry
+    return None
+
+
+def compare(results: dict, baseline, threshold: float) -> list:
+    """Замеры, медиана которых выросла относительно базы больше чем на threshold"""
+    if baseline is None:
+        return []
+    regressions = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base and base['median_ms'] > 0 and result['median_ms'] > base['median_ms'] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def print_report(results: dict, baseline, regressions: list) -> None:
+    base_results = baseline['results'] if baseline else {}
+    print(f"{'замер':<34} {'медиана, мс':>12} {'мин, мс':>10} {'p95, мс':>10} {'база, мс':>10} {'изм.':>8}")
+    for name, result in results.items():
+        base = base_results.get(name)
+        base_text = f"{base['median_ms']:>10.4f}" if base else f"{'-':>10}"
+        change = f"{(result['median_ms'] / base['median_ms'] - 1) * 100:>+7.1f}%" if base and base['median_ms'] else ''
+        mark = '  РЕГРЕССИЯ' if name in regressions else ''
+        print(f"{name:<34} {result['median_ms']:>12.4f} {result['min_ms']:>10.4f} {result['p95_ms']:>10.4f} "
+              f"{base_text} {change:>8}{mark}")
+    if baseline:
+        print(f"\nБаза: {baseline['timestamp']} ({baseline.get('revision') or 'без ревизии'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Микробенчмарки горячих путей бота')
+    parser.add_argument('--only', action='append', default=[],
+                        help=f"Группа замеров (можно несколько): {', '.join(SUITES)}")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Числа пользователей для замеров статистики')
+    parser.add_argument('--repeat', type=int, default=15, help='Повторов каждого замера')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Допустимый рост медианы (0.2 = 20%%)')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON-файл истории прогонов')
+    parser.add_argument('--no-save', action='store_true', help='Не дописывать прогон в историю')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        results = run_suites(args)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    history = load_history(args.history)
+    baseline = find_baseline(history)
+    regressions = compare(results, baseline, args.threshold)
+    print_report(results, baseline, regressions)
+
+    if not args.no_save:
+        history.append({
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'threshold': args.threshold,
+            'results': results,
+            'regressions': regressions,
+        })
+        save_history(args.history, history)
+
+    if regressions:
+        print(f"\nРегрессии больше {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Сравнение задержки обработчика с синхронной и фоновой записью логов
+
+Обработчик имитирует /start до перевода подробных строк на DEBUG: десять строк
+лога с repr объектов. Замеряется время вызова обработчика (только логирование,
+без сети) в трех режимах:
+  sync  - RotatingFileHandler в потоке обработчика (как было)
+  queue - те же строки через очередь и фоновый поток
+  debug - очередь, подробные строки на уровне DEBUG при LOG_LEVEL=INFO
+
+При переполнении очереди (100000 записей) записи отбрасываются - это видно
+в последнем столбце.
+
+Использование: python3 benchmarks/bench_logging.py [--calls 20000] [--format text|json]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_setup import setup_logging  # noqa: E402
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.username = f'user{user_id}'
+        self.first_name = 'Иван'
+        self.last_name = 'Иванов'
+
+    def __repr__(self):
+        return f"User(id={self.id}, username={self.username!r}, first_name={self.first_name!r})"
+
+
+def handler_info(logger, user):
+    logger.info("=== ФУНКЦИЯ START ВЫЗВАНА ===")
+    logger.info(f"Update type: {type(user)}")
+    logger.info(f"Update effective user: {user}")
+    logger.info(f"User ID: {user.id}")
+    logger.info(f"Удаляем старые ответы для пользователя {user.id}")
+    logger.info("Переходим к выбору фазы")
+    logger.info("=== ФУНКЦИЯ START_PHASE_SELECTION ВЫЗВАНА ===")
+    logger.info(f"Клавиатура: {[[user.username] * 3]}")
+    logger.info("Сообщение отправлено успешно")
+    logger.info("Возвращаем состояние: 1")
+
+
+def handler_debug(logger, user):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("=== ФУНКЦИЯ START ВЫЗВАНА ===")
+        logger.debug(f"Update type: {type(user)}")
+        logger.debug(f"Update effective user: {user}")
+    logger.debug(f"User ID: {user.id}")
+    logger.debug(f"Удаляем старые ответы для пользователя {user.id}")
+    logger.debug("Переходим к выбору фазы")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("=== ФУНКЦИЯ START_PHASE_SELECTION ВЫЗВАНА ===")
+        logger.debug(f"Клавиатура: {[[user.username] * 3]}")
+    logger.debug("Сообщение отправлено успешно")
+    logger.debug("Возвращаем состояние: 1")
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run(mode: str, calls: int, log_format: str) -> dict:
+    log_dir = tempfile.mkdtemp(prefix='bench_logging_')
+    logger = logging.getLogger(f'bench.{mode}')
+    logger.propagate = False
+    pipeline = setup_logging(logger, log_dir, 'bot', 'INFO', log_format, 'CRITICAL',
+                             queue_size=0 if mode == 'sync' else 100000)
+    handler = handler_debug if mode == 'debug' else handler_info
+
+    timings = []
+    started = time.perf_counter()
+    for i in range(calls):
+        user = FakeUser(i)
+        call_started = time.perf_counter()
+        handler(logger, user)
+        timings.append(time.perf_counter() - call_started)
+    handler_time = time.perf_counter() - started
+    dropped = pipeline.stats()['dropped_overflow']
+    file_handlers = pipeline.listener.handlers if pipeline.listener else logger.handlers
+    pipeline.stop()
+    drain_time = time.perf_counter() - started
+
+    for file_handler in file_handlers:
+        file_handler.close()
+    size = sum(os.path.getsize(os.path.join(log_dir, name)) for name in os.listdir(log_dir))
+    shutil.rmtree(log_dir)
+
+    timings.sort()
+    return {
+        'mode': mode,
+        'p50_us': percentile(timings, 0.5) * 1e6,
+        'p99_us': percentile(timings, 0.99) * 1e6,
+        'max_us': timings[-1] * 1e6,
+        'handler_s': handler_time,
+        'total_s': drain_time,
+        'log_bytes': size,
+        'dropped': dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Задержка обработчика с синхронными и фоновыми логами')
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--format', choices=('text', 'json'), default='text')
+    args = parser.parse_args()
+
+    print(f"{'режим':<6} {'p50, мкс':>9} {'p99, мкс':>9} {'max, мкс':>10} {'обработчик, с':>14} "
+          f"{'с записью, с':>13} {'лог, КБ':>8} {'отброшено':>10}")
+    for mode in ('sync', 'queue', 'debug'):
+        result = run(mode, args.calls, args.format)
+        print(f"{result['mode']:<6} {result['p50_us']:>9.1f} {result['p99_us']:>9.1f} {result['max_us']:>10.1f} "
+              f"{result['handler_s']:>14.3f} {result['total_s']:>13.3f} {result['log_bytes'] / 1024:>8.0f} "
+              f"{result['dropped']:>10}")
+
+
+if __name__ == '__main__':
+    main()
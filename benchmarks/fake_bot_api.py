@@ -0,0 +1,163 @@
+"""
+Локальная замена api.telegram.org для нагрузочных тестов
+
+Отвечает на методы Bot API правдоподобными объектами, раздает обновления
+через getUpdates (long polling) и сообщает о каждом ответе бота в чат.
+Умеет добавлять задержку к ответам и возвращать 429 с retry_after.
+Бот направляется сюда через BOT_API_BASE_URL=http://127.0.0.1:<порт>.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_server import HttpResponse, HttpServer  # noqa: E402
+
+BOT_USER = {'id': 100000, 'is_bot': True, 'first_name': 'LoadTestBot', 'username': 'load_test_bot'}
+CHANNEL_CHAT = {'id': -1001000000000, 'type': 'channel', 'title': 'Канал'}
+
+# Методы, ответ на которые означает, что бот отреагировал на действие пользователя
+RESPONSE_METHODS = ('sendMessage', 'editMessageText', 'editMessageReplyMarkup')
+# Методы, ответ на которые задерживается; 429 возвращается только на отправку сообщений,
+# как у Telegram (answerCallbackQuery и служебные методы флуд-контролю не подвержены)
+DELAYED_METHODS = RESPONSE_METHODS + ('sendPhoto', 'sendDocument', 'answerCallbackQuery', 'getChatMember')
+THROTTLED_METHODS = RESPONSE_METHODS + ('sendPhoto', 'sendDocument')
+
+MULTIPART_FIELD = re.compile(rb'name="([^"]+)"\r\n\r\n(.*?)\r\n--', re.S)
+
+
+def parse_params(request) -> dict:
+    """Параметры запроса: JSON, form-urlencoded или multipart (только текстовые поля)"""
+    content_type = request.headers.get('content-type', '')
+    if not request.body:
+        return {}
+    if content_type.startswith('application/json'):
+        return json.loads(request.body)
+    if content_type.startswith('multipart/form-data'):
+        return {name.decode(): value.decode('utf-8', 'replace')
+                for name, value in MULTIPART_FIELD.findall(request.body) if len(value) < 4096}
+    return {key: values[0] for key, values in parse_qs(request.body.decode('utf-8')).items()}
+
+
+class FakeBotApi:
+    """Поддельный сервер Bot API
+
+    latency и jitter задают задержку ответа (секунды) для отправки и
+    редактирования сообщений и ответов на кнопки, error_429 - долю отправок
+    и редактирований, получающих 429 с retry_after секунд. Каждый ответ
+    бота в чат передается в on_response(chat_id, method, время).
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_429: float = 0.0, retry_after: int = 1, on_response=None):
+        self.server = HttpServer(host, port, self.handle, max_connections=2000, name='FakeBotApi')
+        self.latency = latency
+        self.jitter = jitter
+        self.error_429 = error_429
+        self.retry_after = retry_after
+        self.on_response = on_response
+        self.updates = []
+        self.update_id = 0
+        self.updates_ready = asyncio.Event()
+        self.message_id = 0
+        self.calls = {}
+        self.throttled = 0
+        self.polling = asyncio.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.server.host}:{self.server.port}'
+
+    async def start(self) -> None:
+        await self.server.start()
+
+    async def stop(self) -> None:
+        # Разбудить ждущий getUpdates, чтобы соединение закрылось без таймаута
+        self.updates_ready.set()
+        await self.server.stop()
+
+    def push_update(self, payload: dict) -> int:
+        """Постановка обновления в очередь getUpdates; возвращает update_id"""
+        self.update_id += 1
+        payload['update_id'] = self.update_id
+        self.updates.append(payload)
+        self.updates_ready.set()
+        return self.update_id
+
+    def _message(self, chat_id, text: str = '', **extra) -> dict:
+        self.message_id += 1
+        message = {
+            'message_id': self.message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private', 'first_name': 'User'},
+            'from': BOT_USER,
+        }
+        if text:
+            message['text'] = text
+        message.update(extra)
+        return message
+
+    async def _get_updates(self, params: dict):
+        self.polling.set()
+        offset = int(params.get('offset', 0) or 0)
+        timeout = float(params.get('timeout', 0) or 0)
+        limit = int(params.get('limit', 100) or 100)
+        self.updates = [update for update in self.updates if update['update_id'] >= offset]
+        if not self.updates and timeout > 0:
+            self.updates_ready.clear()
+            try:
+                await asyncio.wait_for(self.updates_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:limit]
+
+    async def handle(self, request) -> HttpResponse:
+        # Путь вида /bot<токен>/<метод>
+        method = request.path.rsplit('/', 1)[-1]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = parse_params(request)
+
+        if method in DELAYED_METHODS and (self.latency or self.jitter):
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if method in THROTTLED_METHODS and self.error_429 and random.random() < self.error_429:
+            self.throttled += 1
+            return self._reply({
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after}
+            }, 429)
+
+        if method == 'getUpdates':
+            result = await self._get_updates(params)
+        elif method == 'getMe':
+            result = BOT_USER
+        elif method == 'getChat':
+            result = CHANNEL_CHAT
+        elif method == 'getChatMember':
+            result = {'status': 'member', 'user': {'id': int(params.get('user_id', 0)), 'is_bot': False,
+                                                   'first_name': 'User'}}
+        elif method in RESPONSE_METHODS:
+            result = self._message(params.get('chat_id', 0), params.get('text', ''))
+        elif method == 'sendPhoto':
+            result = self._message(params.get('chat_id', 0), photo=[{
+                'file_id': f'photo{self.message_id}', 'file_unique_id': f'u{self.message_id}',
+                'width': 1024, 'height': 1536, 'file_size': len(request.body)
+            }])
+        else:
+            result = True
+
+        if method in RESPONSE_METHODS or method == 'sendPhoto':
+            if self.on_response is not None:
+                self.on_response(int(params.get('chat_id', 0)), method, time.perf_counter())
+        return self._reply({'ok': True, 'result': result})
+
+    @staticmethod
+    def _reply(payload: dict, status: int = 200) -> HttpResponse:
+        return HttpResponse(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
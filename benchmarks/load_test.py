@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест бота с поддельным Bot API
+
+Запускает bot.py в отдельном процессе с BOT_API_BASE_URL, указывающим на
+локальный FakeBotApi, и проводит N синтетических пользователей через полный
+диалог: /start, полный тест, ввод имени, ответы на все вопросы, проверка
+подписки, результаты и грамота. Следующее действие пользователь делает,
+когда бот ответил на предыдущее (сообщением или редактированием).
+
+В конце выводятся задержки ответа бота (p50/p95/p99), пропускная
+способность, время до грамоты и память процесса бота.
+
+Использование:
+  python3 benchmarks/load_test.py --users 200 --ramp 10
+  python3 benchmarks/load_test.py --users 100 --latency-ms 80 --jitter-ms 40 --error-429 0.02
+  python3 benchmarks/load_test.py --users 50 --env RATE_LIMIT_GLOBAL=1000 --env CONCURRENT_UPDATES=64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotApi  # noqa: E402
+from sessions import TOTAL_QUESTIONS  # noqa: E402
+
+# Первый id синтетического пользователя (id чата совпадает с id пользователя)
+FIRST_USER_ID = 7000000000
+
+
+class UserRun:
+    """Состояние одного синтетического пользователя"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.response = asyncio.Event()
+        self.certificate = asyncio.Event()
+        self.last_message_id = 0
+        self.sent_at = 0.0
+        self.latencies = []
+        self.started = 0.0
+        self.finished = 0.0
+        self.certificate_at = 0.0
+        self.error = None
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.users = {}
+        self.api = FakeBotApi(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                              error_429=args.error_429, retry_after=args.retry_after, on_response=self.on_response)
+        self.update_counter = 0
+        self.rss_samples = []
+
+    def on_response(self, chat_id: int, method: str, at: float) -> None:
+        user = self.users.get(chat_id)
+        if user is None:
+            return
+        if method == 'sendPhoto':
+            user.certificate_at = at
+            user.certificate.set()
+            return
+        if user.sent_at:
+            user.latencies.append(at - user.sent_at)
+            user.sent_at = 0.0
+        user.last_message_id = self.api.message_id
+        user.response.set()
+
+    def _sender(self, user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': 'Нагрузка', 'last_name': str(user_id),
+                'username': f'load{user_id}', 'language_code': 'ru'}
+
+    def _message(self, user: UserRun, text: str) -> dict:
+        message = {
+            'message_id': random.randint(1, 1 << 30),
+            'date': int(time.time()),
+            'chat': {'id': user.user_id, 'type': 'private', 'first_name': 'Нагрузка'},
+            'from': self._sender(user.user_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        return {'message': message}
+
+    def _callback(self, user: UserRun, data: str) -> dict:
+        self.update_counter += 1
+        return {'callback_query': {
+            'id': str(self.update_counter),
+            'from': self._sender(user.user_id),
+            'chat_instance': str(user.user_id),
+            'data': data,
+            'message': {
+                'message_id': user.last_message_id,
+                'date': int(time.time()),
+                'chat': {'id': user.user_id, 'type': 'private', 'first_name': 'Нагрузка'},
+                'from': {'id': 100000, 'is_bot': True, 'first_name': 'LoadTestBot'},
+                'text': '...',
+            },
+        }}
+
+    async def step(self, user: UserRun, payload: dict) -> None:
+        """Отправка действия пользователя и ожидание ответа бота"""
+        if self.args.think_ms:
+            await asyncio.sleep(random.uniform(0, 2 * self.args.think_ms / 1000))
+        user.response.clear()
+        user.sent_at = time.perf_counter()
+        self.api.push_update(payload)
+        await asyncio.wait_for(user.response.wait(), self.args.step_timeout)
+
+    async def run_user(self, user: UserRun, delay: float) -> None:
+        await asyncio.sleep(delay)
+        user.started = time.perf_counter()
+        try:
+            await self.step(user, self._message(user, '/start'))
+            await self.step(user, self._callback(user, 'full_test'))
+            await self.step(user, self._message(user, f'Нагрузкин Пользователь{user.user_id % 1000}'))
+            for _ in range(TOTAL_QUESTIONS):
+                await self.step(user, self._callback(user, random.choice(('answer_0', 'answer_1'))))
+            await self.step(user, self._callback(user, 'check_subscription'))
+            user.finished = time.perf_counter()
+            await asyncio.wait_for(user.certificate.wait(), self.args.step_timeout)
+        except asyncio.TimeoutError:
+            user.error = 'certificate' if user.finished else 'timeout'
+
+    async def sample_memory(self, pid: int) -> None:
+        while True:
+            rss = read_rss_kb(pid)
+            if rss:
+                self.rss_samples.append(rss)
+            await asyncio.sleep(0.5)
+
+    async def run(self) -> dict:
+        args = self.args
+        work_dir = tempfile.mkdtemp(prefix='burncheckbot_load_')
+        await self.api.start()
+
+        env = dict(os.environ)
+        env.update({
+            'BOT_TOKEN': '123456:LOADTEST',
+            'BOT_API_BASE_URL': self.api.base_url,
+            'BOT_RUN_MODE': 'polling',
+            'BOT_WORKERS': '1',
+            'DISABLE_SUBSCRIPTION_CHECK': 'false',
+            'LOG_DIR': os.path.join(work_dir, 'logs'),
+            'METRICS_PORT': '0',
+            'STATS_SNAPSHOT_PATH': os.path.join(work_dir, 'stats.json'),
+            'STATS_JOURNAL_PATH': os.path.join(work_dir, 'stats.journal'),
+            'STATS_DB_PATH': os.path.join(work_dir, 'stats.db'),
+            'PERSISTENCE_PATH': os.path.join(work_dir, 'sessions.json'),
+            'FILE_ID_CACHE_PATH': os.path.join(work_dir, 'file_id_cache.json'),
+        })
+        for item in args.env:
+            key, _, value = item.partition('=')
+            env[key] = value
+
+        bot = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(ROOT, 'bot.py'), cwd=ROOT, env=env,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=None if args.verbose else asyncio.subprocess.DEVNULL
+        )
+        sampler = None
+        try:
+            startup = time.perf_counter()
+            await asyncio.wait_for(self.api.polling.wait(), 60)
+            startup = time.perf_counter() - startup
+            idle_rss = read_rss_kb(bot.pid)
+            sampler = asyncio.create_task(self.sample_memory(bot.pid))
+
+            for index in range(args.users):
+                user_id = FIRST_USER_ID + index
+                self.users[user_id] = UserRun(user_id)
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                self.run_user(user, args.ramp * index / max(1, args.users))
+                for index, user in enumerate(self.users.values())
+            ))
+            elapsed = time.perf_counter() - started
+        finally:
+            if sampler is not None:
+                sampler.cancel()
+            if bot.returncode is None:
+                bot.send_signal(signal.SIGINT)
+                try:
+                    await asyncio.wait_for(bot.wait(), 30)
+                except asyncio.TimeoutError:
+                    bot.kill()
+            await self.api.stop()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        return self.report(elapsed, startup, idle_rss)
+
+    def report(self, elapsed: float, startup: float, idle_rss) -> dict:
+        latencies = sorted(latency for user in self.users.values() for latency in user.latencies)
+        completed = [user for user in self.users.values() if user.finished]
+        certificates = sorted(user.certificate_at - user.finished for user in completed if user.certificate_at)
+        failed = sum(1 for user in self.users.values() if user.error == 'timeout')
+        missing_certificates = sum(1 for user in self.users.values() if user.error == 'certificate')
+        return {
+            'users': len(self.users),
+            'completed': len(completed),
+            'failed': failed,
+            'missing_certificates': missing_certificates,
+            'elapsed_s': round(elapsed, 2),
+            'startup_s': round(startup, 2),
+            'actions': len(latencies),
+            'actions_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0,
+            'tests_per_min': round(len(completed) / elapsed * 60, 1) if elapsed else 0,
+            'latency_ms': percentiles(latencies),
+            'certificate_ms': percentiles(certificates),
+            'rss_idle_mb': round(idle_rss / 1024, 1) if idle_rss else None,
+            'rss_peak_mb': round(max(self.rss_samples) / 1024, 1) if self.rss_samples else None,
+            'api_calls': dict(sorted(self.api.calls.items())),
+            'throttled_429': self.api.throttled,
+        }
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {}
+    pick = lambda fraction: values[min(len(values) - 1, int(len(values) * fraction))] * 1000  # noqa: E731
+    return {'p50': round(pick(0.5), 1), 'p95': round(pick(0.95), 1), 'p99': round(pick(0.99), 1),
+            'max': round(values[-1] * 1000, 1)}
+
+
+def read_rss_kb(pid: int):
+    """Резидентная память процесса в КБ (Linux, /proc)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def print_report(result: dict) -> None:
+    print(f"Пользователей: {result['users']}, прошли тест: {result['completed']}, "
+          f"не дождались ответа: {result['failed']}, без грамоты: {result['missing_certificates']}")
+    print(f"Время прогона: {result['elapsed_s']} с (запуск бота {result['startup_s']} с)")
+    print(f"Действий: {result['actions']}, {result['actions_per_s']} в секунду; тестов в минуту: {result['tests_per_min']}")
+    latency = result['latency_ms']
+    if latency:
+        print(f"Ответ бота, мс: p50 {latency['p50']}, p95 {latency['p95']}, p99 {latency['p99']}, max {latency['max']}")
+    certificate = result['certificate_ms']
+    if certificate:
+        print(f"Грамота после результатов, мс: p50 {certificate['p50']}, p95 {certificate['p95']}, "
+              f"p99 {certificate['p99']}")
+    print(f"Память бота: в простое {result['rss_idle_mb']} МБ, пик {result['rss_peak_mb']} МБ")
+    print(f"Ответов 429: {result['throttled_429']}; вызовы API: {result['api_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест бота с поддельным Bot API')
+    parser.add_argument('--users', type=int, default=50, help='Число синтетических пользователей')
+    parser.add_argument('--ramp', type=float, default=5.0, help='За сколько секунд подключаются все пользователи')
+    parser.add_argument('--think-ms', type=float, default=0, help='Средняя пауза пользователя между действиями')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Задержка ответов Bot API')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Разброс задержки ответов Bot API')
+    parser.add_argument('--error-429', type=float, default=0, help='Доля запросов, получающих 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after в ответах 429 (секунды)')
+    parser.add_argument('--step-timeout', type=float, default=30, help='Сколько ждать ответа бота на действие')
+    parser.add_argument('--env', action='append', default=[], help='Переменная окружения бота KEY=VALUE')
+    parser.add_argument('--json', help='Сохранить результат в JSON-файл')
+    parser.add_argument('--verbose', action='store_true', help='Показывать вывод бота')
+    args = parser.parse_args()
+
+    result = asyncio.run(LoadTest(args).run())
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,105 +1,93 @@
+import asyncio
 import logging
 import os
-import json
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import datetime
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
-    Application, CommandHandler, CallbackQueryHandler, ConversationHandler, MessageHandler, filters, ContextTypes
+    Application, CommandHandler, CallbackQueryHandler, ConversationHandler, MessageHandler, TypeHandler, filters,
+    ContextTypes
 )
 from telegram.error import BadRequest
-from PIL import Image, ImageDraw, ImageFont
-import io
 
-from config import (
-    BOT_TOKEN, TEST_QUESTIONS, SCORING_KEYS, THRESHOLDS, 
-    INTERPRETATION, CHANNEL_USERNAME, CHANNEL_LINK, CHANNEL_NAME, 
-    DISABLE_SUBSCRIPTION_CHECK
-)
-
-# Настройка логирования
-import logging.handlers
-
-# Создаем директорию для логов если её нет
-log_dir = '/var/log/burncheckbot'
-os.makedirs(log_dir, exist_ok=True)
-
-# Настройка форматирования
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
+from certificate import CertificatePool, certificate_key, get_renderer
+from file_id_cache import FileIdCache
+from stats_export import EXPORT_USAGE, parse_export_args, write_export
+from stats_store import create_stats_store
+from subscription import SubscriptionChecker
+from persistence import SessionPersistence, create_session_backend
+from sessions import ResultSnapshot, SessionManager, TestSession
+from scoring import score_session
+from questionnaire import questionnaire
+from results import ResultsPages
+from webhook import run_webhook
+from update_processor import PerUserUpdateProcessor
+from rate_limiter import PriorityRateLimiter
+from workers import run_master
+from logging_setup import setup_logging
+from startup import StartupTimer
+from metrics import (
+    InstrumentedRequest, MetricsServer, instrument_conversation, instrument_handler, registry, timed
 )
 
-# Создаем логгер
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-# Очищаем существующие обработчики
-logger.handlers.clear()
-
-# Файловый обработчик для всех логов
-file_handler = logging.handlers.RotatingFileHandler(
-    f'{log_dir}/bot.log',
-    maxBytes=10*1024*1024,  # 10MB
-    backupCount=5,
-    encoding='utf-8'
-)
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
-
-# Файловый обработчик только для ошибок
-error_handler = logging.handlers.RotatingFileHandler(
-    f'{log_dir}/bot_errors.log',
-    maxBytes=5*1024*1024,  # 5MB
-    backupCount=3,
-    encoding='utf-8'
+from config import (
+    BOT_TOKEN, TEST_QUESTIONS, 
+    CHANNEL_USERNAME, CHANNEL_LINK, CHANNEL_NAME, 
+    DISABLE_SUBSCRIPTION_CHECK, CERTIFICATE_WORKERS, CERTIFICATE_QUEUE_SIZE,
+    FILE_ID_CACHE_PATH, FILE_ID_CACHE_SIZE, FILE_ID_CACHE_SAVE_INTERVAL,
+    STATS_BACKEND, STATS_SNAPSHOT_PATH, STATS_JOURNAL_PATH, STATS_DB_PATH,
+    STATS_FLUSH_INTERVAL, STATS_COMPACT_INTERVAL, SUBSCRIPTION_CACHE_TTL, SUBSCRIPTION_NEGATIVE_TTL,
+    PERSISTENCE_BACKEND, PERSISTENCE_PATH, PERSISTENCE_INTERVAL,
+    SESSION_IDLE_TTL, SESSION_MAX_COUNT, SESSION_SWEEP_INTERVAL, RESULTS_CACHE_SIZE, BOT_RUN_MODE, CONCURRENT_UPDATES,
+    RATE_LIMIT_GLOBAL, RATE_LIMIT_PER_CHAT, RATE_LIMIT_CHAT_BURST, RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_EDIT_PER_CHAT,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS,
+    BOT_WORKERS, BOT_WORKER_INDEX, WORKER_BASE_PORT,
+    LOG_DIR, LOG_LEVEL, LOG_FORMAT, LOG_CONSOLE_LEVEL, LOG_QUEUE_SIZE, LOG_DEBUG_SAMPLE, LOG_DEBUG_RATE_LIMIT,
+    METRICS_LISTEN, METRICS_PORT, BOT_API_BASE_URL
 )
-error_handler.setLevel(logging.ERROR)
-error_handler.setFormatter(formatter)
-logger.addHandler(error_handler)
-
-# Консольный обработчик для отладки
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
 
-# Логируем запуск
-logger.info("🤖 Бот запускается...")
-logger.info(f"Версия: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+# Модули бота пишут в дочерние логгеры burncheckbot.*; обработчики логов
+# настраиваются в main(), импорт модуля не создает файлов и каталогов
+logger = logging.getLogger('burncheckbot')
+log_pipeline = None
+
+# Фазы запуска и фоновая подготовка статистики и грамот
+startup = StartupTimer()
+
+def configure_logging():
+    """Запись логов на диск в фоновом потоке"""
+    global log_pipeline
+    # У каждого процесса бота свои файлы логов: ротация не рассчитана на несколько писателей
+    log_name = 'bot' if BOT_WORKER_INDEX is None else f'bot.worker{BOT_WORKER_INDEX}'
+    log_pipeline = setup_logging(
+        logger, LOG_DIR, log_name, LOG_LEVEL, LOG_FORMAT, LOG_CONSOLE_LEVEL, LOG_QUEUE_SIZE,
+        LOG_DEBUG_SAMPLE, LOG_DEBUG_RATE_LIMIT, BOT_WORKER_INDEX
+    )
 
 # Состояния разговора
 ASK_NAME, CHOOSING_PHASE, ANSWERING_QUESTIONS, CHECKING_SUBSCRIPTION, SHOWING_RESULTS = range(5)
+STATE_NAMES = {
+    ASK_NAME: 'ASK_NAME',
+    CHOOSING_PHASE: 'CHOOSING_PHASE',
+    ANSWERING_QUESTIONS: 'ANSWERING_QUESTIONS',
+    CHECKING_SUBSCRIPTION: 'CHECKING_SUBSCRIPTION',
+    SHOWING_RESULTS: 'SHOWING_RESULTS'
+}
 
-# Хранилище ответов пользователей
-user_answers = {}
+# Хранилище ответов пользователей: неактивные сессии удаляются, число сессий ограничено
+user_answers = SessionManager(SESSION_IDLE_TTL, SESSION_MAX_COUNT)
 
-# Хранилище статистики
-stats_data = {
-    'total_users': 0,
-    'completed_tests': 0,
-    'test_results': defaultdict(int),  # Уровни выгорания
-    'users': {}  # Пользователи с их результатами тестов
-}
+# Сообщение для пользователя, чья сессия была удалена из памяти
+SESSION_EXPIRED_TEXT = "⌛ Сессия теста истекла. Пожалуйста, начните тест заново с /start."
+
+# Хранилище статистики: журнал со снимком stats.json или база SQLite
+stats_store = create_stats_store(STATS_BACKEND, STATS_SNAPSHOT_PATH, STATS_JOURNAL_PATH, STATS_DB_PATH)
 
 def save_stats_to_file():
-    """Сохранение статистики в JSON файл"""
+    """Сохранение статистики: сброс буфера и свертка журнала (или WAL базы)"""
     try:
-        # Конвертируем defaultdict в обычные dict для JSON
-        stats_to_save = {
-            'total_users': stats_data['total_users'],
-            'completed_tests': stats_data['completed_tests'],
-            'test_results': dict(stats_data['test_results']),
-            'users': stats_data['users'],
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open('stats.json', 'w', encoding='utf-8') as f:
-            json.dump(stats_to_save, f, ensure_ascii=False, indent=2, default=str)
-        
-        logger.info("Статистика сохранена в файл stats.json")
+        stats_store.compact()
     except Exception as e:
         logger.error(f"Ошибка при сохранении статистики: {e}")
 
@@ -113,62 +101,41 @@ def parse_datetime_string(dt_string):
         return datetime.now()
 
 def load_stats_from_file():
-    """Загрузка статистики из JSON файла"""
-    try:
-        with open('stats.json', 'r', encoding='utf-8') as f:
-            loaded_data = json.load(f)
-        
-        # Восстанавливаем структуру данных
-        stats_data['total_users'] = loaded_data.get('total_users', 0)
-        stats_data['completed_tests'] = loaded_data.get('completed_tests', 0)
-        stats_data['test_results'] = defaultdict(int, loaded_data.get('test_results', {}))
-        stats_data['users'] = loaded_data.get('users', {})
-        
-        logger.info("Статистика загружена из файла stats.json")
-    except FileNotFoundError:
-        logger.info("Файл stats.json не найден, используется пустая статистика")
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке статистики: {e}")
+    """Загрузка статистики (снимок и журнал либо открытие базы)"""
+    stats_store.load()
 
-# Загружаем статистику при запуске
-load_stats_from_file()
+async def stats_ready() -> None:
+    """Ожидание фоновой загрузки статистики перед записью или чтением"""
+    await startup.ready('stats')
 
 # ID администратора (ваш ID)
 ADMIN_ID = 156568560  # Замените на ваш ID
 
 def update_stats(user_id: int, action: str, data: dict = None, user_info: dict = None):
     """Обновление статистики"""
-    user_id_str = str(user_id)
-    
     # Если это завершение теста, сохраняем результат
     if action == 'test_completed' and data:
-        stats_data['completed_tests'] += 1
-        level = data.get('level', 'unknown')
-        stats_data['test_results'][level] += 1
-        
-        # Сохраняем информацию о пользователе и результате теста
-        if user_id_str not in stats_data['users']:
-            stats_data['users'][user_id_str] = {
-                'username': user_info.get('username') if user_info else None,
-                'first_name': user_info.get('first_name') if user_info else None,
-                'last_name': user_info.get('last_name') if user_info else None,
-                'test_date': datetime.now().isoformat(),
-                'test_result': {
-                    'level': level,
-                    'score': data.get('total_score', 0)
-                }
-            }
-            stats_data['total_users'] = len(stats_data['users'])
-        else:
-            # Обновляем результат теста
-            stats_data['users'][user_id_str]['test_result'] = {
-                'level': level,
-                'score': data.get('total_score', 0)
-            }
-            stats_data['users'][user_id_str]['test_date'] = datetime.now().isoformat()
-        
-        # Сохраняем статистику в файл
-        save_stats_to_file()
+        # Запись попадает в журнал, на диск он сбрасывается пакетами
+        stats_store.record_completion(
+            user_id,
+            data.get('level', 'unknown'),
+            data.get('total_score', 0),
+            user_info,
+            data.get('answers')
+        )
+
+async def flush_stats(context: ContextTypes.DEFAULT_TYPE = None) -> None:
+    """Сброс журнала статистики на диск (вне цикла событий)"""
+    await stats_ready()
+    try:
+        await asyncio.to_thread(stats_store.flush)
+    except Exception as e:
+        logger.error(f"Ошибка при записи журнала статистики: {e}")
+
+async def compact_stats(context: ContextTypes.DEFAULT_TYPE = None) -> None:
+    """Свертка журнала статистики в stats.json (вне цикла событий)"""
+    await stats_ready()
+    await asyncio.to_thread(save_stats_to_file)
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Команда статистики (только для администратора)"""
@@ -179,28 +146,55 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.reply_text("❌ У вас нет доступа к этой команде.")
         return
     
-    # Получаем статистику за последние 7 дней
-    today = datetime.now()
-    week_ago = today - timedelta(days=7)
-    
+    await stats_ready()
     stats_text = "📊 *Общая статистика бота*\n\n"
     
     # Общая статистика
-    total_users = len(stats_data['users'])
-    completed_tests = stats_data['completed_tests']
+    summary = await stats_store.summary()
+    total_users = summary['total_users']
+    completed_tests = summary['completed_tests']
     
     stats_text += f"🎯 *Общие показатели:*\n"
     stats_text += f"• Уникальных пользователей: {total_users}\n"
     stats_text += f"• Завершенных тестов: {completed_tests}\n"
-    
-
+    if summary['score_count'] > 0:
+        stats_text += f"• Средний балл теста: {summary['score_sum'] / summary['score_count']:.1f}/30\n"
+    
+    # Сессии в памяти и число вытесненных сессий
+    stats_text += f"\n🧠 *Сессии в памяти:* {len(user_answers)} (лимит {user_answers.max_sessions})\n"
+    stats_text += f"• Удалено по неактивности: {user_answers.evicted_idle}\n"
+    stats_text += f"• Вытеснено при превышении лимита: {user_answers.evicted_capacity}\n"
+    
+    # Очередь обновлений и обработчики в работе
+    update_processor = context.application.update_processor
+    queue_depth = context.application.update_queue.qsize() + update_processor.pending
+    stats_text += f"\n⚙️ *Обработка обновлений:*\n"
+    stats_text += f"• В очереди: {queue_depth}\n"
+    stats_text += f"• В работе: {update_processor.in_flight} (пик {update_processor.peak_in_flight}, лимит {update_processor.concurrency_limit})\n"
+    stats_text += f"• Обработано: {update_processor.processed}, отброшено нажатий: {update_processor.dropped}\n"
+    
+    # Очереди исходящих запросов к Telegram
+    rate_limiter = context.bot.rate_limiter
+    if rate_limiter is not None:
+        queues = rate_limiter.queue_lengths()
+        stats_text += f"\n📤 *Исходящие запросы:*\n"
+        stats_text += f"• В очереди: срочные {queues['interactive']}, сообщения {queues['message']}, "
+        stats_text += f"файлы {queues['bulk']}, ожидают чата {queues['per_chat']}\n"
+        stats_text += f"• Отправляются: {rate_limiter.in_flight}, повторов: {rate_limiter.retries}, 429: {rate_limiter.flood_waits}\n"
+    
+    # Прохождения за последние 24 часа, 7 и 30 дней
+    windows = summary['windows']
+    stats_text += f"\n🕒 *Прохождения за период:*\n"
+    stats_text += f"• За 24 часа: {windows['24h']}\n"
+    stats_text += f"• За 7 дней: {windows['7d']}\n"
+    stats_text += f"• За 30 дней: {windows['30d']}\n"
     
     # Средние показатели выгорания
-    if stats_data['test_results']:
+    if summary['test_results']:
         stats_text += "\n🔥 *Результаты тестов:*\n"
         
         # Подсчитываем общую статистику по уровням
-        total_tests = sum(stats_data['test_results'].values())
+        total_tests = sum(summary['test_results'].values())
         level_scores = {
             "Маленький Пиздец": 1,
             "Средний Пиздец": 2, 
@@ -208,7 +202,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         }
         
         total_score = 0
-        for level, count in stats_data['test_results'].items():
+        for level, count in summary['test_results'].items():
             score = level_scores.get(level, 0)
             total_score += score * count
             percentage = (count / total_tests) * 100 if total_tests > 0 else 0
@@ -229,17 +223,12 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     
     # Информация о пользователях
     stats_text += "\n👥 *Последние пользователи:*\n"
-    recent_users = []
-    for user_id, user_data in stats_data['users'].items():
-        if user_data.get('test_date'):
-            # Убеждаемся, что test_date - это datetime объект
-            test_date = parse_datetime_string(user_data['test_date'])
-            recent_users.append((test_date, user_id, user_data))
+    # Последние 10 прохождений (новые сверху) из буфера, без сортировки всех пользователей
+    recent_users = await stats_store.recent_users(10)
     
-    # Сортируем по времени прохождения теста (новые сверху)
-    recent_users.sort(key=lambda x: x[0], reverse=True)
-    
-    for i, (test_date, user_id, user_data) in enumerate(recent_users[:10]):  # Показываем последние 10
+    for user_id, user_data in recent_users:
+        # Убеждаемся, что test_date - это datetime объект
+        test_date = parse_datetime_string(user_data['test_date'])
         username = user_data.get('username', 'Нет username')
         first_name = user_data.get('first_name', '')
         last_name = user_data.get('last_name', '')
@@ -265,7 +254,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.reply_text(stats_text_plain)
 
 async def stats_json_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Команда для получения JSON файла со статистикой (только для администратора)"""
+    """Команда выгрузки прохождений в NDJSON/CSV с фильтрами (только для администратора)"""
     user_id = update.effective_user.id
     
     # Проверяем, является ли пользователь администратором
@@ -274,22 +263,34 @@ async def stats_json_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     try:
-        # Сохраняем текущую статистику в файл
-        save_stats_to_file()
+        export_filter = parse_export_args(context.args or [])
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\n\n{EXPORT_USAGE}")
+        return
+    
+    await stats_ready()
+    export_path = None
+    try:
+        # Записи потоково пишутся во временный файл вне цикла событий
+        export_path, count = await asyncio.to_thread(
+            write_export, stats_store.iter_records(export_filter), export_filter
+        )
         
-        # Отправляем JSON файл
-        with open('stats.json', 'rb') as f:
+        with open(export_path, 'rb') as f:
             await update.message.reply_document(
                 document=f,
-                filename=f'stats_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json',
-                caption="📊 JSON файл со статистикой бота"
+                filename=f'stats_{datetime.now().strftime("%Y%m%d_%H%M%S")}{export_filter.filename_suffix}',
+                caption=f"📊 Выгрузка статистики бота: {count} записей"
             )
         
-        logger.info(f"Администратор {user_id} скачал JSON статистику")
+        logger.info(f"Администратор {user_id} скачал статистику ({count} записей)")
         
     except Exception as e:
-        logger.error(f"Ошибка при отправке JSON статистики: {e}")
-        await update.message.reply_text("❌ Ошибка при создании JSON файла.")
+        logger.error(f"Ошибка при выгрузке статистики: {e}")
+        await update.message.reply_text("❌ Ошибка при создании файла статистики.")
+    finally:
+        if export_path:
+            os.remove(export_path)
 
 async def user_info_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Команда для получения информации о пользователе (только для администратора)"""
@@ -312,7 +313,8 @@ async def user_info_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         target_user_id = int(context.args[0])
         
         # Получаем информацию о пользователе
-        user_data = stats_data['users'].get(str(target_user_id))
+        await stats_ready()
+        user_data = await stats_store.get_user(target_user_id)
         
         if not user_data:
             await update.message.reply_text(f"❌ Пользователь {target_user_id} не найден в статистике.")
@@ -353,6 +355,10 @@ async def user_info_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         logger.error(f"Ошибка при получении информации о пользователе: {e}")
         await update.message.reply_text("❌ Ошибка при получении информации о пользователе.")
 
+# Проверка подписки с кэшем статусов пользователей
+subscription_checker = SubscriptionChecker(CHANNEL_USERNAME, SUBSCRIPTION_CACHE_TTL, SUBSCRIPTION_NEGATIVE_TTL)
+
+@timed
 async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Проверка подписки пользователя на канал"""
     # Если проверка отключена, возвращаем True
@@ -360,48 +366,7 @@ async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return True
         
     try:
-        user_id = update.effective_user.id
-        
-        # Убираем @ если есть в начале
-        channel_username = CHANNEL_USERNAME.lstrip('@')
-        
-        logger.info(f"Проверяем подписку пользователя {user_id} в канале {channel_username}")
-        
-        # Пробуем разные варианты проверки
-        try:
-            # Сначала пробуем с @
-            logger.info(f"Пробуем проверить с @{channel_username}")
-            chat_member = await context.bot.get_chat_member(chat_id=f"@{channel_username}", user_id=user_id)
-            logger.info(f"Статус пользователя: {chat_member.status}")
-            return chat_member.status in ['member', 'administrator', 'creator']
-        except Exception as e1:
-            logger.warning(f"Ошибка при проверке с @: {e1}")
-            try:
-                # Пробуем без @
-                logger.info(f"Пробуем проверить без @: {channel_username}")
-                chat_member = await context.bot.get_chat_member(chat_id=channel_username, user_id=user_id)
-                logger.info(f"Статус пользователя: {chat_member.status}")
-                return chat_member.status in ['member', 'administrator', 'creator']
-            except Exception as e2:
-                logger.warning(f"Ошибка при проверке без @: {e2}")
-                # Пробуем с числовым ID канала (если есть)
-                try:
-                    # Пробуем получить информацию о канале
-                    chat_info = await context.bot.get_chat(f"@{channel_username}")
-                    logger.info(f"Информация о канале: {chat_info.id}")
-                    chat_member = await context.bot.get_chat_member(chat_id=chat_info.id, user_id=user_id)
-                    logger.info(f"Статус пользователя: {chat_member.status}")
-                    return chat_member.status in ['member', 'administrator', 'creator']
-                except Exception as e3:
-                    logger.warning(f"Ошибка при проверке по ID канала: {e3}")
-                    logger.warning(f"Не удалось проверить подписку для пользователя {user_id} в канале {channel_username}")
-                    logger.warning(f"Возможные причины:")
-                    logger.warning(f"1. Бот не добавлен в канал как администратор")
-                    logger.warning(f"2. Неправильный username канала: {channel_username}")
-                    logger.warning(f"3. Канал не существует или приватный")
-                    logger.warning(f"4. У бота нет прав на просмотр участников")
-                    return True  # Временно разрешаем всем для тестирования
-                
+        return await subscription_checker.is_subscribed(context.bot, update.effective_user.id)
     except Exception as e:
         logger.error(f"Общая ошибка при проверке подписки: {e}")
         return True  # Временно разрешаем всем для тестирования
@@ -545,13 +510,15 @@ async def handle_subscription_check(update: Update, context: ContextTypes.DEFAUL
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Начало тестирования - приветствие и выбор фазы"""
-    logger.info("=== ФУНКЦИЯ START ВЫЗВАНА ===")
-    logger.info(f"Update type: {type(update)}")
-    logger.info(f"Update message: {update.message}")
-    logger.info(f"Update effective user: {update.effective_user}")
+    # Подробности обновления пишутся только при LOG_LEVEL=DEBUG (и прореживаются)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("=== ФУНКЦИЯ START ВЫЗВАНА ===")
+        logger.debug(f"Update type: {type(update)}")
+        logger.debug(f"Update message: {update.message}")
+        logger.debug(f"Update effective user: {update.effective_user}")
     
     user_id = update.effective_user.id
-    logger.info(f"User ID: {user_id}")
+    logger.debug(f"User ID: {user_id}")
     
     # Обновляем статистику
     user_info = {
@@ -563,18 +530,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     
     # Очищаем предыдущие ответы и данные пользователя
     if user_id in user_answers:
-        logger.info(f"Удаляем старые ответы для пользователя {user_id}")
+        logger.debug(f"Удаляем старые ответы для пользователя {user_id}")
         del user_answers[user_id]
     
     # Очищаем сохраненные данные пользователя
     if 'full_name' in context.user_data:
-        logger.info("Удаляем сохраненное имя")
+        logger.debug("Удаляем сохраненное имя")
         del context.user_data['full_name']
     if 'selected_test' in context.user_data:
-        logger.info("Удаляем сохраненный выбор теста")
+        logger.debug("Удаляем сохраненный выбор теста")
         del context.user_data['selected_test']
     
-    logger.info("Переходим к выбору фазы")
+    logger.debug("Переходим к выбору фазы")
     # Сразу показываем выбор фазы
     return await start_phase_selection(update, context)
 
@@ -596,22 +563,12 @@ async def ask_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         
         if selected_test == "full_test":
             # Инициализируем ответы для полного теста
-            user_answers[user_id] = {
-                "current_phase": 0,
-                "current_question": 0,
-                "answers": {},
-                "full_test": True
-            }
+            user_answers[user_id] = TestSession(phase=0, full_test=True)
             return await start_questions(update, context)
         else:
             # Тестирование одной фазы
             phase_index = int(selected_test.split("_")[1])
-            user_answers[user_id] = {
-                "current_phase": phase_index,
-                "current_question": 0,
-                "answers": {},
-                "full_test": False
-            }
+            user_answers[user_id] = TestSession(phase=phase_index, full_test=False)
             return await start_questions(update, context)
     else:
         # Если нет сохраненного выбора, показываем выбор фазы
@@ -619,10 +576,11 @@ async def ask_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def start_phase_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработка выбора фазы тестирования или перехода к фазам после ввода имени"""
-    logger.info("=== ФУНКЦИЯ START_PHASE_SELECTION ВЫЗВАНА ===")
-    logger.info(f"Update имеет callback_query: {hasattr(update, 'callback_query') and update.callback_query}")
-    logger.info(f"Update message: {update.message}")
-    logger.info(f"Update type: {type(update)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("=== ФУНКЦИЯ START_PHASE_SELECTION ВЫЗВАНА ===")
+        logger.debug(f"Update имеет callback_query: {hasattr(update, 'callback_query') and update.callback_query}")
+        logger.debug(f"Update message: {update.message}")
+        logger.debug(f"Update type: {type(update)}")
     
     # Если вызов через CallbackQuery (кнопка), иначе через обычное сообщение
     if hasattr(update, 'callback_query') and update.callback_query:
@@ -649,12 +607,7 @@ async def start_phase_selection(update: Update, context: ContextTypes.DEFAULT_TY
                 return ASK_NAME
             
             # Если имя уже есть, начинаем полный тест
-            user_answers[user_id] = {
-                "current_phase": 0,
-                "current_question": 0,
-                "answers": {},
-                "full_test": True
-            }
+            user_answers[user_id] = TestSession(phase=0, full_test=True)
             return await start_questions(update, context)
         
         send_func = query.edit_message_text
@@ -662,7 +615,7 @@ async def start_phase_selection(update: Update, context: ContextTypes.DEFAULT_TY
         # Это обычное сообщение (например, команда /start)
         query = None
         send_func = update.message.reply_text
-        logger.info("Обрабатываем обычное сообщение (не callback_query)")
+        logger.debug("Обрабатываем обычное сообщение (не callback_query)")
 
     welcome_text = """
 🔬 *Диагностика уровня эмоционального выгорания*
@@ -682,12 +635,13 @@ async def start_phase_selection(update: Update, context: ContextTypes.DEFAULT_TY
 
 Начинаем тест:
 """
-    keyboard = [[InlineKeyboardButton("📊 Пройти тест (30 вопросов)", callback_data="full_test")]]
+    keyboard = [[InlineKeyboardButton(f"📊 Пройти тест ({questionnaire.total_questions} вопросов)", callback_data="full_test")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    logger.info(f"Отправляем сообщение через: {send_func}")
-    logger.info(f"Текст сообщения: {welcome_text[:100]}...")
-    logger.info(f"Клавиатура: {keyboard}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Отправляем сообщение через: {send_func}")
+        logger.debug(f"Текст сообщения: {welcome_text[:100]}...")
+        logger.debug(f"Клавиатура: {keyboard}")
     
     try:
         await send_func(
@@ -695,12 +649,12 @@ async def start_phase_selection(update: Update, context: ContextTypes.DEFAULT_TY
             reply_markup=reply_markup,
             parse_mode='Markdown'
         )
-        logger.info("Сообщение отправлено успешно")
+        logger.debug("Сообщение отправлено успешно")
     except BadRequest as e:
         logger.error(f"Ошибка BadRequest при отправке: {e}")
         if "Message is not modified" in str(e):
             # Игнорируем ошибку, если сообщение не изменилось
-            logger.info("Игнорируем ошибку 'Message is not modified'")
+            logger.debug("Игнорируем ошибку 'Message is not modified'")
             pass
         else:
             raise e
@@ -708,7 +662,7 @@ async def start_phase_selection(update: Update, context: ContextTypes.DEFAULT_TY
         logger.error(f"Общая ошибка при отправке: {e}")
         raise e
     
-    logger.info(f"Возвращаем состояние: {CHOOSING_PHASE}")
+    logger.debug(f"Возвращаем состояние: {CHOOSING_PHASE}")
     return CHOOSING_PHASE
 
 async def start_questions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -723,34 +677,12 @@ async def start_questions(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     user_id = update.effective_user.id
     
-    phase_index = user_answers[user_id]["current_phase"]
-    phase_data = TEST_QUESTIONS[phase_index]
-    
-    # Определяем общий номер вопроса для полного теста
-    total_question_number = 1
-    for i in range(phase_index):
-        total_question_number += len(TEST_QUESTIONS[i]['questions'])
-    
-    question_text = f"""
-📝 *Тестирование фазы: {phase_data['phase']}*
-
-Вопрос {total_question_number} из 30:
-
-{phase_data['questions'][0]}
-"""
-    
-    keyboard = [
-        [
-            InlineKeyboardButton("✅ Согласен", callback_data="answer_1"),
-            InlineKeyboardButton("❌ Не согласен", callback_data="answer_0")
-        ]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    # Первый вопрос фазы - готовый экран
+    screen = questionnaire.screen(user_answers[user_id].phase, 0)
     
     await send_func(
-        text=question_text,
-        reply_markup=reply_markup,
+        text=screen.text,
+        reply_markup=screen.reply_markup,
         parse_mode='Markdown'
     )
     
@@ -782,65 +714,48 @@ async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         )
         return ConversationHandler.END
     
-    # Сохраняем ответ
-    phase_index = user_answers[user_id]["current_phase"]
-    question_index = user_answers[user_id]["current_question"]
-    
-    if phase_index not in user_answers[user_id]["answers"]:
-        user_answers[user_id]["answers"][phase_index] = {}
-    
-    user_answers[user_id]["answers"][phase_index][question_index] = answer
-    
-    # Переходим к следующему вопросу
-    user_answers[user_id]["current_question"] += 1
-    
-    phase_data = TEST_QUESTIONS[phase_index]
+    # Сохраняем ответ и переходим к следующему вопросу
+    session = user_answers.get(user_id)
+    if session is None:
+        await query.edit_message_text(text=SESSION_EXPIRED_TEXT)
+        return ConversationHandler.END
+    phase_index = session.phase
+    session.record(answer)
     
-    if user_answers[user_id]["current_question"] < len(phase_data['questions']):
-        # Показываем следующий вопрос
-        next_question = user_answers[user_id]["current_question"]
-        
-        # Определяем общий номер вопроса для полного теста
-        total_question_number = 1
-        for i in range(phase_index):
-            total_question_number += len(TEST_QUESTIONS[i]['questions'])
-        total_question_number += next_question
-        
-        question_text = f"""
-📝 *Тестирование фазы: {phase_data['phase']}*
-
-Вопрос {total_question_number} из 30:
-
-{phase_data['questions'][next_question]}
-"""
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Согласен", callback_data="answer_1"),
-                InlineKeyboardButton("❌ Не согласен", callback_data="answer_0")
-            ]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+    if session.question < questionnaire.phase_length(phase_index):
+        # Показываем следующий вопрос - готовый экран
+        screen = questionnaire.screen(phase_index, session.question)
         
         await query.edit_message_text(
-            text=question_text,
-            reply_markup=reply_markup,
+            text=screen.text,
+            reply_markup=screen.reply_markup,
             parse_mode='Markdown'
         )
         
         return ANSWERING_QUESTIONS
     else:
         # Завершили текущую фазу
-        if user_answers[user_id]["full_test"] and phase_index < len(TEST_QUESTIONS) - 1:
+        if session.full_test and phase_index < len(TEST_QUESTIONS) - 1:
             # Переходим к следующей фазе
-            user_answers[user_id]["current_phase"] += 1
-            user_answers[user_id]["current_question"] = 0
+            session.phase += 1
+            session.question = 0
             return await start_questions(update, context)
         else:
             # Тест завершен, предлагаем подписаться на канал
             return await show_subscription_request(update, context)
 
+# Готовые экраны результатов по баллам фаз
+results_pages = ResultsPages(RESULTS_CACHE_SIZE)
+
+def results_snapshot(session: TestSession) -> ResultSnapshot:
+    """Результат сессии: баллы и экран считаются при первом показе и хранятся в сессии"""
+    if session.snapshot is None:
+        result = score_session(session)
+        text, reply_markup = results_pages.get(result)
+        session.snapshot = ResultSnapshot(result, text, reply_markup)
+    return session.snapshot
+
+@timed
 async def show_results(update: Update, context: ContextTypes.DEFAULT_TYPE, generate_certificate_flag: bool = True) -> int:
     """Показ результатов тестирования"""
     # Определяем, откуда пришел запрос
@@ -854,175 +769,54 @@ async def show_results(update: Update, context: ContextTypes.DEFAULT_TYPE, gener
         user_id = update.effective_user.id
         edit_message = False
     
-    results_text = "📊 *Результаты диагностики эмоционального выгорания*\n\n"
-    
-    total_score = 0
-    phase_scores = {}
-    completed_phases = 0
-    
-    # Подсчитываем баллы по фазам
-    for phase_index, phase_data in enumerate(TEST_QUESTIONS):
-        phase_name = phase_data["phase"]
-        phase_answers = user_answers[user_id]["answers"].get(phase_index, {})
-        
-        score = 0
-        questions_in_phase = len(phase_data["questions"])
-        answered_questions = len(phase_answers)
-        
-        # Проверяем, пройдена ли фаза полностью
-        if answered_questions == questions_in_phase:
-            completed_phases += 1
-            for question_index, answer in phase_answers.items():
-                if answer == SCORING_KEYS[phase_name][question_index]:
-                    score += 1
-            
-            phase_scores[phase_name] = score
-            total_score += score
-            
-            # Определяем уровень для фазы
-            if score <= THRESHOLDS[phase_name]["medium"]:
-                level = "low"
-            elif score <= THRESHOLDS[phase_name]["high"]:
-                level = "medium"
-            else:
-                level = "high"
-            
-            results_text += f"🔸 *{phase_name}:* {score}/10 баллов\n"
-            results_text += f"   {INTERPRETATION[phase_name][level]}\n\n"
+    session = user_answers.get(user_id)
+    if session is None:
+        if edit_message and query:
+            await query.edit_message_text(text=SESSION_EXPIRED_TEXT)
         else:
-            # Фаза не пройдена полностью
-            results_text += f"🔸 *{phase_name}:* не пройдена\n\n"
-    
-    # Полный тест пройден
-    results_text += f"📈 *Общий балл:* {total_score}/30\n\n"
-    
-    if total_score <= 15:
-        results_text += "✅ *Общий результат:* Маленький Пиздец эмоционального выгорания"
-    elif total_score <= 20:
-        results_text += "⚠️ *Общий результат:* Средний Пиздец эмоционального выгорания"
-    else:
-        results_text += "🚨 *Общий результат:* Большой Пиздец эмоционального выгорания"
-    
-    results_text += "\n\n💡 *Рекомендации:*\n"
+            await context.bot.send_message(chat_id=user_id, text=SESSION_EXPIRED_TEXT)
+        return ConversationHandler.END
     
-    # Определяем, является ли это полным тест
-    is_full_test = completed_phases == 3
+    # Баллы, уровни и готовый экран результатов
+    snapshot = results_snapshot(session)
+    result = snapshot.result
     
-    # Обновляем статистику завершения теста
-    if is_full_test:
-        level_name = "Маленький Пиздец" if total_score <= 15 else "Средний Пиздец" if total_score <= 20 else "Большой Пиздец"
+    # Завершение полного теста попадает в статистику один раз за прохождение
+    if result.is_full_test and not session.recorded:
+        await stats_ready()
         user_info = {
             'username': update.effective_user.username,
             'first_name': update.effective_user.first_name,
             'last_name': update.effective_user.last_name
         }
         update_stats(user_id, 'test_completed', {
-            'level': level_name,
-            'total_score': total_score,
-            'completed_phases': completed_phases
+            'level': result.level_name,
+            'total_score': result.total_score,
+            'completed_phases': result.completed_phases,
+            'answers': (session.answers, session.answered)
         }, user_info=user_info)
-    
-    # Определяем общий уровень для рекомендаций
-    if is_full_test and completed_phases == 3:
-        # Для полного теста используем общий балл
-        if total_score <= 15:
-            recommendation_level = "low"
-        elif total_score <= 20:
-            recommendation_level = "medium"
-        else:
-            recommendation_level = "high"
-    else:
-        # Для отдельных фаз определяем уровень по среднему баллу
-        avg_score = total_score / completed_phases if completed_phases > 0 else 0
-        if avg_score <= 3:
-            recommendation_level = "low"
-        elif avg_score <= 6:
-            recommendation_level = "medium"
-        else:
-            recommendation_level = "high"
-    
-    if recommendation_level == "high":
-        results_text += "🚨 *Большой Пиздец эмоционального выгорания:*\n"
-        results_text += "Ты перегорел.\n"
-        results_text += "Это уже не просто усталость. Выгорание влияет на тело, психику, интерес к жизни. Само не пройдёт. Нужно осознанно перезагружаться.\n\n"
-        results_text += "Совет:\n"
-        results_text += "Не дави на себя. Сейчас не время «взять себя в руки» — время поменять ритм и вложиться в восстановление. Новое знание, смена фокуса, простые переключения — всё это может стать спасением.\n\n"
-        results_text += f"👉 В [{CHANNEL_NAME}]({CHANNEL_LINK}) я делюсь личным опытом, инструментами и мыслями, которые помогают выйти из этого состояния"
-    elif recommendation_level == "medium":
-        results_text += "⚠️ *Средний Пиздец эмоционального выгорания:*\n"
-        results_text += "Ты в зоне риска.\n"
-        results_text += "Скорее всего, ты замечаешь раздражительность, усталость, прокрастинацию. Это не «просто лень» — это сигнал, что ты выдыхаешься.\n\n"
-        results_text += "Совет:\n"
-        results_text += "Остановись. Переключи внимание. Разгрузи голову — новыми темами, средой, впечатлениями. Иногда нужно не усилие, а выход из круга.\n\n"
-        results_text += f"👉 В [{CHANNEL_NAME}]({CHANNEL_LINK}) я как раз об этом — как не потерять себя в выгорании, где брать энергию, как менять мышление. Залетай, это важно."
-    else:
-        results_text += "✅ *Маленький Пиздец эмоционального выгорания:*\n"
-        results_text += "Ты держишься молодцом.\n"
-        results_text += "Судя по результатам, ты пока не на грани — но не забывай: ресурс конечен. Даже если ты не выгораешь, усталость накапливается незаметно.\n\n"
-        results_text += "Совет:\n"
-        results_text += "Меняй контекст, пробуй новое, переключай внимание. Лучше отдыхать на опережение, чем потом собирать себя по кускам.\n\n"
-        results_text += f"👉 Я пишу об этом в канале [{CHANNEL_NAME}]({CHANNEL_LINK}): как сохранять интерес, энергию и не закиснуть."
-    
-    # Добавляем предупреждение, если пройдены не все фазы
-    if not is_full_test or completed_phases < 3:
-        results_text += "\n\n⚠️ *Важно:*\n"
-        results_text += "Ты прошёл только часть теста. Для более точной диагностики рекомендуется пройти полный тест из 30 вопросов.\n\n"
-        results_text += "🔍 *Полный тест включает:*\n"
-        results_text += "• 10 вопросов на фазу «Напряжение»\n"
-        results_text += "• 10 вопросов на фазу «Резистенция»\n"
-        results_text += "• 10 вопросов на фазу «Истощение»\n\n"
-        results_text += "Это даст более точную картину твоего эмоционального состояния."
-    
-    keyboard = [
-        [InlineKeyboardButton("🔄 Пройти тест заново", callback_data="restart")],
-        [InlineKeyboardButton("ℹ️ О методике", callback_data="about")]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+        session.recorded = True
     
     if edit_message and query:
         await query.edit_message_text(
-            text=results_text,
-            reply_markup=reply_markup,
+            text=snapshot.text,
+            reply_markup=snapshot.reply_markup,
             parse_mode='Markdown'
         )
     else:
         # Отправляем новое сообщение
         await context.bot.send_message(
             chat_id=user_id,
-            text=results_text,
-            reply_markup=reply_markup,
+            text=snapshot.text,
+            reply_markup=snapshot.reply_markup,
             parse_mode='Markdown'
         )
     
     # Генерируем и отправляем грамоту только если это первый показ результатов
     if generate_certificate_flag:
         try:
-            # Определяем уровень для грамоты
-            if is_full_test and completed_phases == 3:
-                if total_score <= 15:
-                    level = "Маленький Пиздец"
-                elif total_score <= 20:
-                    level = "Средний Пиздец"
-                else:
-                    level = "Большой Пиздец"
-            else:
-                if completed_phases == 1:
-                    score = list(phase_scores.values())[0]
-                    if score <= 3:
-                        level = "Маленький Пиздец"
-                    elif score <= 6:
-                        level = "Средний Пиздец"
-                    else:
-                        level = "Большой Пиздец"
-                else:
-                    avg_score = total_score / completed_phases if completed_phases > 0 else 0
-                    if avg_score <= 3:
-                        level = "Маленький Пиздец"
-                    elif avg_score <= 6:
-                        level = "Средний Пиздец"
-                    else:
-                        level = "Большой Пиздец"
+            # Уровень для грамоты совпадает с уровнем рекомендаций
+            level = result.level_name
             
             # Получаем имя пользователя из сохраненных данных или из профиля
             if 'full_name' in context.user_data:
@@ -1032,15 +826,8 @@ async def show_results(update: Update, context: ContextTypes.DEFAULT_TYPE, gener
                 if update.effective_user.last_name:
                     user_name += f" {update.effective_user.last_name}"
             
-            # Генерируем грамоту
-            certificate_bytes = await generate_certificate(user_name, total_score, level, completed_phases)
-            
-            # Отправляем грамоту как изображение
-            await context.bot.send_photo(
-                chat_id=user_id,
-                photo=certificate_bytes,
-                caption="🏆 Ваша персональная грамота за прохождение теста! Сохрани её на память или поделись с друзьями."
-            )
+            # Результаты уже отправлены, грамота придет по готовности
+            await deliver_certificate(context, user_id, user_name, level)
             
         except Exception as e:
             logger.error(f"Ошибка при генерации грамоты: {e}")
@@ -1148,11 +935,23 @@ async def about_method(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     return SHOWING_RESULTS
 
 async def back_to_results(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Возврат к результатам"""
+    """Возврат к результатам: готовый экран из сессии, без пересчета и записи статистики"""
     query = update.callback_query
     await query.answer()
     
-    return await show_results(update, context, generate_certificate_flag=False)
+    session = user_answers.get(update.effective_user.id)
+    if session is None:
+        await query.edit_message_text(text=SESSION_EXPIRED_TEXT)
+        return ConversationHandler.END
+    
+    snapshot = results_snapshot(session)
+    await query.edit_message_text(
+        text=snapshot.text,
+        reply_markup=snapshot.reply_markup,
+        parse_mode='Markdown'
+    )
+    
+    return SHOWING_RESULTS
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Команда помощи"""
@@ -1179,7 +978,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
 🔧 *Административные команды:*
 /stats - Показать статистику бота
-/stats_json - Скачать JSON файл со статистикой
+/stats_json [ndjson|csv] [gz] [from=ДАТА] [to=ДАТА] [level=Уровень] - Выгрузка прохождений
 /user_info <ID> - Информация о конкретном пользователе
 """
     
@@ -1202,81 +1001,244 @@ async def error_handler(update, context):
     elif update and hasattr(update, 'callback_query') and update.callback_query:
         await update.callback_query.edit_message_text("⚠️ Произошла непредвиденная ошибка. Попробуйте еще раз или начните с /start.")
 
-async def generate_certificate(user_name: str, total_score: int, level: str, completed_phases: int) -> bytes:
-    """Генерация грамоты на основе PNG-шаблона"""
-    from datetime import datetime
-    import io
-    from PIL import Image, ImageDraw, ImageFont
+# Пул процессов для генерации грамот
+certificate_pool = CertificatePool(CERTIFICATE_WORKERS, CERTIFICATE_QUEUE_SIZE)
 
-    # Открываем шаблон
-    try:
-        image = Image.open("certificate_template.png").convert("RGBA")
-    except FileNotFoundError:
-        logger.error("Файл certificate_template.png не найден!")
-        raise FileNotFoundError("Файл certificate_template.png не найден в корне проекта")
-    except Exception as e:
-        logger.error(f"Ошибка при открытии файла сертификата: {e}")
-        raise
-    draw = ImageDraw.Draw(image)
+# Кэш file_id отправленных грамот
+file_id_cache = FileIdCache(FILE_ID_CACHE_PATH, FILE_ID_CACHE_SIZE)
 
-    # Шрифты с приоритетом на Evolventa из папки проекта
-    try:
-        # Пробуем шрифт Evolventa из папки проекта
-        font_nick = ImageFont.truetype("evolventa/ttf/Evolventa-Regular.ttf", 48)
-        font_level = ImageFont.truetype("evolventa/ttf/Evolventa-Regular.ttf", 44)
-        font_date = ImageFont.truetype("evolventa/ttf/Evolventa-Regular.ttf", 44)
-        logger.info("Используется шрифт Evolventa из папки проекта")
-    except:
-        try:
-            # Fallback на стандартные шрифты Linux (для сервера)
-            font_nick = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 48)
-            font_level = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 44)
-            font_date = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 44)
-            logger.info("Используется системный шрифт Linux")
-        except:
-            try:
-                # Fallback на стандартные шрифты macOS
-                font_nick = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 48)
-                font_level = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 44)
-                font_date = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 44)
-                logger.info("Используется системный шрифт macOS")
-            except:
-                # Последний fallback - используем дефолтный шрифт
-                font_nick = ImageFont.load_default()
-                font_level = ImageFont.load_default()
-                font_date = ImageFont.load_default()
-                logger.warning("Используется дефолтный шрифт - Evolventa не найден")
-
-    # Новые координаты для вставки текста
-    nick_xy = (360, 610)         # Под надписью «Выдана»
-    level_xy = (180, 1110)         # Под надписью «Уровень выгорания»
-    date_xy = (300, 1270)          # Под надписью «Дата прохождения»
-
-    # Формируем значения
+CERTIFICATE_CAPTION = "🏆 Ваша персональная грамота за прохождение теста! Сохрани её на память или поделись с друзьями."
+CERTIFICATE_BUSY_TEXT = "⏳ Сейчас грамоты готовятся для многих участников, и вашу подготовить не удалось. Пройдите тест чуть позже, чтобы получить её."
+
+@timed
+async def deliver_certificate(context: ContextTypes.DEFAULT_TYPE, user_id: int, user_name: str, level: str) -> None:
+    """Отправка грамоты: по file_id из кэша или через очередь генерации"""
+    # Версия шаблона в ключе кэша и процессы пула требуют загруженного шаблона
+    await startup.ready('certificate')
     date_str = datetime.now().strftime('%d.%m.%Y')
+    cache_key = certificate_key(user_name, level, date_str)
+    
+    # Такая же грамота уже загружалась в Telegram - отправляем по file_id
+    file_id = file_id_cache.get(cache_key)
+    if file_id:
+        try:
+            await context.bot.send_photo(chat_id=user_id, photo=file_id, caption=CERTIFICATE_CAPTION)
+            return
+        except BadRequest as e:
+            logger.warning(f"file_id грамоты больше не принимается, генерируем заново: {e}")
+            file_id_cache.discard(cache_key)
+    
+    async def send_certificate(certificate_bytes: bytes) -> None:
+        message = await context.bot.send_photo(
+            chat_id=user_id,
+            photo=certificate_bytes,
+            caption=CERTIFICATE_CAPTION
+        )
+        if message.photo:
+            file_id_cache.put(cache_key, message.photo[-1].file_id)
+    
+    if not certificate_pool.submit(user_name, level, date_str, send_certificate):
+        logger.warning(f"Грамота для пользователя {user_id} не поставлена в очередь")
+        await context.bot.send_message(chat_id=user_id, text=CERTIFICATE_BUSY_TEXT)
 
-    # Вставляем текст
-    draw.text(nick_xy, user_name, font=font_nick, fill=(0,0,0))
-    draw.text(level_xy, level, font=font_level, fill=(0,0,0))
-    draw.text(date_xy, date_str, font=font_date, fill=(0,0,0))
+async def save_file_id_cache(context: ContextTypes.DEFAULT_TYPE = None) -> None:
+    """Сохранение кэша file_id на диск, если он изменился (вне цикла событий)"""
+    if not file_id_cache.dirty:
+        return
+    try:
+        await asyncio.to_thread(file_id_cache.save, file_id_cache.snapshot())
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении кэша file_id: {e}")
 
-    # Сохраняем в байты
-    img_byte_arr = io.BytesIO()
-    image.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
-    return img_byte_arr.getvalue()
+async def expire_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Разговор неактивен дольше SESSION_IDLE_TTL: удаляем сессию и данные пользователя"""
+    user_id = update.effective_user.id
+    if user_id in user_answers:
+        del user_answers[user_id]
+    context.application.drop_user_data(user_id)
+
+async def sweep_sessions(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Удаление сессий, неактивных дольше SESSION_IDLE_TTL"""
+    evicted = user_answers.sweep()
+    if evicted:
+        logger.info(f"Удалено неактивных сессий: {evicted}, осталось: {len(user_answers)}")
+
+# Эндпоинт метрик (создается в post_init, если задан METRICS_PORT)
+metrics_server = None
+
+def register_metrics(application: Application) -> None:
+    """Метрики, значения которых берутся из счетчиков компонентов бота"""
+    registry.callback('burncheckbot_active_sessions', 'Активные сессии теста в памяти', lambda: len(user_answers))
+    registry.callback(
+        'burncheckbot_sessions_evicted_total', 'Удаленные сессии: по неактивности и сверх лимита',
+        lambda: {('idle',): user_answers.evicted_idle, ('capacity',): user_answers.evicted_capacity},
+        kind='counter', label_names=('reason',)
+    )
+    registry.callback(
+        'burncheckbot_subscription_cache_requests_total',
+        'Проверки подписки: из кэша (hit), через Bot API (miss), ожиданием идущего запроса (coalesced)',
+        lambda: {('hit',): subscription_checker.hits, ('miss',): subscription_checker.misses,
+                 ('coalesced',): subscription_checker.coalesced},
+        kind='counter', label_names=('result',)
+    )
+    registry.callback(
+        'burncheckbot_subscription_cache_hit_ratio', 'Доля проверок подписки, отвеченных из кэша',
+        lambda: subscription_checker.hits / max(
+            1, subscription_checker.hits + subscription_checker.misses + subscription_checker.coalesced)
+    )
+    registry.callback(
+        'burncheckbot_file_id_cache_requests_total', 'Поиск грамот в кэше file_id',
+        lambda: {('hit',): file_id_cache.hits, ('miss',): file_id_cache.misses},
+        kind='counter', label_names=('result',)
+    )
+    registry.callback(
+        'burncheckbot_results_cache_requests_total', 'Экраны результатов: из кэша и собранные заново',
+        lambda: {('hit',): results_pages.hits, ('miss',): results_pages.misses},
+        kind='counter', label_names=('result',)
+    )
+    registry.callback('burncheckbot_certificate_queue', 'Грамоты в очереди генерации', lambda: certificate_pool.pending)
+    registry.callback(
+        'burncheckbot_certificate_rejected_total', 'Грамоты, не поставленные в переполненную очередь',
+        lambda: certificate_pool.rejected, kind='counter'
+    )
+    
+    processor = application.update_processor
+    if isinstance(processor, PerUserUpdateProcessor):
+        registry.callback(
+            'burncheckbot_updates_queued', 'Обновления, ожидающие обработки',
+            lambda: application.update_queue.qsize() + processor.pending
+        )
+        registry.callback('burncheckbot_updates_in_flight', 'Обновления в обработке', lambda: processor.in_flight)
+        registry.callback(
+            'burncheckbot_updates_processed_total', 'Обработанные обновления', lambda: processor.processed, kind='counter'
+        )
+        registry.callback(
+            'burncheckbot_updates_dropped_total', 'Отброшенные лишние нажатия кнопок одного пользователя',
+            lambda: processor.dropped, kind='counter'
+        )
+    
+    limiter = application.bot.rate_limiter
+    if isinstance(limiter, PriorityRateLimiter):
+        registry.callback(
+            'burncheckbot_outbound_queue', 'Исходящие запросы, ожидающие лимита, по приоритетам',
+            lambda: {(name,): value for name, value in limiter.queue_lengths().items()}, label_names=('queue',)
+        )
+        registry.callback(
+            'burncheckbot_outbound_retries_total', 'Повторы исходящих запросов', lambda: limiter.retries, kind='counter'
+        )
+        registry.callback(
+            'burncheckbot_outbound_flood_waits_total', 'Ответы 429 от Bot API', lambda: limiter.flood_waits, kind='counter'
+        )
+    
+    registry.callback(
+        'burncheckbot_log_records_dropped_total', 'Отброшенные записи лога: переполнение очереди и прореживание',
+        lambda: {('overflow',): log_pipeline.stats()['dropped_overflow'],
+                 ('sampled',): log_pipeline.stats()['dropped_sampled']},
+        kind='counter', label_names=('reason',)
+    )
+    registry.callback(
+        'burncheckbot_startup_seconds', 'Длительность фаз запуска и фоновой подготовки',
+        startup.durations, label_names=('phase', 'kind')
+    )
+
+async def post_init(application: Application) -> None:
+    """Запуск фоновых сервисов после инициализации приложения"""
+    global metrics_server
+    startup.checkpoint('initialize')
+    # Статистика, Pillow и шрифты грамоты готовятся параллельно, пока бот уже отвечает
+    startup.warm('stats', load_stats_from_file)
+    startup.warm('certificate', get_renderer)
+    if not DISABLE_SUBSCRIPTION_CHECK:
+        await subscription_checker.resolve_channel(application.bot)
+    certificate_pool.start()
+    file_id_cache.load()
+    application.job_queue.run_repeating(save_file_id_cache, interval=FILE_ID_CACHE_SAVE_INTERVAL)
+    application.job_queue.run_repeating(flush_stats, interval=STATS_FLUSH_INTERVAL)
+    application.job_queue.run_repeating(compact_stats, interval=STATS_COMPACT_INTERVAL)
+    application.job_queue.run_repeating(sweep_sessions, interval=SESSION_SWEEP_INTERVAL)
+    # Вместе с вытесненной сессией удаляются имя и выбор теста пользователя
+    user_answers.on_evict = application.drop_user_data
+    
+    register_metrics(application)
+    if METRICS_PORT:
+        # Процессы бота при BOT_WORKERS > 1 отдают метрики на соседних портах
+        port = METRICS_PORT if BOT_WORKER_INDEX is None else METRICS_PORT + 1 + BOT_WORKER_INDEX
+        metrics_server = MetricsServer(METRICS_LISTEN, port)
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.error(f"Не удалось запустить эндпоинт метрик на {METRICS_LISTEN}:{port}: {e}")
+            metrics_server = None
+    startup.checkpoint('post_init')
+    startup.mark_ready()
+
+async def post_shutdown(application: Application) -> None:
+    """Остановка фоновых сервисов"""
+    if metrics_server is not None:
+        await metrics_server.stop()
+    await certificate_pool.stop()
+    await save_file_id_cache()
+    await compact_stats()
 
 def main() -> None:
     """Запуск бота"""
     global application
     
+    configure_logging()
+    logger.info("🤖 Бот запускается...")
+    logger.info(f"Версия: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    startup.checkpoint('logging')
+    
     # Проверяем загрузку токена
     if not BOT_TOKEN or BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE':
         logger.error("BOT_TOKEN не настроен! Проверьте переменные окружения.")
         return
     
-    # Создаем приложение
-    application = Application.builder().token(BOT_TOKEN).build()
+    # Несколько процессов: этот процесс только запускает их и распределяет обновления
+    if BOT_WORKERS > 1 and BOT_WORKER_INDEX is None:
+        if BOT_RUN_MODE != 'webhook' or STATS_BACKEND != 'sqlite' or PERSISTENCE_BACKEND != 'sqlite':
+            logger.error("BOT_WORKERS > 1 требует BOT_RUN_MODE=webhook, STATS_BACKEND=sqlite "
+                         "и PERSISTENCE_BACKEND=sqlite")
+            return
+        print(f"🤖 Бот запущен в {BOT_WORKERS} процессах! Нажмите Ctrl+C для остановки.")
+        asyncio.run(run_master(
+            BOT_TOKEN, BOT_WORKERS, WORKER_BASE_PORT, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+            WEBHOOK_URL, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS
+        ))
+        return
+    
+    # Незавершенные тесты переживают перезапуск бота; процесс загружает только своих пользователей
+    shard = (BOT_WORKER_INDEX, BOT_WORKERS) if BOT_WORKER_INDEX is not None else None
+    persistence = SessionPersistence(
+        create_session_backend(PERSISTENCE_BACKEND, PERSISTENCE_PATH, SESSION_IDLE_TTL, shard),
+        user_answers,
+        PERSISTENCE_INTERVAL
+    )
+    
+    # Между процессами бота делится только общий лимит отправки сообщений и грамот.
+    # Редактирования в него не входят, а лимиты чатов не делятся, потому что все
+    # обновления одного пользователя приходят в один процесс
+    send_rate = RATE_LIMIT_GLOBAL / BOT_WORKERS if BOT_WORKER_INDEX is not None else RATE_LIMIT_GLOBAL
+    
+    # Создаем приложение (в режиме вебхука getUpdates не нужен)
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .persistence(persistence)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .rate_limiter(PriorityRateLimiter(
+            send_rate, RATE_LIMIT_PER_CHAT, RATE_LIMIT_CHAT_BURST, RATE_LIMIT_MAX_RETRIES,
+            RATE_LIMIT_EDIT_PER_CHAT
+        ))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if BOT_API_BASE_URL:
+        builder = builder.base_url(f"{BOT_API_BASE_URL}/bot").base_file_url(f"{BOT_API_BASE_URL}/file/bot")
+    if BOT_RUN_MODE == 'webhook':
+        builder = builder.updater(None)
+    application = builder.build()
     
     # Создаем обработчик разговора
     conv_handler = ConversationHandler(
@@ -1290,25 +1252,41 @@ def main() -> None:
                 CallbackQueryHandler(restart_test, pattern="^restart$"),
                 CallbackQueryHandler(about_method, pattern="^about$"),
                 CallbackQueryHandler(back_to_results, pattern="^back_to_results$")
-            ]
+            ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, expire_conversation)]
         },
         fallbacks=[CommandHandler("help", help_command)],
+        # Завершенные и брошенные разговоры не остаются в памяти и в хранилище навсегда
+        conversation_timeout=SESSION_IDLE_TTL,
+        name="burnout_test",
+        persistent=True,
         per_chat=True,
         per_user=True,
         per_message=False
     )
     
+    # Время обработчиков и переходы между состояниями попадают в метрики
+    instrument_conversation(conv_handler, STATE_NAMES)
     application.add_handler(conv_handler)
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("stats", stats_command))
-    application.add_handler(CommandHandler("stats_json", stats_json_command))
-    application.add_handler(CommandHandler("user_info", user_info_command))
+    for command, callback in (("help", help_command), ("stats", stats_command),
+                              ("stats_json", stats_json_command), ("user_info", user_info_command)):
+        command_handler = CommandHandler(command, callback)
+        instrument_handler(command_handler)
+        application.add_handler(command_handler)
     application.add_error_handler(error_handler)
+    startup.checkpoint('application')
     
     # Запускаем бота
     print("🤖 Бот запущен! Нажмите Ctrl+C для остановки.")
-    logger.info("Начинаем polling...")
-    application.run_polling(drop_pending_updates=True)
+    if BOT_RUN_MODE == 'webhook':
+        logger.info(f"Запускаем вебхук на {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}...")
+        asyncio.run(run_webhook(
+            application, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL,
+            WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS
+        ))
+    else:
+        logger.info("Начинаем polling...")
+        application.run_polling(drop_pending_updates=True)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -10,6 +10,17 @@ YELLOW='\033[1;33m'
 BLUE='\033[0;34m'
 NC='\033[0m' # No Color
 
+# Число процессов бота (пусто - значение BOT_WORKERS из .env, по умолчанию 1).
+# Больше 1 - только в режиме вебхука с бэкендами sqlite, см. README
+BOT_WORKERS="${BOT_WORKERS:-}"
+
+# Переменные окружения для supervisor
+if [ -n "$BOT_WORKERS" ]; then
+    SUPERVISOR_WORKERS_ENV=",BOT_WORKERS=\"$BOT_WORKERS\""
+else
+    SUPERVISOR_WORKERS_ENV=""
+fi
+
 # Функция для логирования
 log_message() {
     echo -e "${BLUE}[$(date '+%Y-%m-%d %H:%M:%S')]${NC} $1"
@@ -44,6 +55,7 @@ show_help() {
     echo -e "  ${BLUE}./bot_manager.sh remote update 123.456.789.012${NC}"
     echo -e "  ${BLUE}./bot_manager.sh remote deploy 123.456.789.012${NC}"
     echo -e "  ${BLUE}./bot_manager.sh remote status 123.456.789.012 ~/.ssh/custom_key${NC}"
+    echo -e "  ${BLUE}BOT_WORKERS=4 ./bot_manager.sh local deploy${NC}  - Деплой с 4 процессами бота"
     echo ""
     echo -e "${GREEN}🔒 Защита от дублирования:${NC}"
     echo -e "  - Использование PID файлов"
@@ -58,6 +70,10 @@ local_management() {
     case "$command" in
             start)
                 log_message "${YELLOW}🚀 Запуск бота...${NC}"
+                if [ -n "$BOT_WORKERS" ]; then
+                    log_message "${BLUE}⚙️ Процессов бота: $BOT_WORKERS${NC}"
+                    export BOT_WORKERS
+                fi
                 nohup python3 bot.py > output.log 2>&1 &
                 echo $! > bot.pid
                 log_message "${GREEN}✅ Бот запущен с PID $(cat bot.pid)${NC}"
@@ -163,7 +179,10 @@ autostart=true
 autorestart=true
 stderr_logfile=/var/log/burncheckbot.err.log
 stdout_logfile=/var/log/burncheckbot.out.log
-environment=PYTHONPATH="/root/burncheckbot-v2"
+stopasgroup=true
+killasgroup=true
+stopwaitsecs=30
+environment=PYTHONPATH="/root/burncheckbot-v2"$SUPERVISOR_WORKERS_ENV
 EOF
                 
                 # Перезапуск Supervisor
@@ -292,7 +311,8 @@ EOF
             ;;
         deploy)
             log_message "${BLUE}🚀 Полный деплой бота на сервер...${NC}"
-            ssh -i "$ssh_key" -o StrictHostKeyChecking=no root@"$server_ip" << 'EOF'
+            ssh -i "$ssh_key" -o StrictHostKeyChecking=no root@"$server_ip" \
+                "SUPERVISOR_WORKERS_ENV='$SUPERVISOR_WORKERS_ENV' bash -s" << 'EOF'
 # Цвета для вывода на сервере
 RED='\033[0;31m'
 GREEN='\033[0;32m'
@@ -368,7 +388,10 @@ autostart=true
 autorestart=true
 stderr_logfile=/var/log/burncheckbot.err.log
 stdout_logfile=/var/log/burncheckbot.out.log
-environment=PYTHONPATH="$BOT_DIR"
+stopasgroup=true
+killasgroup=true
+stopwaitsecs=30
+environment=PYTHONPATH="$BOT_DIR"$SUPERVISOR_WORKERS_ENV
 SUPERVISOR_EOF
     
     # Перезапуск Supervisor
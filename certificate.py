@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import io
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import SIZE_BUCKETS, registry
+
+from config import (
+    CERTIFICATE_FORMAT, CERTIFICATE_QUALITY, CERTIFICATE_SCALE, CERTIFICATE_PNG_COMPRESS_LEVEL
+)
+
+logger = logging.getLogger('burncheckbot.certificate')
+
+render_duration = registry.histogram(
+    'burncheckbot_certificate_render_seconds', 'Время генерации грамоты в пуле по этапам', ('stage',)
+)
+certificate_size = registry.histogram(
+    'burncheckbot_certificate_size_bytes', 'Размер готовой грамоты', ('format',), buckets=SIZE_BUCKETS
+)
+
+# Шаблон грамоты
+TEMPLATE_PATH = "certificate_template.png"
+
+# Шрифты в порядке приоритета: Evolventa из папки проекта, затем системные
+FONT_CANDIDATES = [
+    ("evolventa/ttf/Evolventa-Regular.ttf", "Evolventa из папки проекта"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "системный шрифт Linux"),
+    ("/System/Library/Fonts/Helvetica.ttc", "системный шрифт macOS"),
+]
+
+# Размеры шрифтов
+NICK_FONT_SIZE = 48
+LEVEL_FONT_SIZE = 44
+DATE_FONT_SIZE = 44
+
+# Координаты для вставки текста
+NICK_XY = (360, 610)       # Под надписью «Выдана»
+LEVEL_XY = (180, 1110)     # Под надписью «Уровень выгорания»
+DATE_XY = (300, 1270)      # Под надписью «Дата прохождения»
+
+TEXT_COLOR = (0, 0, 0)
+
+# Фон, на который накладывается прозрачный шаблон при сохранении без альфа-канала
+BACKGROUND_COLOR = (255, 255, 255)
+
+# Поддерживаемые форматы: формат Pillow и признак наличия альфа-канала
+OUTPUT_FORMATS = {
+    "png": ("PNG", True),
+    "jpeg": ("JPEG", False),
+    "webp": ("WEBP", False),
+}
+
+
+def load_fonts(scale: float = 1.0):
+    """Подбор шрифтов для грамоты (один раз при создании рендерера)"""
+    from PIL import ImageFont
+
+    for font_path, description in FONT_CANDIDATES:
+        try:
+            fonts = (
+                ImageFont.truetype(font_path, round(NICK_FONT_SIZE * scale)),
+                ImageFont.truetype(font_path, round(LEVEL_FONT_SIZE * scale)),
+                ImageFont.truetype(font_path, round(DATE_FONT_SIZE * scale)),
+            )
+        except OSError:
+            continue
+        logger.info(f"Для грамоты используется {description}: {font_path}")
+        return fonts
+
+    logger.warning("Используется дефолтный шрифт - Evolventa не найден")
+    if scale != 1.0:
+        logger.warning(f"Дефолтный шрифт не масштабируется: текст грамоты не уменьшен под масштаб {scale}")
+    default_font = ImageFont.load_default()
+    return default_font, default_font, default_font
+
+
+class CertificateRenderer:
+    """Рендерер грамот: шаблон и шрифты загружаются один раз и хранятся в памяти
+
+    Шаблон сразу приводится к итоговому виду: уменьшается до нужного масштаба
+    и, если формат не поддерживает прозрачность, накладывается на белый фон.
+    При генерации копируется уже подготовленный слой. Pillow импортируется
+    здесь же: процессу бота он нужен только для грамот.
+    """
+
+    def __init__(self, template_path: str = TEMPLATE_PATH, output_format: str = CERTIFICATE_FORMAT,
+                 quality: int = CERTIFICATE_QUALITY, scale: float = CERTIFICATE_SCALE,
+                 png_compress_level: int = CERTIFICATE_PNG_COMPRESS_LEVEL):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Неизвестный формат грамоты: {output_format}")
+        self.output_format = output_format
+        self.quality = quality
+        self.scale = scale
+        self.png_compress_level = png_compress_level
+        from PIL import Image, ImageDraw
+        self.image_draw = ImageDraw.Draw
+
+        try:
+            with Image.open(template_path) as template:
+                template = template.convert("RGBA")
+        except FileNotFoundError:
+            logger.error(f"Файл {template_path} не найден!")
+            raise FileNotFoundError(f"Файл {template_path} не найден в корне проекта")
+
+        if scale != 1.0:
+            size = (round(template.width * scale), round(template.height * scale))
+            template = template.resize(size, Image.LANCZOS)
+
+        pil_format, keeps_alpha = OUTPUT_FORMATS[output_format]
+        if not keeps_alpha:
+            background = Image.new("RGB", template.size, BACKGROUND_COLOR)
+            background.paste(template, mask=template.getchannel("A"))
+            template = background
+        self.template = template
+        self.pil_format = pil_format
+        self.version = self._compute_version(template_path)
+
+        self.font_nick, self.font_level, self.font_date = load_fonts(scale)
+        self.nick_xy = self._scale_xy(NICK_XY)
+        self.level_xy = self._scale_xy(LEVEL_XY)
+        self.date_xy = self._scale_xy(DATE_XY)
+        logger.info(
+            f"Шаблон грамоты загружен: {template_path} ({self.template.width}x{self.template.height}, "
+            f"{output_format}, качество {quality}, масштаб {scale})"
+        )
+
+    def _compute_version(self, template_path: str) -> str:
+        """Версия шаблона: хеш файла шаблона и параметров вывода"""
+        digest = hashlib.sha256()
+        with open(template_path, 'rb') as f:
+            digest.update(f.read())
+        digest.update(f"{self.output_format}:{self.quality}:{self.scale}:{self.png_compress_level}".encode())
+        return digest.hexdigest()[:16]
+
+    def _scale_xy(self, xy):
+        return round(xy[0] * self.scale), round(xy[1] * self.scale)
+
+    def _save_options(self) -> dict:
+        if self.output_format == "png":
+            return {"compress_level": self.png_compress_level}
+        if self.output_format == "jpeg":
+            return {"quality": self.quality, "optimize": True}
+        return {"quality": self.quality, "method": 4}
+
+    def render_timed(self, user_name: str, level: str, date_str: str):
+        """Отрисовка грамоты; возвращает байты и время отрисовки и кодирования в секундах"""
+        started = time.perf_counter()
+        image = self.template.copy()
+        draw = self.image_draw(image)
+
+        draw.text(self.nick_xy, user_name, font=self.font_nick, fill=TEXT_COLOR)
+        draw.text(self.level_xy, level, font=self.font_level, fill=TEXT_COLOR)
+        draw.text(self.date_xy, date_str, font=self.font_date, fill=TEXT_COLOR)
+        drawn = time.perf_counter()
+
+        img_byte_arr = io.BytesIO()
+        image.save(img_byte_arr, format=self.pil_format, **self._save_options())
+        encoded = time.perf_counter()
+        return img_byte_arr.getvalue(), drawn - started, encoded - drawn
+
+    def render(self, user_name: str, level: str, date_str: str) -> bytes:
+        """Отрисовка грамоты на копии шаблона и кодирование в выбранный формат"""
+        return self.render_timed(user_name, level, date_str)[0]
+
+
+# Рендерер текущего процесса (в рабочих процессах пула наследуется от родителя)
+_renderer = None
+
+def get_renderer() -> CertificateRenderer:
+    """Получение рендерера грамот текущего процесса (создается при первом обращении)"""
+    global _renderer
+    if _renderer is None:
+        _renderer = CertificateRenderer()
+    return _renderer
+
+
+def certificate_key(user_name: str, level: str, date_str: str) -> str:
+    """Ключ содержимого грамоты: одинаковые имя, уровень, дата и версия шаблона дают одинаковую картинку"""
+    payload = "\x1f".join((get_renderer().version, user_name, level, date_str))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def render_certificate(user_name: str, level: str, date_str: str):
+    """Генерация грамоты в рабочем процессе пула (байты, время отрисовки/кодирования и формат)"""
+    renderer = get_renderer()
+    return renderer.render_timed(user_name, level, date_str) + (renderer.output_format,)
+
+
+class CertificatePool:
+    """Пул процессов для генерации грамот с ограниченной очередью заданий
+
+    Задания выполняются вне цикла событий: грамота рисуется в отдельном
+    процессе, а готовые байты передаются в корутину доставки. Если очередь
+    заполнена, новое задание отклоняется, чтобы не накапливать работу.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.executor = None
+        self.queue = None
+        self.consumers = []
+        self.rejected = 0
+
+    def start(self) -> None:
+        """Запуск рабочих процессов и обработчиков очереди"""
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=get_renderer)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        logger.info(f"Пул генерации грамот запущен: процессов {self.workers}, очередь {self.queue_size}")
+
+    async def stop(self) -> None:
+        """Остановка обработчиков очереди и рабочих процессов"""
+        for consumer in self.consumers:
+            consumer.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+        self.consumers = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    @property
+    def pending(self) -> int:
+        """Количество заданий в очереди"""
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def render(self, user_name: str, level: str, date_str: str) -> bytes:
+        """Генерация грамоты в пуле процессов (или в потоке, если пул не запущен)"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        certificate_bytes, draw_time, encode_time, output_format = await loop.run_in_executor(
+            self.executor, render_certificate, user_name, level, date_str
+        )
+        render_duration.observe(draw_time, 'draw')
+        render_duration.observe(encode_time, 'encode')
+        # Полное время с передачей заданий между процессами
+        render_duration.observe(time.perf_counter() - started, 'total')
+        certificate_size.observe(len(certificate_bytes), output_format)
+        logger.info(
+            f"Грамота сгенерирована: {len(certificate_bytes) / 1024:.0f} КБ ({output_format}), "
+            f"отрисовка {draw_time * 1000:.0f} мс, кодирование {encode_time * 1000:.0f} мс"
+        )
+        return certificate_bytes
+
+    def submit(self, user_name: str, level: str, date_str: str, deliver) -> bool:
+        """Постановка грамоты в очередь; deliver(bytes) вызывается по готовности.
+
+        Возвращает False, если очередь заполнена или пул не запущен.
+        """
+        if self.queue is None:
+            return False
+        try:
+            self.queue.put_nowait((user_name, level, date_str, deliver))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Очередь генерации грамот заполнена ({self.queue_size}), задание отклонено")
+            return False
+        return True
+
+    async def _consume(self) -> None:
+        while True:
+            user_name, level, date_str, deliver = await self.queue.get()
+            try:
+                certificate_bytes = await self.render(user_name, level, date_str)
+                await deliver(certificate_bytes)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при генерации грамоты: {e}")
+            finally:
+                self.queue.task_done()
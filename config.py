@@ -14,6 +14,103 @@ CHANNEL_NAME = os.getenv('CHANNEL_NAME', 'Кризис Тридцатилетн
 # Отключение проверки подписки (для тестирования)
 DISABLE_SUBSCRIPTION_CHECK = os.getenv('DISABLE_SUBSCRIPTION_CHECK', 'false').lower() == 'true'
 
+# Кэш проверки подписки (секунды): для подписанных и для неподписанных пользователей
+SUBSCRIPTION_CACHE_TTL = float(os.getenv('SUBSCRIPTION_CACHE_TTL', '600'))
+SUBSCRIPTION_NEGATIVE_TTL = float(os.getenv('SUBSCRIPTION_NEGATIVE_TTL', '5'))
+
+# Генерация грамот: число рабочих процессов и размер очереди заданий
+CERTIFICATE_WORKERS = int(os.getenv('CERTIFICATE_WORKERS', '2'))
+CERTIFICATE_QUEUE_SIZE = int(os.getenv('CERTIFICATE_QUEUE_SIZE', '100'))
+
+# Формат грамоты: jpeg, webp или png. Telegram все равно пережимает фото,
+# поэтому по умолчанию используется JPEG без альфа-канала
+CERTIFICATE_FORMAT = os.getenv('CERTIFICATE_FORMAT', 'jpeg').lower()
+CERTIFICATE_QUALITY = int(os.getenv('CERTIFICATE_QUALITY', '85'))  # Для jpeg и webp (1-100)
+CERTIFICATE_SCALE = float(os.getenv('CERTIFICATE_SCALE', '1.0'))  # Масштаб относительно шаблона 1024x1536
+CERTIFICATE_PNG_COMPRESS_LEVEL = int(os.getenv('CERTIFICATE_PNG_COMPRESS_LEVEL', '6'))  # Для png (0-9)
+
+# Кэш file_id уже загруженных в Telegram картинок (повторная отправка без загрузки)
+FILE_ID_CACHE_PATH = os.getenv('FILE_ID_CACHE_PATH', 'file_id_cache.json')
+FILE_ID_CACHE_SIZE = int(os.getenv('FILE_ID_CACHE_SIZE', '10000'))
+FILE_ID_CACHE_SAVE_INTERVAL = int(os.getenv('FILE_ID_CACHE_SAVE_INTERVAL', '60'))  # Секунды
+
+# Статистика: бэкенд (journal - снимок stats.json с журналом, sqlite - база SQLite),
+# пути к файлам, интервалы сброса буфера и свертки (секунды)
+STATS_BACKEND = os.getenv('STATS_BACKEND', 'journal').lower()
+STATS_DB_PATH = os.getenv('STATS_DB_PATH', 'stats.db')
+STATS_SNAPSHOT_PATH = os.getenv('STATS_SNAPSHOT_PATH', 'stats.json')
+STATS_JOURNAL_PATH = os.getenv('STATS_JOURNAL_PATH', 'stats.journal')
+STATS_FLUSH_INTERVAL = float(os.getenv('STATS_FLUSH_INTERVAL', '2'))
+STATS_COMPACT_INTERVAL = int(os.getenv('STATS_COMPACT_INTERVAL', '600'))
+
+# Сохранение незавершенных тестов между перезапусками: бэкенд (file - JSON-файл,
+# sqlite - база SQLite, общая для нескольких процессов), файл и интервал записи (секунды)
+PERSISTENCE_BACKEND = os.getenv('PERSISTENCE_BACKEND', 'file').lower()
+PERSISTENCE_PATH = os.getenv('PERSISTENCE_PATH', 'sessions.json')
+PERSISTENCE_INTERVAL = float(os.getenv('PERSISTENCE_INTERVAL', '5'))
+
+# Активные сессии теста: время неактивности до удаления (секунды; через столько же
+# завершается разговор и удаляются данные пользователя), максимальное число сессий
+# в памяти и интервал очистки неактивных (секунды)
+SESSION_IDLE_TTL = float(os.getenv('SESSION_IDLE_TTL', '86400'))
+SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '50000'))
+SESSION_SWEEP_INTERVAL = int(os.getenv('SESSION_SWEEP_INTERVAL', '300'))
+
+# Кэш готовых экранов результатов по баллам фаз (всего возможно 1727 экранов)
+RESULTS_CACHE_SIZE = int(os.getenv('RESULTS_CACHE_SIZE', '2048'))
+
+# Число одновременно обрабатываемых обновлений (обновления одного пользователя - всегда по очереди)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '16'))
+
+# Ограничение исходящих запросов к Bot API: сообщений в секунду всего и на один чат,
+# допустимый всплеск в одном чате, редактирований сообщений в секунду на один чат
+# (ответы на нажатия кнопок, в общий лимит не входят) и число повторов при 429 и сетевых ошибках
+RATE_LIMIT_GLOBAL = float(os.getenv('RATE_LIMIT_GLOBAL', '30'))
+RATE_LIMIT_PER_CHAT = float(os.getenv('RATE_LIMIT_PER_CHAT', '1'))
+RATE_LIMIT_CHAT_BURST = int(os.getenv('RATE_LIMIT_CHAT_BURST', '3'))
+RATE_LIMIT_EDIT_PER_CHAT = float(os.getenv('RATE_LIMIT_EDIT_PER_CHAT', '20'))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '3'))
+
+# Адрес сервера Bot API (пусто - api.telegram.org). Нужен для локального сервера
+# Bot API и для нагрузочных тестов с поддельным сервером (benchmarks/load_test.py)
+BOT_API_BASE_URL = os.getenv('BOT_API_BASE_URL', '').rstrip('/')
+
+# Режим получения обновлений: polling или webhook
+BOT_RUN_MODE = os.getenv('BOT_RUN_MODE', 'polling').lower()
+
+# Вебхук: публичный адрес (если пуст, вебхук в Telegram не регистрируется),
+# адрес и порт HTTP-сервера, путь, секретный токен и максимум одновременных соединений
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Логи: каталог, уровень (DEBUG включает подробные строки обработчиков), формат файлов
+# (text или json), уровень вывода в консоль, размер очереди фоновой записи (0 - писать
+# синхронно), прореживание DEBUG: каждая N-я строка и не больше M строк в секунду с одного места
+LOG_DIR = os.getenv('LOG_DIR', '/var/log/burncheckbot')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_CONSOLE_LEVEL = os.getenv('LOG_CONSOLE_LEVEL', 'INFO').upper()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_DEBUG_SAMPLE = int(os.getenv('LOG_DEBUG_SAMPLE', '1'))
+LOG_DEBUG_RATE_LIMIT = float(os.getenv('LOG_DEBUG_RATE_LIMIT', '10'))
+
+# Метрики в формате Prometheus: адрес и порт эндпоинта /metrics (0 - не запускать,
+# по умолчанию). В режиме нескольких процессов процесс с номером N слушает METRICS_PORT+1+N
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Число процессов бота. При BOT_WORKERS > 1 главный процесс принимает вебхук на WEBHOOK_PORT
+# и пересылает обновление процессу user_id % BOT_WORKERS, слушающему 127.0.0.1:WORKER_BASE_PORT+номер.
+# Требует STATS_BACKEND=sqlite и PERSISTENCE_BACKEND=sqlite
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '1'))
+WORKER_BASE_PORT = int(os.getenv('WORKER_BASE_PORT', '8100'))
+# Номер процесса задает главный процесс; вручную не указывается
+BOT_WORKER_INDEX = int(os.environ['BOT_WORKER_INDEX']) if os.getenv('BOT_WORKER_INDEX') else None
+
 # Данные теста по методике В.В. Бойко
 TEST_QUESTIONS = [
     # Фаза "Напряжение"
@@ -127,4 +224,15 @@ THRESHOLDS = {
     "Напряжение": get_thresholds("Напряжение"),
     "Резистенция": get_thresholds("Резистенция"), 
     "Истощение": get_thresholds("Истощение")
-} 
\ No newline at end of file
+} 
+# Пороги общего результата по сумме баллов (включительно): до 15 - низкий, до 20 - средний
+TOTAL_SCORE_THRESHOLDS = {
+    "low": 15,
+    "medium": 20
+}
+
+# Пороги по среднему баллу на фазу, если тест пройден не полностью
+AVERAGE_SCORE_THRESHOLDS = {
+    "low": 3,
+    "medium": 6
+}
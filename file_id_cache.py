@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+
+logger = logging.getLogger('burncheckbot.file_id_cache')
+
+
+class FileIdCache:
+    """LRU-кэш file_id загруженных в Telegram файлов с сохранением на диск
+
+    Ключ описывает содержимое файла (например, хеш параметров грамоты), значение —
+    file_id, который Telegram вернул после первой загрузки. Повторная отправка по
+    file_id не требует ни генерации, ни загрузки файла.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> None:
+        """Загрузка кэша из файла"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                loaded = json.load(f)
+        except FileNotFoundError:
+            logger.info(f"Файл {self.path} не найден, кэш file_id пуст")
+            return
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке кэша file_id: {e}")
+            return
+
+        # Файл хранит записи от старых к новым
+        self.entries = OrderedDict(loaded[-self.max_size:])
+        logger.info(f"Кэш file_id загружен: {len(self.entries)} записей")
+
+    def get(self, key: str):
+        """Получение file_id по ключу (None, если его нет)"""
+        file_id = self.entries.get(key)
+        if file_id is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return file_id
+
+    def put(self, key: str, file_id: str) -> None:
+        """Сохранение file_id с вытеснением самых давно использованных записей"""
+        self.entries[key] = file_id
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    def discard(self, key: str) -> None:
+        """Удаление записи (например, если Telegram больше не принимает file_id)"""
+        if self.entries.pop(key, None) is not None:
+            self.dirty = True
+
+    def snapshot(self):
+        """Копия записей для сохранения; сбрасывает признак изменений"""
+        self.dirty = False
+        return list(self.entries.items())
+
+    def save(self, entries) -> None:
+        """Атомарная запись снимка кэша в файл"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+
+logger = logging.getLogger('burncheckbot.http_server')
+
+# Ограничения на запрос: размер заголовков и тела, время ожидания данных от клиента
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+READ_TIMEOUT = 30
+
+STATUS_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    408: 'Request Timeout',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    429: 'Too Many Requests',
+    500: 'Internal Server Error',
+    502: 'Bad Gateway',
+    503: 'Service Unavailable',
+}
+
+
+class HttpRequest:
+    """Разобранный HTTP-запрос"""
+
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method: str, path: str, query: str, headers: dict, body: bytes):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers  # Имена заголовков в нижнем регистре
+        self.body = body
+
+
+class HttpResponse:
+    """HTTP-ответ обработчика"""
+
+    __slots__ = ('status', 'body', 'content_type', 'headers')
+
+    def __init__(self, status: int = 200, body: bytes = b'', content_type: str = 'text/plain; charset=utf-8',
+                 headers: dict = None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+class HttpError(Exception):
+    """Ошибка разбора запроса, на которую сервер отвечает кодом status"""
+
+    def __init__(self, status: int):
+        super().__init__(STATUS_REASONS.get(status, ''))
+        self.status = status
+
+
+class HttpServer:
+    """Минимальный HTTP/1.1 сервер на asyncio для служебных эндпоинтов бота
+
+    Поддерживает keep-alive и тела запросов с Content-Length (без chunked).
+    handler - корутина, получающая HttpRequest и возвращающая HttpResponse.
+    Соединения сверх max_connections сразу получают 503.
+    """
+
+    def __init__(self, host: str, port: int, handler, max_connections: int = 100, name: str = 'HTTP'):
+        self.host = host
+        self.port = port
+        self.handler = handler
+        self.max_connections = max_connections
+        self.name = name
+        self.connections = 0
+        self.tasks = set()
+        self.server = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._serve, self.host, self.port, limit=MAX_HEADER_SIZE)
+        # При port=0 система выбирает свободный порт
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"{self.name}-сервер слушает {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self.server is None:
+            return
+        self.server.close()
+        # Простаивающие keep-alive соединения закрываются, чтобы не ждать клиентов
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.server.wait_closed()
+        self.server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self.connections >= self.max_connections:
+            await self._write(writer, HttpResponse(503, b'Too many connections'), keep_alive=False)
+            writer.close()
+            return
+
+        self.connections += 1
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), READ_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HttpError as e:
+                    await self._write(writer, HttpResponse(e.status, str(e).encode()), keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                try:
+                    response = await self.handler(request)
+                except Exception as e:
+                    logger.error(f"Ошибка обработчика {self.name}-сервера для {request.path}: {e}")
+                    response = HttpResponse(500, b'Internal Server Error')
+
+                keep_alive = request.headers.get('connection', '').lower() != 'close'
+                await self._write(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections -= 1
+            self.tasks.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None  # Клиент закрыл соединение между запросами
+            raise
+        except asyncio.LimitOverrunError:
+            raise HttpError(400)
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HttpError(400)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HttpError(411)
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise HttpError(400)
+        if length < 0:
+            raise HttpError(400)
+        if length > MAX_BODY_SIZE:
+            raise HttpError(413)
+        body = await reader.readexactly(length) if length else b''
+
+        path, _, query = target.partition('?')
+        return HttpRequest(method.upper(), path, query, headers, body)
+
+    async def _write(self, writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool) -> None:
+        head = [
+            f"HTTP/1.1 {response.status} {STATUS_REASONS.get(response.status, '')}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        head.extend(f"{name}: {value}" for name, value in response.headers.items())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + response.body)
+        await writer.drain()
+
+
+class HttpClient:
+    """Клиент HTTP/1.1 с пулом keep-alive соединений к одному адресу
+
+    Используется для пересылки запросов между процессами бота. Ответ
+    возвращается целиком как HttpResponse; ошибки соединения пробрасываются
+    как ConnectionError или asyncio.TimeoutError.
+    """
+
+    def __init__(self, host: str, port: int, max_idle: int = 8, timeout: float = READ_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle = []  # Свободные пары (reader, writer)
+
+    async def _connection(self):
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+    async def request(self, method: str, path: str, headers: dict = None, body: bytes = b'') -> HttpResponse:
+        reader, writer = await self._connection()
+        try:
+            response, keep_alive = await asyncio.wait_for(
+                self._exchange(reader, writer, method, path, headers or {}, body), self.timeout
+            )
+        except BaseException:
+            writer.close()
+            raise
+        if keep_alive and len(self.idle) < self.max_idle:
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+        return response
+
+    async def _exchange(self, reader, writer, method: str, path: str, headers: dict, body: bytes):
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+        try:
+            response_head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Соединение закрыто до ответа")
+        lines = response_head.decode('latin-1').split('\r\n')
+        try:
+            status = int(lines[0].split(' ', 2)[1])
+        except (IndexError, ValueError):
+            raise ConnectionError(f"Некорректная строка статуса: {lines[0]!r}")
+        response_headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                response_headers[name.strip().lower()] = value.strip()
+
+        length = int(response_headers.get('content-length', '0'))
+        response_body = await reader.readexactly(length) if length else b''
+        keep_alive = response_headers.get('connection', '').lower() != 'close'
+        return HttpResponse(status, response_body, response_headers.get('content-type', ''), {}), keep_alive
+
+    async def close(self) -> None:
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
@@ -3,26 +3,59 @@
 # 📝 Удобные команды для просмотра логов бота
 # Использование: ./log_commands.sh [команда]
 
-LOG_DIR="/var/log/burncheckbot"
-BOT_LOG="$LOG_DIR/bot.log"
-ERROR_LOG="$LOG_DIR/bot_errors.log"
+# Значение настройки из .env рядом со скриптом
+env_value() {
+    if [ -f "$(dirname "$0")/.env" ]; then
+        grep -E "^$1=" "$(dirname "$0")/.env" | tail -n 1 | cut -d= -f2
+    fi
+}
+
+# Каталог логов и порт метрик берутся из окружения или из .env (0 - метрики отключены)
+LOG_DIR="${LOG_DIR:-$(env_value LOG_DIR)}"
+LOG_DIR="${LOG_DIR:-/var/log/burncheckbot}"
+METRICS_PORT="${METRICS_PORT:-$(env_value METRICS_PORT)}"
+METRICS_PORT="${METRICS_PORT:-0}"
+METRICS_URL="http://127.0.0.1:${METRICS_PORT}/metrics"
+
+# Логи одного процесса (bot.log) или всех процессов (bot.workerN.log)
+shopt -s nullglob
+BOT_LOGS=()
+ERROR_LOGS=()
+for log_file in "$LOG_DIR"/bot*.log; do
+    case "$log_file" in
+        *_errors.log) ERROR_LOGS+=("$log_file") ;;
+        *) BOT_LOGS+=("$log_file") ;;
+    esac
+done
+
+# Выход, если файлов логов нет (иначе cat и tail ждали бы ввода)
+require_logs() {
+    if [ "$#" -eq 0 ]; then
+        echo "Файлы логов не найдены в $LOG_DIR"
+        exit 1
+    fi
+}
 
 case "$1" in
     "all")
         echo "📋 Все логи бота:"
-        cat "$BOT_LOG"
+        require_logs "${BOT_LOGS[@]}"
+        cat "${BOT_LOGS[@]}"
         ;;
     "errors")
         echo "❌ Логи ошибок:"
-        cat "$ERROR_LOG"
+        require_logs "${ERROR_LOGS[@]}"
+        cat "${ERROR_LOGS[@]}"
         ;;
     "tail")
         echo "📊 Последние логи (в реальном времени):"
-        tail -f "$BOT_LOG"
+        require_logs "${BOT_LOGS[@]}"
+        tail -f "${BOT_LOGS[@]}"
         ;;
     "tail-errors")
         echo "❌ Последние ошибки (в реальном времени):"
-        tail -f "$ERROR_LOG"
+        require_logs "${ERROR_LOGS[@]}"
+        tail -f "${ERROR_LOGS[@]}"
         ;;
     "status")
         echo "📈 Статус бота:"
@@ -30,11 +63,28 @@ case "$1" in
         echo ""
         echo "📊 Размер файлов логов:"
         ls -lh "$LOG_DIR"/
+        echo ""
+        echo "⏱ Основные метрики:"
+        if [ "$METRICS_PORT" = "0" ]; then
+            echo "Метрики отключены (METRICS_PORT=0)"
+        else
+            curl -s "$METRICS_URL" | grep -E "^burncheckbot_(active_sessions|updates_queued|outbound_queue|subscription_cache_hit_ratio|handler_errors_total)" \
+                || echo "Эндпоинт метрик недоступен: $METRICS_URL"
+        fi
+        ;;
+    "metrics")
+        if [ "$METRICS_PORT" = "0" ]; then
+            echo "Метрики отключены: задайте METRICS_PORT в .env"
+            exit 1
+        fi
+        echo "⏱ Метрики бота ($METRICS_URL):"
+        curl -s "$METRICS_URL" | grep -v "^#"
         ;;
     "clear")
         echo "🧹 Очистка логов..."
-        echo "" > "$BOT_LOG"
-        echo "" > "$ERROR_LOG"
+        for log_file in "${BOT_LOGS[@]}" "${ERROR_LOGS[@]}"; do
+            echo "" > "$log_file"
+        done
         echo "✅ Логи очищены"
         ;;
     "restart")
@@ -49,7 +99,8 @@ case "$1" in
         echo "  ./log_commands.sh errors       - Показать только ошибки"
         echo "  ./log_commands.sh tail         - Следить за логами в реальном времени"
         echo "  ./log_commands.sh tail-errors  - Следить за ошибками в реальном времени"
-        echo "  ./log_commands.sh status       - Статус бота и размер логов"
+        echo "  ./log_commands.sh status       - Статус бота, размер логов и основные метрики"
+        echo "  ./log_commands.sh metrics      - Все метрики бота"
         echo "  ./log_commands.sh clear        - Очистить логи"
         echo "  ./log_commands.sh restart      - Перезапустить бота"
         echo ""
@@ -0,0 +1,206 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime
+
+# Поля LogRecord, которые не попадают в JSON как дополнительные (extra=...)
+STANDARD_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, сообщение, место вызова
+
+    Поля, переданные через extra=..., добавляются в запись как есть.
+    """
+
+    def __init__(self, static_fields: dict = None):
+        super().__init__()
+        self.static_fields = static_fields or {}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        entry.update(self.static_fields)
+        for key, value in vars(record).items():
+            if key not in STANDARD_RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Прореживание записей уровня DEBUG с одного места вызова
+
+    Пропускается каждая sample-я запись, и не больше rate_limit записей в
+    секунду с одной строки кода (0 - без ограничения). Записи уровня INFO и
+    выше проходят всегда. Отброшенные записи считаются в dropped. Решение
+    запоминается в записи, поэтому фильтр можно повесить на несколько
+    обработчиков: счетчики меняются один раз на запись.
+    """
+
+    def __init__(self, sample: int, rate_limit: float):
+        super().__init__()
+        self.sample = max(1, sample)
+        self.rate_limit = rate_limit
+        self.sites = {}  # (pathname, lineno) -> [счетчик, токены, время пополнения]
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        decision = getattr(record, 'debug_sampled', None)
+        if decision is None:
+            decision = record.debug_sampled = self._decide(record)
+        return decision
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        key = (record.pathname, record.lineno)
+        site = self.sites.get(key)
+        if site is None:
+            site = self.sites[key] = [0, self.rate_limit, record.created]
+        site[0] += 1
+        if (site[0] - 1) % self.sample:
+            self.dropped += 1
+            return False
+        if self.rate_limit > 0:
+            site[1] = min(self.rate_limit, site[1] + (record.created - site[2]) * self.rate_limit)
+            site[2] = record.created
+            if site[1] < 1:
+                self.dropped += 1
+                return False
+            site[1] -= 1
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполненной очереди отбрасывает запись, а не блокирует"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение и трассировка вычисляются здесь, форматирование - в фоновом потоке
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    """Обработчики логов бота и, при queue_size > 0, фоновый поток записи"""
+
+    def __init__(self, handler: logging.Handler, listener=None, sampler: DebugSampler = None):
+        self.handler = handler
+        self.listener = listener
+        self.sampler = sampler
+
+    def stats(self) -> dict:
+        dropped_overflow = getattr(self.handler, 'dropped', 0)
+        return {
+            'queued': self.handler.queue.qsize() if self.listener else 0,
+            'dropped_overflow': dropped_overflow,
+            'dropped_sampled': self.sampler.dropped if self.sampler else 0,
+        }
+
+    def stop(self) -> None:
+        """Запись оставшихся в очереди записей, остановка фонового потока и закрытие файлов"""
+        if self.listener is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+
+
+def build_handlers(log_dir: str, log_name: str, log_format: str, console_level: int, worker_index=None) -> list:
+    """Файл всех логов, файл ошибок и консоль"""
+    if log_format == 'json':
+        formatter = JsonFormatter({'worker': worker_index} if worker_index is not None else None)
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, f'{log_name}.log'),
+        maxBytes=10*1024*1024,  # 10MB
+        backupCount=5,
+        encoding='utf-8'
+    )
+    file_handler.setLevel(logging.DEBUG)
+
+    error_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, f'{log_name}_errors.log'),
+        maxBytes=5*1024*1024,  # 5MB
+        backupCount=3,
+        encoding='utf-8'
+    )
+    error_handler.setLevel(logging.ERROR)
+
+    # Консоль остается в текстовом виде
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+
+    for handler in (file_handler, error_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, error_handler, console_handler]
+
+
+def setup_logging(logger: logging.Logger, log_dir: str, log_name: str, level: str = 'INFO',
+                  log_format: str = 'text', console_level: str = 'INFO', queue_size: int = 10000,
+                  debug_sample: int = 1, debug_rate_limit: float = 0, worker_index=None) -> LoggingPipeline:
+    """Настройка логгера бота
+
+    При queue_size > 0 обработчики вызываются в фоновом потоке QueueListener:
+    вызов logger.info в обработчике Telegram только кладет запись в очередь
+    и не ждет записи на диск. При переполнении очереди записи отбрасываются.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    logger.setLevel(getattr(logging, level.upper(), logging.INFO))
+    logger.handlers.clear()
+
+    handlers = build_handlers(log_dir, log_name, log_format,
+                              getattr(logging, console_level.upper(), logging.INFO), worker_index)
+    sampler = DebugSampler(debug_sample, debug_rate_limit) if debug_sample > 1 or debug_rate_limit > 0 else None
+
+    if queue_size <= 0:
+        # Фильтры логгера не видят записи дочерних логгеров (burncheckbot.*),
+        # поэтому без очереди сэмплер стоит на каждом обработчике
+        for handler in handlers:
+            if sampler is not None:
+                handler.addFilter(sampler)
+            logger.addHandler(handler)
+        return LoggingPipeline(handlers[0], sampler=sampler)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+    if sampler is not None:
+        queue_handler.addFilter(sampler)
+    logger.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    pipeline = LoggingPipeline(queue_handler, listener, sampler)
+    atexit.register(pipeline.stop)
+    return pipeline
@@ -0,0 +1,271 @@
+import functools
+import logging
+import math
+import time
+
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+from http_server import HttpResponse, HttpServer
+
+logger = logging.getLogger('burncheckbot.metrics')
+
+# Границы корзин гистограмм: длительности в секундах и размеры в байтах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (16 * 1024, 32 * 1024, 64 * 1024, 128 * 1024, 256 * 1024, 512 * 1024, 1024 * 1024, 2048 * 1024)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names, values) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    """Счетчик с метками; значения по набору меток"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield self.name, format_labels(self.label_names, label_values), value
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, как в Prometheus"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.values = {}  # метки -> [счетчики корзин..., сумма, количество]
+
+    def observe(self, value: float, *label_values) -> None:
+        entry = self.values.get(label_values)
+        if entry is None:
+            entry = self.values[label_values] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[index] += 1
+                break
+        entry[-2] += value
+        entry[-1] += 1
+
+    def samples(self):
+        for label_values, entry in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-2] + [entry[-1] - sum(entry[:-2])]):
+                cumulative += count
+                labels = format_labels(self.label_names + ('le',), label_values + (format_value(bound),))
+                yield f'{self.name}_bucket', labels, cumulative
+            labels = format_labels(self.label_names, label_values)
+            yield f'{self.name}_sum', labels, entry[-2]
+            yield f'{self.name}_count', labels, entry[-1]
+
+
+class CallbackMetric:
+    """Значение, которое читается при каждом запросе метрик
+
+    callback возвращает число или словарь {значения меток (кортеж): число}.
+    Подходит для счетчиков, которые уже ведут сами компоненты бота.
+    """
+
+    def __init__(self, name: str, help_text: str, callback, kind: str = 'gauge', label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.kind = kind
+        self.label_names = tuple(label_names)
+
+    def samples(self):
+        value = self.callback()
+        if isinstance(value, dict):
+            for label_values, item in value.items():
+                yield self.name, format_labels(self.label_names, label_values), item
+        else:
+            yield self.name, '', value
+
+
+class MetricsRegistry:
+    """Набор метрик процесса и вывод в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            return self.metrics[metric.name]
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names=()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def callback(self, name: str, help_text: str, callback, kind: str = 'gauge', label_names=()) -> CallbackMetric:
+        """Регистрация (или замена) метрики, значение которой берется из callback"""
+        metric = CallbackMetric(name, help_text, callback, kind, label_names)
+        self.metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.error(f"Ошибка при сборе метрики {metric.name}: {e}")
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in samples:
+                lines.append(f'{name}{labels} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Метрики процесса: модули регистрируют свои при импорте
+registry = MetricsRegistry()
+
+handler_duration = registry.histogram(
+    'burncheckbot_handler_duration_seconds', 'Время выполнения обработчиков и шагов диалога', ('handler',)
+)
+handler_errors = registry.counter(
+    'burncheckbot_handler_errors_total', 'Обработчики, завершившиеся исключением', ('handler',)
+)
+state_transitions = registry.counter(
+    'burncheckbot_state_transitions_total', 'Переходы между состояниями диалога теста', ('from_state', 'to_state')
+)
+api_duration = registry.histogram(
+    'burncheckbot_bot_api_duration_seconds', 'Время HTTP-запросов к Bot API по методам', ('method', 'status')
+)
+
+
+def timed(function):
+    """Декоратор корутины: время выполнения попадает в handler_duration под именем функции"""
+    name = function.__name__
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await function(*args, **kwargs)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_duration.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+def instrument_conversation(conversation: ConversationHandler, state_names: dict) -> None:
+    """Замер времени обработчиков диалога и подсчет переходов между состояниями
+
+    Колбэк каждого обработчика оборачивается: состояние «откуда» известно по
+    месту обработчика в диалоге, «куда» - по возвращенному значению (None -
+    состояние не меняется). Вызывать до добавления диалога в Application.
+    """
+    names = dict(state_names)
+    names[ConversationHandler.END] = 'END'
+    names[ConversationHandler.TIMEOUT] = 'TIMEOUT'
+
+    def wrap(handler, from_state: str) -> None:
+        callback = handler.callback
+        name = callback.__name__
+
+        async def wrapper(update, context):
+            started = time.perf_counter()
+            try:
+                new_state = await callback(update, context)
+            except Exception:
+                handler_errors.inc(name)
+                raise
+            finally:
+                handler_duration.observe(time.perf_counter() - started, name)
+            if new_state is not None:
+                state_transitions.inc(from_state, names.get(new_state, str(new_state)))
+            return new_state
+
+        wrapper.__name__ = name
+        handler.callback = wrapper
+
+    for handler in conversation.entry_points:
+        wrap(handler, 'START')
+    for state, handlers in conversation.states.items():
+        for handler in handlers:
+            wrap(handler, names.get(state, str(state)))
+    for handler in conversation.fallbacks:
+        wrap(handler, 'FALLBACK')
+
+
+def instrument_handler(handler) -> None:
+    """Замер времени обработчика вне диалога (команды администратора, /help)"""
+    handler.callback = timed(handler.callback)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest, замеряющий время каждого запроса к Bot API по имени метода"""
+
+    async def do_request(self, url: str, method: str, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        # Последний сегмент URL - имя метода; токен бота в метки не попадает
+        endpoint = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            code, payload = await super().do_request(
+                url, method, request_data, read_timeout, write_timeout, connect_timeout, pool_timeout
+            )
+            status = str(code)
+            return code, payload
+        finally:
+            api_duration.observe(time.perf_counter() - started, endpoint, status)
+
+
+class MetricsServer:
+    """Эндпоинт GET /metrics в текстовом формате Prometheus"""
+
+    def __init__(self, host: str, port: int, metrics_registry: MetricsRegistry = registry):
+        self.registry = metrics_registry
+        self.server = HttpServer(host, port, self.handle, max_connections=10, name='Metrics')
+
+    async def handle(self, request) -> HttpResponse:
+        if request.path != '/metrics':
+            return HttpResponse(404, b'Not Found')
+        if request.method != 'GET':
+            return HttpResponse(405, b'Method Not Allowed')
+        return HttpResponse(200, self.registry.render().encode('utf-8'), CONTENT_TYPE)
+
+    async def start(self) -> None:
+        await self.server.start()
+
+    async def stop(self) -> None:
+        await self.server.stop()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Скрипт для переноса статистики из stats.json (и журнала) в базу SQLite
+
+Использование: python3 migrate_stats.py [stats.json] [stats.db] [--journal stats.journal]
+После переноса установите STATS_BACKEND=sqlite в .env
+"""
+
+import argparse
+import os
+import sys
+
+from config import STATS_SNAPSHOT_PATH, STATS_JOURNAL_PATH, STATS_DB_PATH
+from stats_store import JournalStatsStore, SQLiteStatsStore
+
+def parse_migrate_args(argv=None) -> argparse.Namespace:
+    """Разбор аргументов: пути к снимку, базе и журналу (по умолчанию из config.py)"""
+    parser = argparse.ArgumentParser(description="Перенос статистики из stats.json и журнала в SQLite")
+    parser.add_argument('snapshot', nargs='?', default=STATS_SNAPSHOT_PATH,
+                        help=f"Снимок статистики (по умолчанию {STATS_SNAPSHOT_PATH})")
+    parser.add_argument('db', nargs='?', default=STATS_DB_PATH,
+                        help=f"База SQLite (по умолчанию {STATS_DB_PATH})")
+    parser.add_argument('--journal', default=STATS_JOURNAL_PATH,
+                        help=f"Журнал завершений (по умолчанию {STATS_JOURNAL_PATH})")
+    return parser.parse_args(argv)
+
+def migrate(snapshot_path: str, db_path: str, journal_path: str = STATS_JOURNAL_PATH):
+    """Переносит статистику из снимка и журнала в базу SQLite"""
+    if not os.path.exists(snapshot_path):
+        print(f"❌ Файл {snapshot_path} не найден")
+        return False
+
+    if os.path.exists(db_path):
+        print(f"❌ База {db_path} уже существует, перенос отменен")
+        return False
+
+    journal_store = JournalStatsStore(snapshot_path, journal_path)
+    journal_store.load()
+    data = journal_store.data
+
+    db_store = SQLiteStatsStore(db_path)
+    db_store.load()
+    db_store.import_stats(data)
+    db_store.compact()
+
+    print(f"✅ Перенесено пользователей: {len(data['users'])}")
+    print(f"✅ Завершенных тестов: {data['completed_tests']}")
+    print(f"📁 База: {db_path}")
+    return True
+
+if __name__ == "__main__":
+    args = parse_migrate_args()
+    sys.exit(0 if migrate(args.snapshot, args.db, args.journal) else 1)
@@ -0,0 +1,361 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from sessions import TestSession
+
+logger = logging.getLogger('burncheckbot.persistence')
+
+# Задержка перед записью: все изменения одного цикла обновления попадают в одну запись
+WRITE_DELAY = 0.1
+
+
+def session_from_json(data: str) -> TestSession:
+    """Восстановление сессии теста из сохраненного значения"""
+    return TestSession.from_bytes(bytes.fromhex(data))
+
+
+class JsonFileSessionBackend:
+    """Хранение состояния активных сессий в JSON-файле с атомарной заменой
+
+    Вместе со снимком хранится время последнего изменения каждого
+    пользователя; разговоры, user_data и сессии пользователей, не менявшихся
+    дольше max_age секунд, при загрузке отбрасываются.
+    """
+
+    # Файл каждый раз перезаписывается целиком снимком всех сессий
+    incremental = False
+
+    def __init__(self, path: str, max_age: float = None):
+        self.path = path
+        self.max_age = max_age
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if self.max_age is None:
+            return data
+
+        # Файлы без времени изменения (старый формат) загружаются целиком
+        now = time.time()
+        deadline = now - self.max_age
+        updated = data.get('updated', {})
+
+        def is_fresh(user_id) -> bool:
+            return updated.get(str(user_id), now) >= deadline
+
+        data['conversations'] = {
+            name: [[key, state] for key, state in states if is_fresh(key[-1])]
+            for name, states in data.get('conversations', {}).items()
+        }
+        data['user_data'] = {user_id: user_data for user_id, user_data in data.get('user_data', {}).items()
+                             if is_fresh(user_id)}
+        data['sessions'] = {user_id: session for user_id, session in data.get('sessions', {}).items()
+                            if is_fresh(user_id)}
+        return data
+
+    def save(self, snapshot: dict) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+SESSIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    conversation_key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, conversation_key)
+);
+
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id INTEGER PRIMARY KEY,
+    session BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteSessionBackend:
+    """Хранение сессий в SQLite построчно: несколько процессов бота делят одну базу
+
+    Записываются только изменившиеся пользователи и разговоры, поэтому
+    процессы не затирают данные друг друга. Сессии, разговоры и user_data,
+    не менявшиеся дольше max_age секунд, при загрузке удаляются. shard=(номер, всего) загружает
+    только пользователей с user_id % всего == номер - тех, чьи обновления
+    приходят в этот процесс.
+    """
+
+    incremental = True
+
+    def __init__(self, path: str, max_age: float, shard: tuple = None):
+        self.path = path
+        self.max_age = max_age
+        self.shard = shard
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            with self.conn:
+                self.conn.executescript(SESSIONS_SCHEMA)
+        return self.conn
+
+    def _is_own(self, user_id: int) -> bool:
+        return self.shard is None or user_id % self.shard[1] == self.shard[0]
+
+    def load(self) -> dict:
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                deadline = time.time() - self.max_age
+                for table in ('sessions', 'conversations', 'user_data'):
+                    conn.execute(f"DELETE FROM {table} WHERE updated_at < ?", (deadline,))
+            conversations = {}
+            for name, key, state in conn.execute("SELECT name, conversation_key, state FROM conversations"):
+                # Ключ разговора (chat_id, user_id) - шард определяется по последнему элементу
+                key = json.loads(key)
+                if self._is_own(key[-1]):
+                    conversations.setdefault(name, []).append([key, json.loads(state)])
+            return {
+                'conversations': conversations,
+                'user_data': {user_id: json.loads(data)
+                              for user_id, data in conn.execute("SELECT user_id, data FROM user_data")
+                              if self._is_own(user_id)},
+                'sessions': {user_id: session.hex()
+                             for user_id, session in conn.execute("SELECT user_id, session FROM sessions")
+                             if self._is_own(user_id)}
+            }
+
+    def save(self, changes: dict) -> None:
+        """Применение изменений одной транзакцией"""
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                for name, key, state in changes['conversations']:
+                    if state is None:
+                        conn.execute("DELETE FROM conversations WHERE name = ? AND conversation_key = ?",
+                                     (name, json.dumps(key)))
+                    else:
+                        conn.execute("INSERT OR REPLACE INTO conversations (name, conversation_key, state, updated_at) "
+                                     "VALUES (?, ?, ?, ?)", (name, json.dumps(key), json.dumps(state), now))
+                for user_id, data in changes['user_data'].items():
+                    if data is None:
+                        conn.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+                    else:
+                        conn.execute("INSERT OR REPLACE INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?)",
+                                     (user_id, json.dumps(data, ensure_ascii=False), now))
+                for user_id, session in changes['sessions'].items():
+                    if session is None:
+                        conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+                    else:
+                        conn.execute("INSERT OR REPLACE INTO sessions (user_id, session, updated_at) VALUES (?, ?, ?)",
+                                     (user_id, session, now))
+
+
+def create_session_backend(backend: str, path: str, max_age: float = None, shard: tuple = None):
+    """Создание хранилища сессий по имени бэкенда (file или sqlite)"""
+    if backend == 'file':
+        return JsonFileSessionBackend(path, max_age)
+    if backend == 'sqlite':
+        return SQLiteSessionBackend(path, max_age, shard)
+    raise ValueError(f"Неизвестный бэкенд сессий: {backend}")
+
+
+class SessionPersistence(BasePersistence):
+    """Сохранение незавершенных тестов между перезапусками
+
+    Хранит состояния ConversationHandler, user_data и ответы из user_answers
+    только для активных сессий: завершенные разговоры и пустые user_data
+    удаляются, поэтому время восстановления зависит от числа активных
+    пользователей, а не от всей истории; данные пользователей, неактивных
+    дольше срока хранения бэкенда, отбрасываются при загрузке. Изменения, которые Application
+    передает раз в update_interval секунд, записываются одной операцией:
+    снимком целиком или, для построчных бэкендов, только изменившиеся ключи.
+    """
+
+    def __init__(self, backend, sessions: dict, update_interval: float):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.backend = backend
+        self.sessions = sessions
+        self.user_data = None
+        self.conversations = None
+        self.write_task = None
+        self.dirty = False
+        self.changed_users = set()
+        self.changed_conversations = set()
+        # user_id -> время последнего изменения; построчные бэкенды ведут его сами
+        self.updated = {}
+
+    def _load(self) -> None:
+        if self.user_data is not None:
+            return
+        try:
+            data = self.backend.load()
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке сохраненных сессий: {e}")
+            data = {}
+
+        self.user_data = {int(user_id): user_data for user_id, user_data in data.get('user_data', {}).items()}
+        self.conversations = {
+            name: {tuple(key): state for key, state in states}
+            for name, states in data.get('conversations', {}).items()
+        }
+        for user_id, session in data.get('sessions', {}).items():
+            self.sessions[int(user_id)] = session_from_json(session)
+        self.updated = {int(user_id): updated_at for user_id, updated_at in data.get('updated', {}).items()}
+        logger.info(f"Восстановлено сессий: {len(self.sessions)}, разговоров: "
+                    f"{sum(len(states) for states in self.conversations.values())}")
+
+    def _snapshot(self) -> dict:
+        sessions = {user_id: session.to_bytes().hex() for user_id, session in self.sessions.items()}
+        # Время изменения хранится только для пользователей, которые есть в снимке
+        present = set(self.user_data) | set(sessions)
+        present.update(key[-1] for states in self.conversations.values() for key in states)
+        now = time.time()
+        self.updated = {user_id: self.updated.get(user_id, now) for user_id in present}
+        return {
+            'conversations': {name: [[list(key), state] for key, state in states.items()]
+                              for name, states in self.conversations.items()},
+            'user_data': self.user_data,
+            'sessions': {str(user_id): session for user_id, session in sessions.items()},
+            'updated': {str(user_id): updated_at for user_id, updated_at in self.updated.items()}
+        }
+
+    def _changes(self) -> dict:
+        users, self.changed_users = self.changed_users, set()
+        conversations, self.changed_conversations = self.changed_conversations, set()
+        sessions = {}
+        for user_id in users:
+            session = self.sessions.peek(user_id)
+            sessions[user_id] = session.to_bytes() if session is not None else None
+        return {
+            'conversations': [(name, list(key), self.conversations.get(name, {}).get(key))
+                              for name, key in conversations],
+            'user_data': {user_id: self.user_data.get(user_id) for user_id in users},
+            'sessions': sessions
+        }
+
+    def _schedule_write(self) -> None:
+        self.dirty = True
+        if self.write_task is None or self.write_task.done():
+            self.write_task = asyncio.create_task(self._delayed_write())
+
+    async def _delayed_write(self) -> None:
+        # Изменения, пришедшие во время записи, попадут в следующую итерацию
+        while self.dirty:
+            await asyncio.sleep(WRITE_DELAY)
+            self.dirty = False
+            await self._write()
+
+    async def _write(self) -> None:
+        if not self.backend.incremental:
+            payload = self._snapshot()
+        elif self.changed_users or self.changed_conversations:
+            payload = self._changes()
+        else:
+            return
+        try:
+            await asyncio.to_thread(self.backend.save, payload)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении сессий: {e}")
+            if self.backend.incremental:
+                # Несохраненные ключи попадут в следующую запись
+                self.changed_users.update(payload['user_data'])
+                self.changed_conversations.update((name, tuple(key)) for name, key, _ in payload['conversations'])
+
+    async def get_user_data(self):
+        self._load()
+        return {user_id: dict(user_data) for user_id, user_data in self.user_data.items()}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str):
+        self._load()
+        return dict(self.conversations.get(name, {}))
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        states = self.conversations.setdefault(name, {})
+        if new_state is None:
+            states.pop(key, None)
+        else:
+            states[key] = new_state
+        if not self.backend.incremental:
+            self.updated[key[-1]] = time.time()
+        self.changed_conversations.add((name, key))
+        self._schedule_write()
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        if data:
+            self.user_data[user_id] = data
+        else:
+            self.user_data.pop(user_id, None)
+        # Сессия теста пользователя меняется вместе с его user_data
+        if not self.backend.incremental:
+            self.updated[user_id] = time.time()
+        self.changed_users.add(user_id)
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self.user_data.pop(user_id, None)
+        self.changed_users.add(user_id)
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id: int, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Финальная запись при остановке бота"""
+        if self.write_task is not None and not self.write_task.done():
+            await self.write_task
+        if self.user_data is not None:
+            await self._write()
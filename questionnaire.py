@@ -0,0 +1,57 @@
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import TEST_QUESTIONS
+from sessions import PHASE_OFFSETS, TOTAL_QUESTIONS
+
+# Клавиатура ответа одинакова для всех вопросов
+ANSWER_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("✅ Согласен", callback_data="answer_1"),
+        InlineKeyboardButton("❌ Не согласен", callback_data="answer_0")
+    ]
+])
+
+
+class QuestionScreen:
+    """Готовый к отправке экран вопроса: текст и клавиатура"""
+
+    __slots__ = ('text', 'reply_markup')
+
+    def __init__(self, text: str, reply_markup: InlineKeyboardMarkup):
+        self.text = text
+        self.reply_markup = reply_markup
+
+
+class Questionnaire:
+    """Экраны всех вопросов теста, собранные один раз из TEST_QUESTIONS
+
+    Номер вопроса в общей нумерации и общее число вопросов подставляются
+    при сборке, поэтому обработчику ответа остается выбрать экран по фазе
+    и номеру вопроса внутри фазы.
+    """
+
+    def __init__(self, test_questions):
+        self.total_questions = TOTAL_QUESTIONS
+        self.screens = []
+        for phase_index, phase_data in enumerate(test_questions):
+            phase_screens = []
+            for question_index, question in enumerate(phase_data['questions']):
+                question_text = f"""
+📝 *Тестирование фазы: {phase_data['phase']}*
+
+Вопрос {PHASE_OFFSETS[phase_index] + question_index + 1} из {self.total_questions}:
+
+{question}
+"""
+                phase_screens.append(QuestionScreen(question_text, ANSWER_KEYBOARD))
+            self.screens.append(phase_screens)
+
+    def screen(self, phase_index: int, question_index: int) -> QuestionScreen:
+        """Экран вопроса question_index фазы phase_index"""
+        return self.screens[phase_index][question_index]
+
+    def phase_length(self, phase_index: int) -> int:
+        return len(self.screens[phase_index])
+
+
+questionnaire = Questionnaire(TEST_QUESTIONS)
@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from datetime import timedelta
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger('burncheckbot.rate_limiter')
+
+# Приоритеты исходящих запросов: меньше - раньше
+PRIORITY_INTERACTIVE = 0  # Срочные отправки (задается через rate_limit_args)
+PRIORITY_MESSAGE = 1  # Обычные сообщения
+PRIORITY_BULK = 2  # Тяжелые отправки: грамоты, выгрузки
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_MESSAGE: 'message', PRIORITY_BULK: 'bulk'}
+
+# Методы, которые отправляют или меняют сообщения и подпадают под лимиты Telegram.
+# Остальные (getChatMember, answerCallbackQuery, getMe...) выполняются сразу
+ENDPOINT_PRIORITIES = {
+    'editMessageText': PRIORITY_INTERACTIVE,
+    'editMessageReplyMarkup': PRIORITY_INTERACTIVE,
+    'editMessageCaption': PRIORITY_INTERACTIVE,
+    'sendMessage': PRIORITY_MESSAGE,
+    'forwardMessage': PRIORITY_MESSAGE,
+    'copyMessage': PRIORITY_MESSAGE,
+    'sendPhoto': PRIORITY_BULK,
+    'sendDocument': PRIORITY_BULK,
+    'sendMediaGroup': PRIORITY_BULK,
+}
+
+# Пауза между повторами при сетевой ошибке: экспоненциальная, не больше MAX_BACKOFF секунд
+MAX_BACKOFF = 30
+# Случайная добавка к паузе, чтобы повторы не приходили пачкой
+RETRY_JITTER = 1.0
+# При таком числе корзин чатов из словаря удаляются полностью восстановившиеся
+CHAT_BUCKETS_PRUNE_SIZE = 10000
+
+
+class TokenBucket:
+    """Корзина токенов с резервированием: каждый запрос получает свое время отправки"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Резервирует токен; возвращает, сколько секунд подождать до отправки"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class PriorityRateLimiter(BaseRateLimiter):
+    """Ограничение исходящих запросов к Bot API с приоритетами и повторами
+
+    Запрос сначала ждет своей очереди в корзине чата (per_chat_rate в секунду;
+    редактирование сообщений в ответ на нажатия - в отдельной корзине с
+    edit_rate в секунду, чтобы ответы на кнопки не ждали лимита отправки).
+    Отправка сообщений и грамот затем ждет общего токена (global_rate в
+    секунду); редактирование общий лимит не расходует и ограничено только
+    корзиной чата. Общие токены выдаются по приоритету: текст раньше грамот и
+    документов. При 429 все запросы приостанавливаются на retry_after,
+    запрос повторяется со случайной добавкой к паузе; сетевые ошибки
+    повторяются с экспоненциальной паузой. Приоритет вызова можно задать через
+    rate_limit_args={'priority': ...}.
+    """
+
+    def __init__(self, global_rate: float, per_chat_rate: float, chat_burst: int, max_retries: int,
+                 edit_rate: float = None):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.chat_burst = chat_burst
+        self.edit_rate = edit_rate if edit_rate is not None else per_chat_rate
+        self.max_retries = max_retries
+        self.chat_buckets = {}
+        self.waiting = []  # Куча (приоритет, порядковый номер, future)
+        self.counter = itertools.count()
+        self.wakeup = None
+        self.dispatcher = None
+        self.paused_until = 0.0
+        self.chat_waiting = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.flood_waits = 0
+
+    async def initialize(self) -> None:
+        # В режиме polling бот инициализируется дважды (Application и Updater):
+        # второй диспетчер удвоил бы общий лимит
+        if self.dispatcher is not None:
+            return
+        self.wakeup = asyncio.Event()
+        self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self) -> None:
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            await asyncio.gather(self.dispatcher, return_exceptions=True)
+            self.dispatcher = None
+        for _, _, future in self.waiting:
+            future.cancel()
+        self.waiting.clear()
+
+    def queue_lengths(self) -> dict:
+        """Число запросов, ожидающих общего токена, по приоритетам и в очередях чатов"""
+        lengths = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future in self.waiting:
+            if not future.done():
+                lengths[PRIORITY_NAMES.get(priority, 'bulk')] += 1
+        lengths['per_chat'] = self.chat_waiting
+        return lengths
+
+    async def _dispatch(self) -> None:
+        while True:
+            if not self.waiting:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            # После 429 отправки стоят до конца паузы
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+
+            delay = self.global_bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # За время ожидания мог прийти запрос с более высоким приоритетом
+            while self.waiting:
+                _, _, future = heapq.heappop(self.waiting)
+                if not future.done():
+                    future.set_result(None)
+                    break
+
+    def _chat_bucket(self, chat_id, interactive: bool) -> TokenBucket:
+        # Ключ (чат, редактирование): у отправки и редактирования свои корзины
+        bucket = self.chat_buckets.get((chat_id, interactive))
+        if bucket is None:
+            if len(self.chat_buckets) >= CHAT_BUCKETS_PRUNE_SIZE:
+                now = time.monotonic()
+                self.chat_buckets = {key: value for key, value in self.chat_buckets.items() if not value.is_full(now)}
+            if interactive:
+                bucket = TokenBucket(self.edit_rate, max(self.edit_rate, self.chat_burst))
+            else:
+                bucket = TokenBucket(self.per_chat_rate, self.chat_burst)
+            self.chat_buckets[(chat_id, interactive)] = bucket
+        return bucket
+
+    async def _acquire(self, chat_id, priority: int, interactive: bool = False) -> None:
+        if chat_id is not None:
+            delay = self._chat_bucket(chat_id, interactive).reserve()
+            if delay > 0:
+                self.chat_waiting += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self.chat_waiting -= 1
+
+        if interactive:
+            # Ответы на нажатия не ждут общего лимита отправки, только паузы после 429
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (priority, next(self.counter), future))
+        self.wakeup.set()
+        await future
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = ENDPOINT_PRIORITIES.get(endpoint)
+        if priority is None or self.dispatcher is None:
+            return await callback(*args, **kwargs)
+        # Корзина чата выбирается по методу, даже если приоритет задан явно
+        interactive = priority == PRIORITY_INTERACTIVE
+        if isinstance(rate_limit_args, dict):
+            priority = rate_limit_args.get('priority', priority)
+        chat_id = data.get('chat_id')
+
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority, interactive)
+            self.in_flight += 1
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                self.flood_waits += 1
+                wait = retry_after_seconds(e)
+                self.paused_until = max(self.paused_until, time.monotonic() + wait)
+                logger.warning(f"Telegram просит подождать {wait} с ({endpoint}, чат {chat_id})")
+                delay = wait + random.uniform(0, RETRY_JITTER)
+            except (BadRequest, TimedOut):
+                # Ошибка запроса или таймаут, после которого сообщение могло уже уйти, - не повторяем
+                raise
+            except NetworkError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Сетевая ошибка {endpoint} (попытка {attempt + 1}), повтор через {delay:.1f} с: {e}")
+            finally:
+                self.in_flight -= 1
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
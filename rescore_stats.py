@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Скрипт для пересчета сохраненных результатов после изменения ключей или порогов
+(SCORING_KEYS, THRESHOLD_PERCENTAGES, TOTAL_SCORE_THRESHOLDS) в config.py
+
+Использование: python3 rescore_stats.py [--dry-run]
+Запускайте при остановленном боте: хранилище выбирается по STATS_BACKEND.
+Результаты с сохраненными ответами пересчитываются полностью, старые
+результаты без ответов - по сохраненному общему баллу.
+"""
+
+import sys
+
+from config import STATS_BACKEND, STATS_SNAPSHOT_PATH, STATS_JOURNAL_PATH, STATS_DB_PATH
+from scoring import rescore_results
+from stats_store import create_stats_store
+
+def rescore(dry_run: bool):
+    """Пересчитывает результаты в хранилище статистики"""
+    store = create_stats_store(STATS_BACKEND, STATS_SNAPSHOT_PATH, STATS_JOURNAL_PATH, STATS_DB_PATH)
+    store.load()
+    changes = store.rescore(rescore_results, dry_run=dry_run)
+
+    if not changes:
+        print("✅ Все результаты соответствуют текущим настройкам")
+        return True
+
+    for (old_level, new_level), count in sorted(changes.items(), key=lambda item: -item[1]):
+        print(f"• {old_level} → {new_level}: {count}")
+    total = sum(changes.values())
+    if dry_run:
+        print(f"🔍 Будет изменено результатов: {total} (запуск без --dry-run применит изменения)")
+    else:
+        print(f"✅ Изменено результатов: {total}")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if rescore('--dry-run' in sys.argv[1:]) else 1)
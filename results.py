@@ -0,0 +1,121 @@
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import INTERPRETATION, CHANNEL_NAME, CHANNEL_LINK
+from scoring import PHASE_NAMES
+from sessions import TOTAL_QUESTIONS
+
+# Клавиатура экрана результатов одинакова для всех пользователей
+RESULTS_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔄 Пройти тест заново", callback_data="restart")],
+    [InlineKeyboardButton("ℹ️ О методике", callback_data="about")]
+])
+
+
+def results_key(result) -> tuple:
+    """Баллы фаз (None - фаза не пройдена полностью): по ним однозначно определяются уровни и текст"""
+    return tuple(result.phase_scores.get(phase_name) for phase_name in PHASE_NAMES)
+
+
+def render_results(result) -> str:
+    """Текст экрана результатов"""
+    results_text = "📊 *Результаты диагностики эмоционального выгорания*\n\n"
+
+    total_score = result.total_score
+    completed_phases = result.completed_phases
+
+    for phase_name in PHASE_NAMES:
+        if phase_name in result.phase_scores:
+            results_text += f"🔸 *{phase_name}:* {result.phase_scores[phase_name]}/10 баллов\n"
+            results_text += f"   {INTERPRETATION[phase_name][result.phase_levels[phase_name]]}\n\n"
+        else:
+            # Фаза не пройдена полностью
+            results_text += f"🔸 *{phase_name}:* не пройдена\n\n"
+
+    # Полный тест пройден
+    results_text += f"📈 *Общий балл:* {total_score}/30\n\n"
+
+    if result.total_level == "low":
+        results_text += "✅ *Общий результат:* Маленький Пиздец эмоционального выгорания"
+    elif result.total_level == "medium":
+        results_text += "⚠️ *Общий результат:* Средний Пиздец эмоционального выгорания"
+    else:
+        results_text += "🚨 *Общий результат:* Большой Пиздец эмоционального выгорания"
+
+    results_text += "\n\n💡 *Рекомендации:*\n"
+
+    is_full_test = result.is_full_test
+
+    # Общий уровень для рекомендаций: по общему баллу для полного теста,
+    # по среднему баллу фазы для отдельных фаз
+    recommendation_level = result.level
+
+    if recommendation_level == "high":
+        results_text += "🚨 *Большой Пиздец эмоционального выгорания:*\n"
+        results_text += "Ты перегорел.\n"
+        results_text += "Это уже не просто усталость. Выгорание влияет на тело, психику, интерес к жизни. Само не пройдёт. Нужно осознанно перезагружаться.\n\n"
+        results_text += "Совет:\n"
+        results_text += "Не дави на себя. Сейчас не время «взять себя в руки» — время поменять ритм и вложиться в восстановление. Новое знание, смена фокуса, простые переключения — всё это может стать спасением.\n\n"
+        results_text += f"👉 В [{CHANNEL_NAME}]({CHANNEL_LINK}) я делюсь личным опытом, инструментами и мыслями, которые помогают выйти из этого состояния"
+    elif recommendation_level == "medium":
+        results_text += "⚠️ *Средний Пиздец эмоционального выгорания:*\n"
+        results_text += "Ты в зоне риска.\n"
+        results_text += "Скорее всего, ты замечаешь раздражительность, усталость, прокрастинацию. Это не «просто лень» — это сигнал, что ты выдыхаешься.\n\n"
+        results_text += "Совет:\n"
+        results_text += "Остановись. Переключи внимание. Разгрузи голову — новыми темами, средой, впечатлениями. Иногда нужно не усилие, а выход из круга.\n\n"
+        results_text += f"👉 В [{CHANNEL_NAME}]({CHANNEL_LINK}) я как раз об этом — как не потерять себя в выгорании, где брать энергию, как менять мышление. Залетай, это важно."
+    else:
+        results_text += "✅ *Маленький Пиздец эмоционального выгорания:*\n"
+        results_text += "Ты держишься молодцом.\n"
+        results_text += "Судя по результатам, ты пока не на грани — но не забывай: ресурс конечен. Даже если ты не выгораешь, усталость накапливается незаметно.\n\n"
+        results_text += "Совет:\n"
+        results_text += "Меняй контекст, пробуй новое, переключай внимание. Лучше отдыхать на опережение, чем потом собирать себя по кускам.\n\n"
+        results_text += f"👉 Я пишу об этом в канале [{CHANNEL_NAME}]({CHANNEL_LINK}): как сохранять интерес, энергию и не закиснуть."
+
+    # Добавляем предупреждение, если пройдены не все фазы
+    if not is_full_test or completed_phases < 3:
+        results_text += "\n\n⚠️ *Важно:*\n"
+        results_text += f"Ты прошёл только часть теста. Для более точной диагностики рекомендуется пройти полный тест из {TOTAL_QUESTIONS} вопросов.\n\n"
+        results_text += "🔍 *Полный тест включает:*\n"
+        results_text += "• 10 вопросов на фазу «Напряжение»\n"
+        results_text += "• 10 вопросов на фазу «Резистенция»\n"
+        results_text += "• 10 вопросов на фазу «Истощение»\n\n"
+        results_text += "Это даст более точную картину твоего эмоционального состояния."
+
+    return results_text
+
+
+class ResultsPages:
+    """Готовые экраны результатов по баллам фаз
+
+    Текст зависит только от баллов фаз (уровни и общий балл выводятся из них
+    по порогам config.py), поэтому различных экранов немного: 11x11x11 для
+    полного теста и варианты с непройденными фазами. Экран собирается при
+    первом запросе и хранится в ограниченном LRU-кэше. Пороги, интерпретации
+    и ссылка на канал читаются из config.py один раз при импорте (как и
+    таблицы scoring.py): после их изменения бота нужно перезапустить.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def get(self, result) -> tuple:
+        """Текст и клавиатура экрана результатов"""
+        key = results_key(result)
+        text = self.pages.get(key)
+        if text is None:
+            self.misses += 1
+            text = self.pages[key] = render_results(result)
+            if len(self.pages) > self.max_size:
+                self.pages.popitem(last=False)
+        else:
+            self.hits += 1
+            self.pages.move_to_end(key)
+        return text, RESULTS_KEYBOARD
@@ -0,0 +1,220 @@
+import struct
+
+from config import (
+    TEST_QUESTIONS, SCORING_KEYS, THRESHOLDS, TOTAL_SCORE_THRESHOLDS, AVERAGE_SCORE_THRESHOLDS
+)
+from sessions import PHASE_OFFSETS, PHASE_SIZES
+
+# Уровни выгорания (код уровня - индекс в кортеже) и их названия в результатах и статистике
+LEVELS = ('low', 'medium', 'high')
+LEVEL_NAMES = {
+    'low': "Маленький Пиздец",
+    'medium': "Средний Пиздец",
+    'high': "Большой Пиздец"
+}
+# Код уровня для фазы, пройденной не полностью
+NO_LEVEL = 255
+
+PHASE_NAMES = [phase_data["phase"] for phase_data in TEST_QUESTIONS]
+
+# Каждый пользователь занимает 32-битную полосу большого целого числа,
+# поэтому все операции ниже считаются сразу для всей пачки ответов
+LANE_BITS = 32
+LANE_BYTES = LANE_BITS // 8
+LANE_MASK = (1 << LANE_BITS) - 1
+_LANES_STRUCT_FORMAT = '<{}I'
+
+assert sum(PHASE_SIZES) <= LANE_BITS - 2, "Ответы не помещаются в 32-битную полосу"
+
+
+def _level_code(value: int, thresholds: dict) -> int:
+    if value <= thresholds["low"]:
+        return 0
+    if value <= thresholds["medium"]:
+        return 1
+    return 2
+
+
+def build_tables():
+    """Предвычисление масок ключей и таблиц уровней из текущего config.py"""
+    key_mask = 0
+    phase_masks = []
+    phase_tables = []
+    for phase_index, phase_name in enumerate(PHASE_NAMES):
+        offset = PHASE_OFFSETS[phase_index]
+        size = PHASE_SIZES[phase_index]
+        phase_masks.append(((1 << size) - 1) << offset)
+        for question_index, key in enumerate(SCORING_KEYS[phase_name]):
+            if key:
+                key_mask |= 1 << (offset + question_index)
+
+        # Ключ таблицы: балл фазы + 16, если фаза пройдена полностью
+        table = bytearray([NO_LEVEL] * 256)
+        for score in range(size + 1):
+            if score <= THRESHOLDS[phase_name]["medium"]:
+                table[16 + score] = 0
+            elif score <= THRESHOLDS[phase_name]["high"]:
+                table[16 + score] = 1
+            else:
+                table[16 + score] = 2
+        phase_tables.append(bytes(table))
+
+    # Общий уровень по сумме баллов; для неполного теста - по среднему баллу фазы.
+    # Ключ таблицы: сумма баллов * 4 + число пройденных фаз
+    total_table = bytearray(256)
+    overall_table = bytearray(256)
+    phase_count = len(PHASE_NAMES)
+    for total in range(sum(PHASE_SIZES) + 1):
+        for completed in range(phase_count + 1):
+            key = total * 4 + completed
+            total_table[key] = _level_code(total, TOTAL_SCORE_THRESHOLDS)
+            if completed == phase_count:
+                overall_table[key] = total_table[key]
+            else:
+                average = total / completed if completed > 0 else 0
+                overall_table[key] = _level_code(average, AVERAGE_SCORE_THRESHOLDS)
+    return key_mask, phase_masks, phase_tables, bytes(total_table), bytes(overall_table)
+
+
+KEY_MASK, PHASE_MASKS, PHASE_LEVEL_TABLES, TOTAL_LEVEL_TABLE, OVERALL_LEVEL_TABLE = build_tables()
+
+
+def _pack(values, count: int) -> int:
+    return int.from_bytes(struct.pack(_LANES_STRUCT_FORMAT.format(count), *values), 'little')
+
+
+def _lane_bytes(packed: int, count: int) -> bytes:
+    # Результат каждой полосы лежит в ее младшем байте
+    return packed.to_bytes(count * LANE_BYTES, 'little')[::LANE_BYTES]
+
+
+def _popcount_lanes(x: int, ones: int) -> int:
+    """Число единичных бит в каждой полосе (SWAR); маски не дают битам перетекать между полосами"""
+    x = x - ((x >> 1) & (0x55555555 * ones))
+    x = (x & (0x33333333 * ones)) + ((x >> 2) & (0x33333333 * ones))
+    x = (x + (x >> 4)) & (0x0F0F0F0F * ones)
+    x = x + (x >> 8)
+    return (x + (x >> 16)) & (0xFF * ones)
+
+
+class BatchScores:
+    """Результаты пачки ответов: по байту на пользователя в каждом поле
+
+    phase_scores и phase_levels - списки по фазам (уровень NO_LEVEL, если фаза
+    пройдена не полностью), total_scores - сумма баллов пройденных фаз,
+    total_levels - уровень по сумме баллов, levels - общий уровень.
+    """
+
+    __slots__ = ('phase_scores', 'phase_levels', 'total_scores', 'completed_phases', 'total_levels', 'levels')
+
+    def __init__(self, phase_scores, phase_levels, total_scores, completed_phases, total_levels, levels):
+        self.phase_scores = phase_scores
+        self.phase_levels = phase_levels
+        self.total_scores = total_scores
+        self.completed_phases = completed_phases
+        self.total_levels = total_levels
+        self.levels = levels
+
+    def __len__(self) -> int:
+        return len(self.total_scores)
+
+
+def score_batch(answers, answered) -> BatchScores:
+    """Подсчет баллов и уровней для последовательностей масок ответов одним проходом"""
+    count = len(answers)
+    if count == 0:
+        return BatchScores([b''] * len(PHASE_NAMES), [b''] * len(PHASE_NAMES), b'', b'', b'', b'')
+
+    ones = _pack([1] * count, count)
+    answers_packed = _pack(answers, count)
+    answered_packed = _pack(answered, count)
+    # Бит ответа засчитывается, если совпадает с ключом и на вопрос ответили
+    matches = (answers_packed ^ (KEY_MASK * ones) ^ (LANE_MASK * ones)) & answered_packed
+
+    phase_scores = []
+    phase_levels = []
+    total = 0
+    completed = 0
+    for phase_index, phase_mask in enumerate(PHASE_MASKS):
+        score = _popcount_lanes(matches & (phase_mask * ones), ones)
+        answered_count = _popcount_lanes(answered_packed & (phase_mask * ones), ones)
+        # Число ответов + (32 - размер фазы) достигает 32 только у полностью пройденной фазы
+        is_complete = ((answered_count + (32 - PHASE_SIZES[phase_index]) * ones) >> 5) & ones
+        # Баллы неполных фаз обнуляются маской 0xFF в полосах пройденных фаз
+        score &= (is_complete << 8) - is_complete
+        phase_scores.append(_lane_bytes(score, count))
+        phase_levels.append(_lane_bytes(score + (is_complete << 4), count).translate(PHASE_LEVEL_TABLES[phase_index]))
+        total += score
+        completed += is_complete
+
+    level_keys = _lane_bytes(total * 4 + completed, count)
+    return BatchScores(
+        phase_scores,
+        phase_levels,
+        _lane_bytes(total, count),
+        _lane_bytes(completed, count),
+        level_keys.translate(TOTAL_LEVEL_TABLE),
+        level_keys.translate(OVERALL_LEVEL_TABLE)
+    )
+
+
+class ScoreResult:
+    """Результат одной сессии теста"""
+
+    __slots__ = ('phase_scores', 'phase_levels', 'total_score', 'completed_phases', 'total_level', 'level')
+
+    def __init__(self, batch: BatchScores, row: int = 0):
+        # Фазы, пройденные не полностью, в словари не попадают
+        self.phase_scores = {}
+        self.phase_levels = {}
+        for phase_index, phase_name in enumerate(PHASE_NAMES):
+            level_code = batch.phase_levels[phase_index][row]
+            if level_code != NO_LEVEL:
+                self.phase_scores[phase_name] = batch.phase_scores[phase_index][row]
+                self.phase_levels[phase_name] = LEVELS[level_code]
+        self.total_score = batch.total_scores[row]
+        self.completed_phases = batch.completed_phases[row]
+        self.total_level = LEVELS[batch.total_levels[row]]
+        self.level = LEVELS[batch.levels[row]]
+
+    @property
+    def is_full_test(self) -> bool:
+        return self.completed_phases == len(PHASE_NAMES)
+
+    @property
+    def level_name(self) -> str:
+        return LEVEL_NAMES[self.level]
+
+
+def score_session(session) -> ScoreResult:
+    """Подсчет результатов одной сессии теста"""
+    return ScoreResult(score_batch([session.answers], [session.answered]))
+
+
+def rescore_results(results) -> list:
+    """Пересчет сохраненных результатов полного теста по текущим ключам и порогам
+
+    results - словари с level, score и необязательной парой масок answers.
+    Возвращает пары (название уровня, балл). Результаты без сохраненных
+    ответов пересчитываются по общему баллу, а без балла остаются прежними.
+    """
+    rescored = []
+    with_answers = []
+    for index, result in enumerate(results):
+        score = result.get('score')
+        if result.get('answers'):
+            with_answers.append(index)
+            rescored.append(None)
+        elif score is None:
+            rescored.append((result.get('level'), score))
+        else:
+            level_code = TOTAL_LEVEL_TABLE[min(score, sum(PHASE_SIZES)) * 4 + len(PHASE_NAMES)]
+            rescored.append((LEVEL_NAMES[LEVELS[level_code]], score))
+
+    batch = score_batch(
+        [results[index]['answers'][0] for index in with_answers],
+        [results[index]['answers'][1] for index in with_answers]
+    )
+    for row, index in enumerate(with_answers):
+        rescored[index] = (LEVEL_NAMES[LEVELS[batch.levels[row]]], batch.total_scores[row])
+    return rescored
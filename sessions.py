@@ -0,0 +1,167 @@
+import logging
+import struct
+import time
+from collections import OrderedDict
+
+from config import TEST_QUESTIONS
+
+logger = logging.getLogger('burncheckbot.sessions')
+
+# Смещение первого вопроса каждой фазы в общей нумерации вопросов
+PHASE_OFFSETS = []
+_offset = 0
+for _phase_data in TEST_QUESTIONS:
+    PHASE_OFFSETS.append(_offset)
+    _offset += len(_phase_data["questions"])
+TOTAL_QUESTIONS = _offset
+
+PHASE_SIZES = [len(phase_data["questions"]) for phase_data in TEST_QUESTIONS]
+
+# Формат сериализации: ответы, маска отвеченных вопросов, фаза, вопрос и флаги
+_SESSION_STRUCT = struct.Struct('<IIBB')
+FULL_TEST_FLAG = 0x80
+RECORDED_FLAG = 0x40  # Результат уже учтен в статистике
+QUESTION_MASK = 0x3F
+
+
+class ResultSnapshot:
+    """Результат завершенного теста: баллы и готовый экран результатов"""
+
+    __slots__ = ('result', 'text', 'reply_markup')
+
+    def __init__(self, result, text: str, reply_markup):
+        self.result = result
+        self.text = text
+        self.reply_markup = reply_markup
+
+
+class TestSession:
+    """Сессия прохождения теста
+
+    Ответы хранятся битовыми масками: бит с номером вопроса в общей нумерации
+    в answers — ответ (1 - согласен), в answered — признак того, что на вопрос
+    уже ответили. Текущая позиция — номер фазы и вопроса внутри фазы.
+
+    snapshot — результат, посчитанный при первом показе (в файл не
+    сохраняется), recorded — признак того, что завершение теста уже
+    записано в статистику.
+    """
+
+    __slots__ = ('phase', 'question', 'full_test', 'answers', 'answered', 'recorded', 'snapshot')
+
+    def __init__(self, phase: int = 0, full_test: bool = True, question: int = 0,
+                 answers: int = 0, answered: int = 0, recorded: bool = False):
+        self.phase = phase
+        self.question = question
+        self.full_test = full_test
+        self.answers = answers
+        self.answered = answered
+        self.recorded = recorded
+        self.snapshot = None
+
+    def record(self, answer: int) -> None:
+        """Сохранение ответа на текущий вопрос и переход к следующему"""
+        bit = 1 << (PHASE_OFFSETS[self.phase] + self.question)
+        self.answered |= bit
+        if answer:
+            self.answers |= bit
+        else:
+            self.answers &= ~bit
+        self.question += 1
+        self.snapshot = None
+
+    def phase_answers(self, phase_index: int) -> dict:
+        """Ответы фазы: номер вопроса в фазе -> ответ"""
+        offset = PHASE_OFFSETS[phase_index]
+        return {
+            question_index: (self.answers >> (offset + question_index)) & 1
+            for question_index in range(PHASE_SIZES[phase_index])
+            if (self.answered >> (offset + question_index)) & 1
+        }
+
+    def to_bytes(self) -> bytes:
+        """Сериализация сессии в 10 байт"""
+        flags = self.question | (FULL_TEST_FLAG if self.full_test else 0) | (RECORDED_FLAG if self.recorded else 0)
+        return _SESSION_STRUCT.pack(self.answers, self.answered, self.phase, flags)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TestSession':
+        """Восстановление сессии из байт"""
+        answers, answered, phase, flags = _SESSION_STRUCT.unpack(data)
+        return cls(phase, bool(flags & FULL_TEST_FLAG), flags & QUESTION_MASK, answers, answered,
+                   bool(flags & RECORDED_FLAG))
+
+
+class SessionManager:
+    """Активные сессии теста с вытеснением неактивных
+
+    Ведет себя как словарь user_id -> TestSession. Каждое обращение обновляет
+    время последней активности и переносит сессию в конец порядка LRU. Сессии,
+    к которым не обращались дольше idle_ttl секунд, удаляет sweep(); при
+    превышении max_sessions сразу вытесняется самая давно неактивная сессия.
+    on_evict(user_id), если задан, вызывается для каждой удаленной так сессии,
+    чтобы вместе с ней удалялись остальные данные пользователя.
+    """
+
+    def __init__(self, idle_ttl: float, max_sessions: int):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()  # user_id -> (сессия, время последней активности)
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+        self.on_evict = None
+
+    def __getitem__(self, user_id: int) -> TestSession:
+        session, _ = self.sessions[user_id]
+        self.sessions[user_id] = (session, time.monotonic())
+        self.sessions.move_to_end(user_id)
+        return session
+
+    def get(self, user_id: int):
+        if user_id not in self.sessions:
+            return None
+        return self[user_id]
+
+    def peek(self, user_id: int):
+        """Сессия без обновления времени активности (для сохранения) или None"""
+        entry = self.sessions.get(user_id)
+        return entry[0] if entry is not None else None
+
+    def __setitem__(self, user_id: int, session: TestSession) -> None:
+        self.sessions[user_id] = (session, time.monotonic())
+        self.sessions.move_to_end(user_id)
+        while len(self.sessions) > self.max_sessions:
+            evicted_id, _ = self.sessions.popitem(last=False)
+            self.evicted_capacity += 1
+            logger.info(f"Сессия пользователя {evicted_id} вытеснена: превышен лимит {self.max_sessions}")
+            if self.on_evict is not None:
+                self.on_evict(evicted_id)
+
+    def __delitem__(self, user_id: int) -> None:
+        del self.sessions[user_id]
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.sessions
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def items(self):
+        """Пары user_id -> сессия без обновления времени активности"""
+        return [(user_id, session) for user_id, (session, _) in self.sessions.items()]
+
+    def sweep(self) -> int:
+        """Удаление сессий, неактивных дольше idle_ttl; возвращает их число"""
+        deadline = time.monotonic() - self.idle_ttl
+        evicted = 0
+        # Сессии упорядочены по времени активности, поэтому проверяем только начало
+        while self.sessions:
+            user_id, (_, last_active) = next(iter(self.sessions.items()))
+            if last_active > deadline:
+                break
+            del self.sessions[user_id]
+            evicted += 1
+            if self.on_evict is not None:
+                self.on_evict(user_id)
+        self.evicted_idle += evicted
+        return evicted
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger('burncheckbot.startup')
+
+
+def process_uptime():
+    """Секунды с запуска процесса по /proc (Linux) или None"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Поля после имени процесса в скобках; starttime - 22-е поле
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Фазы запуска бота и фоновая подготовка тяжелых компонентов
+
+    Шаги запуска отмечаются checkpoint(): фаза длится от предыдущей отметки.
+    Тяжелые компоненты (статистика, шаблон грамоты и шрифты) готовятся в
+    потоках через warm() параллельно и не задерживают прием обновлений;
+    обработчик, которому компонент нужен, дожидается его через ready().
+    Когда фоновая подготовка завершена, в лог пишется отчет о запуске.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Время до создания таймера - запуск интерпретатора и импорт модулей
+        self.imports = process_uptime()
+        self.last = self.started
+        self.phases = {}
+        self.background = {}
+        self.tasks = {}
+        self.ready_at = None
+
+    def checkpoint(self, name: str) -> None:
+        now = time.perf_counter()
+        self.phases[name] = now - self.last
+        self.last = now
+
+    def mark_ready(self) -> None:
+        """Бот готов принимать обновления; отчет пишется после фоновой подготовки"""
+        self.ready_at = time.perf_counter() - self.started
+        logger.info(f"Запуск: {self._format_phases()}; обновления принимаются через {self.ready_at * 1000:.0f} мс")
+        if self.tasks:
+            asyncio.create_task(self._report_when_warm())
+
+    def warm(self, name: str, function) -> None:
+        """Подготовка компонента в отдельном потоке без ожидания"""
+        self.tasks[name] = asyncio.create_task(self._warm(name, function))
+
+    async def _warm(self, name: str, function) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(function)
+        except Exception as e:
+            logger.error(f"Ошибка фоновой подготовки ({name}): {e}")
+        finally:
+            self.background[name] = time.perf_counter() - started
+
+    async def ready(self, name: str) -> None:
+        """Ожидание фоновой подготовки компонента (сразу, если она завершена или не запускалась)"""
+        task = self.tasks.get(name)
+        if task is not None and not task.done():
+            await asyncio.shield(task)
+
+    async def _report_when_warm(self) -> None:
+        await asyncio.gather(*self.tasks.values())
+        background = ', '.join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.background.items())
+        logger.info(f"Фоновая подготовка: {background}; "
+                    f"завершена через {(time.perf_counter() - self.started) * 1000:.0f} мс после старта")
+
+    def _format_phases(self) -> str:
+        parts = []
+        if self.imports is not None:
+            parts.append(f"imports {self.imports * 1000:.0f} мс")
+        parts.extend(f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.phases.items())
+        return ', '.join(parts)
+
+    def durations(self) -> dict:
+        """Длительности фаз и фоновой подготовки в секундах (для метрик)"""
+        values = {(name, 'startup'): seconds for name, seconds in self.phases.items()}
+        values.update({(name, 'background'): seconds for name, seconds in self.background.items()})
+        if self.imports is not None:
+            values[('imports', 'startup')] = self.imports
+        return values
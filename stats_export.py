@@ -0,0 +1,95 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+
+# Поля выгружаемой записи о прохождении теста
+EXPORT_FIELDS = ['user_id', 'username', 'first_name', 'last_name', 'test_date', 'level', 'score']
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+EXPORT_USAGE = (
+    "📋 Использование: /stats_json [ndjson|csv] [gz] [from=ГГГГ-ММ-ДД] [to=ГГГГ-ММ-ДД] [level=Уровень]\n"
+    "Пример: /stats_json csv gz from=2025-08-01 level=Большой_Пиздец"
+)
+
+
+class ExportFilter:
+    """Параметры выгрузки: формат, сжатие и фильтры по дате и уровню"""
+
+    def __init__(self, fmt: str = 'ndjson', compress: bool = False, since: str = None,
+                 until: str = None, level: str = None):
+        self.fmt = fmt
+        self.compress = compress
+        self.since = since  # Включительно, ISO-строка
+        self.until = until  # Не включительно, ISO-строка
+        self.level = level
+
+    def matches(self, test_date: str, level: str) -> bool:
+        """Проверка записи на соответствие фильтрам"""
+        if self.since and (not test_date or test_date < self.since):
+            return False
+        if self.until and (not test_date or test_date >= self.until):
+            return False
+        if self.level and level != self.level:
+            return False
+        return True
+
+    @property
+    def filename_suffix(self) -> str:
+        return f".{self.fmt}.gz" if self.compress else f".{self.fmt}"
+
+
+def parse_export_args(args) -> ExportFilter:
+    """Разбор аргументов команды /stats_json (ValueError при ошибке)"""
+    export_filter = ExportFilter()
+    for arg in args:
+        lowered = arg.lower()
+        if lowered in EXPORT_FORMATS:
+            export_filter.fmt = lowered
+        elif lowered in ('gz', 'gzip'):
+            export_filter.compress = True
+        elif lowered.startswith('from='):
+            export_filter.since = date.fromisoformat(arg[5:]).isoformat()
+        elif lowered.startswith('to='):
+            # Дата окончания включительно: берем все до начала следующего дня
+            export_filter.until = (date.fromisoformat(arg[3:]) + timedelta(days=1)).isoformat()
+        elif lowered.startswith('level='):
+            # Пробелы в уровне можно заменить подчеркиванием
+            export_filter.level = arg[6:].replace('_', ' ')
+        else:
+            raise ValueError(f"Неизвестный аргумент: {arg}")
+    return export_filter
+
+
+def write_export(records, export_filter: ExportFilter) -> tuple:
+    """Потоковая запись записей во временный файл; возвращает путь и число записей
+
+    Вызывается вне цикла событий. Файл удаляет вызывающая сторона.
+    """
+    fd, path = tempfile.mkstemp(prefix='stats_export_', suffix=export_filter.filename_suffix)
+    os.close(fd)
+    count = 0
+    try:
+        if export_filter.compress:
+            f = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            f = open(path, 'w', encoding='utf-8', newline='')
+        with f:
+            if export_filter.fmt == 'csv':
+                writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+                writer.writeheader()
+                for record in records:
+                    writer.writerow(record)
+                    count += 1
+            else:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                    f.write('\n')
+                    count += 1
+    except Exception:
+        os.remove(path)
+        raise
+    return path, count
@@ -0,0 +1,717 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('burncheckbot.stats_store')
+
+# Окна для подсчета прохождений в /stats (в часах)
+STATS_WINDOWS = {'24h': 24, '7d': 24 * 7, '30d': 24 * 30}
+
+# Сколько часов хранятся почасовые счетчики прохождений
+HOURLY_RETENTION = 24 * 30
+
+# Размер кольцевого буфера последних прохождений
+RECENT_COMPLETIONS = 10
+
+# Сколько байт с конца снимка читается для восстановления last_seq
+SNAPSHOT_TAIL_BYTES = 4096
+
+
+def empty_stats() -> dict:
+    """Пустая структура статистики (формат stats.json)"""
+    return {
+        'total_users': 0,
+        'completed_tests': 0,
+        'test_results': defaultdict(int),  # Уровни выгорания
+        'score_sum': 0,  # Сумма баллов прохождений, известных по истории
+        'score_count': 0,  # Число прохождений в score_sum (для среднего балла)
+        'hourly_counts': {},  # Прохождения по часам за последние 30 дней
+        'users': {}  # Пользователи с их результатами тестов
+    }
+
+
+def hour_key(dt: datetime) -> str:
+    """Ключ почасового счетчика: дата и час в формате ISO"""
+    return dt.strftime('%Y-%m-%dT%H')
+
+
+def add_hourly(hourly_counts: dict, test_date: str) -> None:
+    """Учет прохождения в почасовом счетчике с удалением устаревших часов"""
+    key = test_date[:13]
+    if key not in hourly_counts:
+        # Новый час появляется редко - в этот момент и чистим старые
+        oldest = hour_key(datetime.fromisoformat(test_date) - timedelta(hours=HOURLY_RETENTION))
+        for old_key in [k for k in hourly_counts if k < oldest]:
+            del hourly_counts[old_key]
+        hourly_counts[key] = 0
+    hourly_counts[key] += 1
+
+
+def window_counts(hourly_counts: dict, now: datetime) -> dict:
+    """Число прохождений за каждое окно из STATS_WINDOWS"""
+    counts = {}
+    for name, hours in STATS_WINDOWS.items():
+        since = hour_key(now - timedelta(hours=hours - 1))
+        counts[name] = sum(count for key, count in hourly_counts.items() if key >= since)
+    return counts
+
+
+def seed_aggregates(data: dict) -> None:
+    """Оценка агрегатов для старого stats.json по последним результатам пользователей
+
+    История прохождений в старом формате не хранится, поэтому средний балл
+    считается только по последним результатам: score_count - их число, а не
+    completed_tests.
+    """
+    scores = [score for score in ((u.get('test_result') or {}).get('score') for u in data['users'].values())
+              if score is not None]
+    data['score_sum'] = sum(scores)
+    data['score_count'] = len(scores)
+    data['hourly_counts'] = {}
+    oldest = hour_key(datetime.now() - timedelta(hours=HOURLY_RETENTION))
+    for user_data in data['users'].values():
+        test_date = user_data.get('test_date')
+        if test_date and test_date[:13] >= oldest:
+            data['hourly_counts'][test_date[:13]] = data['hourly_counts'].get(test_date[:13], 0) + 1
+
+
+def make_completion_record(seq: int, user_id: int, level: str, score: int, user_info: dict = None,
+                           answers=None) -> dict:
+    """Компактная запись журнала о завершении теста
+
+    answers - пара битовых масок (ответы, отвеченные вопросы) для пересчета результатов.
+    """
+    user_info = user_info or {}
+    record = {
+        'q': seq,
+        't': datetime.now().isoformat(),
+        'u': str(user_id),
+        'l': level,
+        's': score,
+        'n': [user_info.get('username'), user_info.get('first_name'), user_info.get('last_name')],
+    }
+    if answers is not None:
+        record['a'] = list(answers)
+    return record
+
+
+def apply_completion(data: dict, record: dict) -> None:
+    """Применение записи о завершении теста к статистике"""
+    user_id_str = record['u']
+    level = record['l']
+    test_result = {'level': level, 'score': record['s']}
+
+    data['completed_tests'] += 1
+    data['test_results'][level] += 1
+    data['score_sum'] += record['s']
+    data['score_count'] += 1
+    add_hourly(data['hourly_counts'], record['t'])
+
+    user_data = data['users'].get(user_id_str)
+    if user_data is None:
+        username, first_name, last_name = record['n']
+        data['users'][user_id_str] = {
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'test_date': record['t'],
+            'test_result': test_result
+        }
+        data['total_users'] = len(data['users'])
+    else:
+        user_data['test_result'] = test_result
+        user_data['test_date'] = record['t']
+
+
+def read_snapshot(path: str):
+    """Чтение снимка статистики; возвращает данные и номер последней учтенной записи"""
+    data = empty_stats()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+    except FileNotFoundError:
+        return data, 0
+
+    data['total_users'] = loaded.get('total_users', 0)
+    data['completed_tests'] = loaded.get('completed_tests', 0)
+    data['test_results'] = defaultdict(int, loaded.get('test_results', {}))
+    data['users'] = loaded.get('users', {})
+    if 'score_sum' in loaded:
+        data['score_sum'] = loaded['score_sum']
+        # Снимки без score_count считали средний балл по всем завершенным тестам
+        data['score_count'] = loaded.get('score_count', data['completed_tests'])
+        data['hourly_counts'] = loaded.get('hourly_counts', {})
+    else:
+        seed_aggregates(data)
+    return data, loaded.get('last_seq', 0)
+
+
+def read_journal(path: str):
+    """Чтение записей журнала (оборванная последняя строка пропускается)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Пропущена поврежденная запись в {path}")
+    except FileNotFoundError:
+        return
+
+
+def replay(data: dict, records, last_seq: int) -> int:
+    """Применение записей журнала, которые еще не учтены в снимке"""
+    for record in records:
+        if record['q'] <= last_seq:
+            continue
+        apply_completion(data, record)
+        last_seq = record['q']
+    return last_seq
+
+
+def recover_last_seq(snapshot_path: str, journal_paths) -> int:
+    """Номер последней записи по заголовку снимка и хвосту журналов без полной загрузки
+
+    last_seq записывается в конец снимка, поэтому читается только хвост файла.
+    Если снимок есть, но номер в нем не найден, возвращает None.
+    """
+    last_seq = 0
+    try:
+        with open(snapshot_path, 'rb') as f:
+            f.seek(max(0, os.path.getsize(snapshot_path) - SNAPSHOT_TAIL_BYTES))
+            found = re.findall(rb'"last_seq":\s*(\d+)', f.read())
+        if not found:
+            return None
+        last_seq = int(found[-1])
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return None
+
+    for path in journal_paths:
+        for record in read_journal(path):
+            seq = record.get('q') if isinstance(record, dict) else None
+            if isinstance(seq, int) and seq > last_seq:
+                last_seq = seq
+    return last_seq
+
+
+def recent_entry(user_id_str: str, user_data: dict):
+    """Элемент буфера последних прохождений с уже разобранной датой"""
+    return user_id_str, dict(user_data, test_date=datetime.fromisoformat(user_data['test_date']))
+
+
+class JournalStatsStore:
+    """Статистика в памяти со снимком stats.json и журналом завершений
+
+    Каждое завершение теста обновляет данные в памяти и добавляет одну
+    компактную запись в буфер журнала. Буфер периодически дописывается в
+    файл журнала с fsync, а фоновая компакция сворачивает журнал в снимок.
+    При запуске загружается снимок и проигрывается хвост журнала.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.rotated_path = f"{journal_path}.1"
+        self.data = empty_stats()
+        self.recent = deque(maxlen=RECENT_COMPLETIONS)
+        self.seq = 0
+        self.buffer = []
+        self.buffer_lock = threading.Lock()
+        self.io_lock = threading.Lock()
+
+    def load(self) -> None:
+        """Загрузка снимка и проигрывание журнала"""
+        try:
+            data, last_seq = read_snapshot(self.snapshot_path)
+            last_seq = replay(data, read_journal(self.rotated_path), last_seq)
+            last_seq = replay(data, read_journal(self.journal_path), last_seq)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке статистики: {e}")
+            # Новые записи должны идти после уже сохраненных, иначе проигрывание их отбросит
+            self.seq = recover_last_seq(self.snapshot_path, (self.rotated_path, self.journal_path))
+            if self.seq is None:
+                logger.error("Номер последней записи журнала не восстановлен, запись статистики отключена")
+            else:
+                logger.warning(f"Статистика не загружена, новые записи журнала продолжаются с {self.seq + 1}")
+            return
+
+        # Обновляем словарь на месте, чтобы ссылки на него оставались актуальными
+        self.data.clear()
+        self.data.update(data)
+        self.seq = last_seq
+
+        # Буфер последних прохождений заполняется один раз, дальше ведется при записи
+        dated_users = [item for item in data['users'].items() if item[1].get('test_date')]
+        latest = heapq.nlargest(RECENT_COMPLETIONS, dated_users, key=lambda item: item[1]['test_date'])
+        self.recent.clear()
+        self.recent.extend(recent_entry(user_id_str, user_data) for user_id_str, user_data in reversed(latest))
+        logger.info(f"Статистика загружена: {len(self.data['users'])} пользователей, запись журнала {last_seq}")
+
+    def record_completion(self, user_id: int, level: str, score: int, user_info: dict = None,
+                          answers=None) -> None:
+        """Учет завершения теста: обновление в памяти и запись в буфер журнала"""
+        if self.seq is None:
+            logger.error(f"Завершение теста пользователем {user_id} не записано: статистика не загружена")
+            return
+        self.seq += 1
+        record = make_completion_record(self.seq, user_id, level, score, user_info, answers)
+        apply_completion(self.data, record)
+        self.recent.append(recent_entry(record['u'], self.data['users'][record['u']]))
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self.buffer_lock:
+            self.buffer.append(line)
+
+    def _write_buffer(self) -> int:
+        with self.buffer_lock:
+            lines, self.buffer = self.buffer, []
+        if not lines:
+            return 0
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(lines)
+
+    def flush(self) -> int:
+        """Дописывание буфера в журнал с fsync (вызывается вне цикла событий)"""
+        with self.io_lock:
+            return self._write_buffer()
+
+    def compact(self) -> None:
+        """Свертка журнала в снимок (вызывается вне цикла событий)"""
+        with self.io_lock:
+            self._write_buffer()
+            # Новые записи пойдут в свежий журнал, пока старый сворачивается
+            if os.path.exists(self.journal_path) and not os.path.exists(self.rotated_path):
+                os.replace(self.journal_path, self.rotated_path)
+
+        if not os.path.exists(self.rotated_path):
+            return
+
+        data, last_seq = read_snapshot(self.snapshot_path)
+        last_seq = replay(data, read_journal(self.rotated_path), last_seq)
+        self._write_snapshot(data, last_seq)
+        os.remove(self.rotated_path)
+        logger.info(f"Журнал статистики свернут в {self.snapshot_path} (запись {last_seq})")
+
+    def _write_snapshot(self, data: dict, last_seq: int) -> None:
+        snapshot = {
+            'total_users': data['total_users'],
+            'completed_tests': data['completed_tests'],
+            'test_results': dict(data['test_results']),
+            'score_sum': data['score_sum'],
+            'score_count': data['score_count'],
+            'hourly_counts': data['hourly_counts'],
+            'users': data['users'],
+            'last_seq': last_seq,
+            'last_updated': datetime.now().isoformat()
+        }
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'), default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def rescore(self, rescorer, dry_run: bool = False) -> Counter:
+        """Пересчет последних результатов пользователей (только при остановленном боте)
+
+        История прохождений сворачивается в снимок, поэтому пересчитываются только
+        последние результаты пользователей. Счетчики уровней и баллов учитывают все
+        прохождения и не меняются - так же, как при проигрывании журнала. Ответы
+        хранятся только в журнале: результаты из еще не свернутого журнала
+        пересчитываются по ответам, остальные - по общему баллу.
+
+        rescorer получает список результатов и возвращает пары (уровень, балл).
+        Возвращает число изменений для каждой пары (старый уровень, новый уровень).
+        """
+        self.flush()
+        answers = {}
+        for path in (self.rotated_path, self.journal_path):
+            for record in read_journal(path):
+                answers[record['u']] = record.get('a')
+        self.compact()
+
+        users = [(user_id_str, user_data['test_result']) for user_id_str, user_data in self.data['users'].items()
+                 if user_data.get('test_result')]
+        results = [dict(test_result, answers=answers.get(user_id_str)) for user_id_str, test_result in users]
+        changes = Counter()
+        for (_, test_result), (level, score) in zip(users, rescorer(results)):
+            if (level, score) == (test_result.get('level'), test_result.get('score')):
+                continue
+            changes[(test_result.get('level'), level)] += 1
+            if not dry_run:
+                test_result['level'] = level
+                test_result['score'] = score
+
+        if changes and not dry_run:
+            with self.io_lock:
+                self._write_snapshot(self.data, self.seq)
+        return changes
+
+    def iter_records(self, export_filter):
+        """Записи о прохождениях для выгрузки (вызывается вне цикла событий)
+
+        В журнальном бэкенде хранится последний результат каждого пользователя.
+        """
+        # Копия элементов словаря снимается одной операцией и не мешает записи
+        for user_id_str, user_data in list(self.data['users'].items()):
+            test_result = user_data.get('test_result') or {}
+            if export_filter.matches(user_data.get('test_date'), test_result.get('level')):
+                yield {
+                    'user_id': user_id_str,
+                    'username': user_data.get('username'),
+                    'first_name': user_data.get('first_name'),
+                    'last_name': user_data.get('last_name'),
+                    'test_date': user_data.get('test_date'),
+                    'level': test_result.get('level'),
+                    'score': test_result.get('score')
+                }
+
+    async def summary(self) -> dict:
+        """Общие показатели: пользователи, тесты, уровни, сумма баллов, прохождения по окнам"""
+        return {
+            'total_users': len(self.data['users']),
+            'completed_tests': self.data['completed_tests'],
+            'test_results': dict(self.data['test_results']),
+            'score_sum': self.data['score_sum'],
+            'score_count': self.data['score_count'],
+            'windows': window_counts(self.data['hourly_counts'], datetime.now())
+        }
+
+    async def recent_users(self, limit: int):
+        """Последние прохождения (новые сверху): список пар (user_id, данные пользователя)"""
+        return list(reversed(self.recent))[:limit]
+
+    async def get_user(self, user_id: int):
+        """Данные пользователя или None"""
+        return self.data['users'].get(str(user_id))
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    test_date TEXT,
+    level TEXT,
+    score INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_users_test_date ON users(test_date);
+
+CREATE TABLE IF NOT EXISTS completions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    test_date TEXT NOT NULL,
+    level TEXT,
+    score INTEGER,
+    answers INTEGER,
+    answered INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_completions_user_id ON completions(user_id);
+CREATE INDEX IF NOT EXISTS idx_completions_test_date ON completions(test_date);
+
+CREATE TABLE IF NOT EXISTS level_counts (
+    level TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS totals (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (name, value) VALUES
+    ('total_users', 0), ('completed_tests', 0), ('score_sum', 0), ('score_count', 0);
+
+CREATE TABLE IF NOT EXISTS hourly_counts (
+    hour TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+"""
+
+
+def insert_completion(conn: sqlite3.Connection, record: dict) -> None:
+    """Запись завершения теста в базу (внутри открытой транзакции)"""
+    username, first_name, last_name = record['n']
+    inserted = conn.execute(
+        "INSERT OR IGNORE INTO users (user_id, username, first_name, last_name, test_date, level, score) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (record['u'], username, first_name, last_name, record['t'], record['l'], record['s'])
+    ).rowcount
+    if inserted:
+        conn.execute(
+            "INSERT INTO totals (name, value) VALUES ('total_users', 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+        )
+    else:
+        conn.execute(
+            "UPDATE users SET test_date = ?, level = ?, score = ? WHERE user_id = ?",
+            (record['t'], record['l'], record['s'], record['u'])
+        )
+    answers, answered = record.get('a') or (None, None)
+    conn.execute(
+        "INSERT INTO completions (user_id, test_date, level, score, answers, answered) VALUES (?, ?, ?, ?, ?, ?)",
+        (record['u'], record['t'], record['l'], record['s'], answers, answered)
+    )
+    conn.execute(
+        "INSERT INTO level_counts (level, count) VALUES (?, 1) "
+        "ON CONFLICT(level) DO UPDATE SET count = count + 1",
+        (record['l'],)
+    )
+    conn.executemany(
+        "INSERT INTO totals (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        [('completed_tests', 1), ('score_sum', record['s']), ('score_count', 1)]
+    )
+    conn.execute(
+        "INSERT INTO hourly_counts (hour, count) VALUES (?, 1) "
+        "ON CONFLICT(hour) DO UPDATE SET count = count + 1",
+        (record['t'][:13],)
+    )
+
+
+def user_row_to_dict(row) -> dict:
+    """Строка таблицы users в формате записи stats.json"""
+    return {
+        'username': row['username'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'test_date': row['test_date'],
+        'test_result': {'level': row['level'], 'score': row['score']}
+    }
+
+
+class SQLiteStatsStore:
+    """Статистика в SQLite (WAL) с индексами по user_id и дате прохождения
+
+    Данные не держатся в памяти процесса: завершения копятся в буфере и
+    записываются одной транзакцией при сбросе, а все запросы выполняются
+    в отдельном потоке, чтобы не блокировать цикл событий.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = None
+        self.buffer = []
+        self.buffer_lock = threading.Lock()
+        self.db_lock = threading.Lock()
+
+    def load(self) -> None:
+        """Открытие базы и создание схемы"""
+        # Базу могут одновременно использовать несколько процессов бота
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SQLITE_SCHEMA)
+        logger.info(f"База статистики открыта: {self.db_path}")
+
+    def record_completion(self, user_id: int, level: str, score: int, user_info: dict = None,
+                          answers=None) -> None:
+        """Учет завершения теста: запись попадает в буфер до следующего сброса"""
+        record = make_completion_record(0, user_id, level, score, user_info, answers)
+        with self.buffer_lock:
+            self.buffer.append(record)
+
+    def _write_buffer(self) -> int:
+        with self.buffer_lock:
+            records, self.buffer = self.buffer, []
+        if records:
+            with self.conn:
+                for record in records:
+                    insert_completion(self.conn, record)
+        return len(records)
+
+    def flush(self) -> int:
+        """Запись буфера одной транзакцией (вызывается вне цикла событий)"""
+        with self.db_lock:
+            return self._write_buffer()
+
+    def compact(self) -> None:
+        """Перенос WAL в основной файл базы (вызывается вне цикла событий)"""
+        with self.db_lock:
+            self._write_buffer()
+            oldest = hour_key(datetime.now() - timedelta(hours=HOURLY_RETENTION))
+            with self.conn:
+                self.conn.execute("DELETE FROM hourly_counts WHERE hour < ?", (oldest,))
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _query(self, sql: str, params=()):
+        with self.db_lock:
+            self._write_buffer()
+            return self.conn.execute(sql, params).fetchall()
+
+    def _summary(self) -> dict:
+        # Все значения берутся из счетчиков, которые ведутся при записи
+        now = datetime.now()
+        totals = dict(self._query("SELECT name, value FROM totals"))
+        hourly_counts = dict(self._query(
+            "SELECT hour, count FROM hourly_counts WHERE hour >= ?",
+            (hour_key(now - timedelta(hours=HOURLY_RETENTION)),)
+        ))
+        return {
+            'total_users': totals.get('total_users', 0),
+            'completed_tests': totals.get('completed_tests', 0),
+            'test_results': dict(self._query("SELECT level, count FROM level_counts")),
+            'score_sum': totals.get('score_sum', 0),
+            'score_count': totals.get('score_count', 0),
+            'windows': window_counts(hourly_counts, now)
+        }
+
+    async def summary(self) -> dict:
+        """Общие показатели: пользователи, тесты, уровни, сумма баллов, прохождения по окнам"""
+        return await asyncio.to_thread(self._summary)
+
+    async def recent_users(self, limit: int):
+        """Последние прохождения (новые сверху): список пар (user_id, данные пользователя)"""
+        rows = await asyncio.to_thread(
+            self._query,
+            "SELECT completions.user_id, username, first_name, last_name, "
+            "completions.test_date, completions.level, completions.score "
+            "FROM completions LEFT JOIN users USING (user_id) "
+            "ORDER BY completions.test_date DESC LIMIT ?",
+            (limit,)
+        )
+        return [recent_entry(row['user_id'], user_row_to_dict(row)) for row in rows]
+
+    async def get_user(self, user_id: int):
+        """Данные пользователя или None"""
+        rows = await asyncio.to_thread(self._query, "SELECT * FROM users WHERE user_id = ?", (str(user_id),))
+        return user_row_to_dict(rows[0]) if rows else None
+
+    def iter_records(self, export_filter):
+        """Все прохождения для выгрузки (вызывается вне цикла событий)
+
+        Чтение идет через отдельное соединение: в режиме WAL оно не мешает записи.
+        """
+        self.flush()
+        conditions, params = [], []
+        if export_filter.since:
+            conditions.append("completions.test_date >= ?")
+            params.append(export_filter.since)
+        if export_filter.until:
+            conditions.append("completions.test_date < ?")
+            params.append(export_filter.until)
+        if export_filter.level:
+            conditions.append("completions.level = ?")
+            params.append(export_filter.level)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(
+                "SELECT completions.user_id, username, first_name, last_name, "
+                "completions.test_date, completions.level, completions.score "
+                f"FROM completions LEFT JOIN users USING (user_id) {where} "
+                "ORDER BY completions.test_date",
+                params
+            )
+            for user_id, username, first_name, last_name, test_date, level, score in cursor:
+                yield {
+                    'user_id': user_id,
+                    'username': username,
+                    'first_name': first_name,
+                    'last_name': last_name,
+                    'test_date': test_date,
+                    'level': level,
+                    'score': score
+                }
+        finally:
+            conn.close()
+
+    def rescore(self, rescorer, dry_run: bool = False) -> Counter:
+        """Пересчет всех прохождений в базе (только при остановленном боте)
+
+        rescorer получает список результатов и возвращает пары (уровень, балл).
+        Возвращает число изменений для каждой пары (старый уровень, новый уровень).
+        """
+        rows = self._query("SELECT id, user_id, test_date, level, score, answers, answered FROM completions")
+        results = [
+            {
+                'level': row['level'],
+                'score': row['score'],
+                'answers': (row['answers'], row['answered']) if row['answers'] is not None else None
+            }
+            for row in rows
+        ]
+        changes = Counter()
+        with self.db_lock, self.conn:
+            for row, (level, score) in zip(rows, rescorer(results)):
+                if (level, score) == (row['level'], row['score']):
+                    continue
+                changes[(row['level'], level)] += 1
+                if dry_run:
+                    continue
+                self.conn.execute("UPDATE completions SET level = ?, score = ? WHERE id = ?", (level, score, row['id']))
+                # Последний результат пользователя хранится и в таблице users
+                self.conn.execute(
+                    "UPDATE users SET level = ?, score = ? WHERE user_id = ? AND test_date = ?",
+                    (level, score, row['user_id'], row['test_date'])
+                )
+                self.conn.execute("UPDATE level_counts SET count = count - 1 WHERE level = ?", (row['level'],))
+                self.conn.execute(
+                    "INSERT INTO level_counts (level, count) VALUES (?, 1) "
+                    "ON CONFLICT(level) DO UPDATE SET count = count + 1",
+                    (level,)
+                )
+                self.conn.execute(
+                    "UPDATE totals SET value = value + ? WHERE name = 'score_sum'",
+                    (score - (row['score'] or 0),)
+                )
+                if row['score'] is None:
+                    self.conn.execute("UPDATE totals SET value = value + 1 WHERE name = 'score_count'")
+            self.conn.execute("DELETE FROM level_counts WHERE count <= 0")
+        return changes
+
+    def import_stats(self, data: dict) -> None:
+        """Перенос статистики в формате stats.json в базу (для миграции)"""
+        with self.db_lock, self.conn:
+            for user_id, user_data in data['users'].items():
+                test_result = user_data.get('test_result') or {}
+                test_date = user_data.get('test_date') or datetime.now().isoformat()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO users (user_id, username, first_name, last_name, test_date, level, score) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (user_id, user_data.get('username'), user_data.get('first_name'), user_data.get('last_name'),
+                     test_date, test_result.get('level'), test_result.get('score'))
+                )
+                # История прохождений в stats.json не хранится - переносим последний результат
+                self.conn.execute(
+                    "INSERT INTO completions (user_id, test_date, level, score) VALUES (?, ?, ?, ?)",
+                    (user_id, test_date, test_result.get('level'), test_result.get('score'))
+                )
+            self.conn.execute("DELETE FROM level_counts")
+            self.conn.executemany(
+                "INSERT INTO level_counts (level, count) VALUES (?, ?)",
+                list(data['test_results'].items())
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO totals (name, value) VALUES (?, ?)",
+                [('total_users', len(data['users'])), ('completed_tests', data['completed_tests']),
+                 ('score_sum', data['score_sum']), ('score_count', data['score_count'])]
+            )
+            self.conn.execute("DELETE FROM hourly_counts")
+            self.conn.executemany(
+                "INSERT INTO hourly_counts (hour, count) VALUES (?, ?)",
+                list(data['hourly_counts'].items())
+            )
+
+
+def create_stats_store(backend: str, snapshot_path: str, journal_path: str, db_path: str):
+    """Создание хранилища статистики по имени бэкенда (journal или sqlite)"""
+    if backend == 'sqlite':
+        return SQLiteStatsStore(db_path)
+    if backend == 'journal':
+        return JournalStatsStore(snapshot_path, journal_path)
+    raise ValueError(f"Неизвестный бэкенд статистики: {backend}")
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger('burncheckbot.subscription')
+
+# Статусы участника, которые считаются подпиской
+SUBSCRIBED_STATUSES = ('member', 'administrator', 'creator')
+
+# Наибольшее число пользователей в кэше; при переполнении вытесняются самые давно проверенные
+CACHE_MAX_SIZE = 10000
+
+
+class SubscriptionChecker:
+    """Проверка подписки на канал с кэшем статусов
+
+    ID канала определяется один раз при запуске. Статус пользователя кэшируется:
+    подписка — на SUBSCRIPTION_CACHE_TTL, отсутствие подписки — на более короткий
+    SUBSCRIPTION_NEGATIVE_TTL, чтобы подписавшийся пользователь быстро прошел
+    проверку. Кэш ограничен max_size записями (LRU). Одновременные проверки одного
+    пользователя объединяются в один запрос и считаются в coalesced.
+    """
+
+    def __init__(self, channel_username: str, positive_ttl: float, negative_ttl: float,
+                 max_size: int = CACHE_MAX_SIZE):
+        self.channel_username = channel_username.lstrip('@')
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.chat_id = f"@{self.channel_username}"
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def resolve_channel(self, bot) -> None:
+        """Определение числового ID канала (один раз при запуске)"""
+        try:
+            chat = await bot.get_chat(f"@{self.channel_username}")
+            self.chat_id = chat.id
+            logger.info(f"Канал для проверки подписки: @{self.channel_username} (ID {chat.id})")
+        except Exception as e:
+            logger.warning(f"Не удалось получить ID канала @{self.channel_username}, проверяем по username: {e}")
+
+    async def is_subscribed(self, bot, user_id: int) -> bool:
+        """Подписан ли пользователь на канал (с учетом кэша)"""
+        cached = self.cache.get(user_id)
+        if cached is not None and cached[1] > time.monotonic():
+            self.cache.move_to_end(user_id)
+            self.hits += 1
+            return cached[0]
+
+        # Если проверка этого пользователя уже идет, ждем ее результата
+        task = self.in_flight.get(user_id)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch(bot, user_id))
+            self.in_flight[user_id] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, bot, user_id: int) -> bool:
+        try:
+            chat_member = await bot.get_chat_member(chat_id=self.chat_id, user_id=user_id)
+        except Exception as e:
+            logger.warning(f"Не удалось проверить подписку пользователя {user_id} в канале @{self.channel_username}: {e}")
+            logger.warning("Возможные причины: бот не администратор канала, неправильный username, "
+                           "канал приватный или у бота нет прав на просмотр участников")
+            # Временно разрешаем всем, но не повторяем запрос чаще, чем раз в negative_ttl
+            self._store(user_id, True, self.negative_ttl)
+            return True
+
+        logger.info(f"Статус пользователя {user_id}: {chat_member.status}")
+        is_subscribed = chat_member.status in SUBSCRIBED_STATUSES
+        self._store(user_id, is_subscribed, self.positive_ttl if is_subscribed else self.negative_ttl)
+        return is_subscribed
+
+    def _store(self, user_id: int, is_subscribed: bool, ttl: float) -> None:
+        self.cache[user_id] = (is_subscribed, time.monotonic() + ttl)
+        self.cache.move_to_end(user_id)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
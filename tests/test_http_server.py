@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from http_server import MAX_BODY_SIZE, MAX_HEADER_SIZE, HttpClient, HttpError, HttpResponse, HttpServer
+
+
+def parse(data: bytes, eof: bool = True):
+    """Разбор запроса из байтов тем же кодом, что и в сервере"""
+    async def scenario():
+        reader = asyncio.StreamReader(limit=MAX_HEADER_SIZE)
+        reader.feed_data(data)
+        if eof:
+            reader.feed_eof()
+        return await HttpServer('127.0.0.1', 0, None)._read_request(reader)
+
+    return asyncio.run(scenario())
+
+
+def test_request_line_headers_and_body():
+    request = parse(b'post /telegram?token=1&x=2 HTTP/1.1\r\n'
+                    b'Host: bot\r\nX-Telegram-Bot-Api-Secret-Token:  secret \r\n'
+                    b'Content-Length: 7\r\n\r\n{"a":1}')
+    assert (request.method, request.path, request.query) == ('POST', '/telegram', 'token=1&x=2')
+    assert request.headers['x-telegram-bot-api-secret-token'] == 'secret'
+    assert request.headers['host'] == 'bot'
+    assert request.body == b'{"a":1}'
+
+
+def test_request_without_body():
+    request = parse(b'GET /healthz HTTP/1.1\r\n\r\n')
+    assert (request.method, request.path, request.query, request.body) == ('GET', '/healthz', '', b'')
+
+
+def test_pipelined_requests_are_read_one_by_one():
+    async def scenario():
+        reader = asyncio.StreamReader(limit=MAX_HEADER_SIZE)
+        reader.feed_data(b'POST /a HTTP/1.1\r\nContent-Length: 2\r\n\r\nhi'
+                         b'GET /b HTTP/1.1\r\n\r\n')
+        reader.feed_eof()
+        server = HttpServer('127.0.0.1', 0, None)
+        return [await server._read_request(reader) for _ in range(3)]
+
+    first, second, end = asyncio.run(scenario())
+    assert (first.path, first.body) == ('/a', b'hi')
+    assert (second.path, second.body) == ('/b', b'')
+    assert end is None
+
+
+@pytest.mark.parametrize('data, status', [
+    (b'GARBAGE\r\n\r\n', 400),
+    (b'POST / HTTP/1.1\r\nContent-Length: abc\r\n\r\n', 400),
+    (b'POST / HTTP/1.1\r\nContent-Length: -5\r\n\r\n', 400),
+    (b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n', 411),
+    (f'POST / HTTP/1.1\r\nContent-Length: {MAX_BODY_SIZE + 1}\r\n\r\n'.encode(), 413),
+    (b'GET / HTTP/1.1\r\nX-Long: ' + b'a' * MAX_HEADER_SIZE + b'\r\n\r\n', 400),
+])
+def test_malformed_requests_are_rejected(data, status):
+    with pytest.raises(HttpError) as error:
+        parse(data)
+    assert error.value.status == status
+
+
+def test_truncated_body_raises():
+    with pytest.raises(asyncio.IncompleteReadError):
+        parse(b'POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nshort')
+
+
+def test_closed_connection_between_requests():
+    assert parse(b'') is None
+
+
+def test_server_keep_alive_and_errors():
+    async def handler(request):
+        if request.path == '/fail':
+            raise RuntimeError("ошибка")
+        return HttpResponse(200, request.method.encode() + b' ' + request.body, 'text/plain',
+                            {'X-Path': request.path})
+
+    async def scenario():
+        server = HttpServer('127.0.0.1', 0, handler)
+        await server.start()
+        client = HttpClient('127.0.0.1', server.port)
+        try:
+            first = await client.request('POST', '/echo', body=b'payload')
+            # Второй запрос идет по тому же keep-alive соединению
+            second = await client.request('GET', '/echo')
+            failed = await client.request('GET', '/fail')
+            reused = len(client.idle)
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            writer.write(b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n')
+            raw = await reader.read()
+            writer.close()
+            return first, second, failed, reused, raw
+        finally:
+            await client.close()
+            await server.stop()
+
+    first, second, failed, reused, raw = asyncio.run(scenario())
+    assert (first.status, first.body) == (200, b'POST payload')
+    assert (second.status, second.body) == (200, b'GET ')
+    assert failed.status == 500
+    assert reused == 1
+    assert raw.startswith(b'HTTP/1.1 411 Length Required\r\n')
+    assert b'Connection: close' in raw
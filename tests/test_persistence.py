@@ -0,0 +1,122 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+
+import sessions
+from persistence import JsonFileSessionBackend, SQLiteSessionBackend, SessionPersistence
+
+NAME = 'burnout_test'
+
+
+def make_backend(kind: str, tmp_path, max_age: float = 3600, shard: tuple = None):
+    if kind == 'file':
+        return JsonFileSessionBackend(str(tmp_path / 'sessions.json'), max_age)
+    return SQLiteSessionBackend(str(tmp_path / 'sessions.db'), max_age, shard)
+
+
+def make_persistence(backend) -> SessionPersistence:
+    return SessionPersistence(backend, sessions.SessionManager(3600, 100), update_interval=60)
+
+
+async def save_user(persistence: SessionPersistence, user_id: int, state: int, full_name: str) -> None:
+    await persistence.get_user_data()
+    session = sessions.TestSession(phase=1, question=3, answers=0b1010, answered=0b1111)
+    persistence.sessions[user_id] = session
+    await persistence.update_conversation(NAME, (user_id, user_id), state)
+    await persistence.update_user_data(user_id, {'full_name': full_name})
+    await persistence.flush()
+
+
+async def load(persistence: SessionPersistence):
+    return await persistence.get_conversations(NAME), await persistence.get_user_data()
+
+
+@pytest.mark.parametrize('kind', ['file', 'sqlite'])
+def test_round_trip(kind, tmp_path):
+    asyncio.run(save_user(make_persistence(make_backend(kind, tmp_path)), 42, 2, 'Иванов Иван'))
+
+    restored = make_persistence(make_backend(kind, tmp_path))
+    conversations, user_data = asyncio.run(load(restored))
+    assert conversations == {(42, 42): 2}
+    assert user_data == {42: {'full_name': 'Иванов Иван'}}
+    session = restored.sessions.peek(42)
+    assert (session.phase, session.question, session.answers, session.answered) == (1, 3, 0b1010, 0b1111)
+
+
+@pytest.mark.parametrize('kind', ['file', 'sqlite'])
+def test_ended_conversation_and_dropped_user_are_removed(kind, tmp_path):
+    async def scenario():
+        persistence = make_persistence(make_backend(kind, tmp_path))
+        await save_user(persistence, 7, 1, 'Петров Петр')
+        await persistence.update_conversation(NAME, (7, 7), None)
+        del persistence.sessions[7]
+        await persistence.drop_user_data(7)
+        await persistence.flush()
+
+    asyncio.run(scenario())
+    restored = make_persistence(make_backend(kind, tmp_path))
+    assert asyncio.run(load(restored)) == ({}, {})
+    assert len(restored.sessions) == 0
+
+
+def test_sqlite_prunes_stale_rows_on_load(tmp_path):
+    asyncio.run(save_user(make_persistence(make_backend('sqlite', tmp_path)), 5, 3, 'Старый Пользователь'))
+    conn = sqlite3.connect(str(tmp_path / 'sessions.db'))
+    with conn:
+        for table in ('sessions', 'conversations', 'user_data'):
+            conn.execute(f"UPDATE {table} SET updated_at = ?", (time.time() - 7200,))
+
+    restored = make_persistence(make_backend('sqlite', tmp_path))
+    assert asyncio.run(load(restored)) == ({}, {})
+    for table in ('sessions', 'conversations', 'user_data'):
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+    conn.close()
+
+
+def test_file_backend_prunes_stale_users_on_load(tmp_path):
+    async def scenario():
+        persistence = make_persistence(make_backend('file', tmp_path))
+        await save_user(persistence, 5, 3, 'Старый Пользователь')
+        await save_user(persistence, 6, 3, 'Новый Пользователь')
+
+    asyncio.run(scenario())
+    path = tmp_path / 'sessions.json'
+    data = json.loads(path.read_text(encoding='utf-8'))
+    data['updated']['5'] = time.time() - 7200
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+    restored = make_persistence(make_backend('file', tmp_path))
+    conversations, user_data = asyncio.run(load(restored))
+    assert conversations == {(6, 6): 3}
+    assert list(user_data) == [6]
+    assert 5 not in restored.sessions
+
+
+def test_sqlite_shard_loads_own_users_only(tmp_path):
+    async def scenario():
+        persistence = make_persistence(make_backend('sqlite', tmp_path))
+        for user_id in (10, 11, 12, 13):
+            await save_user(persistence, user_id, 2, f'Пользователь {user_id}')
+
+    asyncio.run(scenario())
+    restored = make_persistence(make_backend('sqlite', tmp_path, shard=(1, 2)))
+    conversations, user_data = asyncio.run(load(restored))
+    assert sorted(key[-1] for key in conversations) == [11, 13]
+    assert sorted(user_data) == [11, 13]
+    assert sorted(user_id for user_id, _ in restored.sessions.items()) == [11, 13]
+
+
+def test_session_manager_reports_evicted_users():
+    evicted = []
+    manager = sessions.SessionManager(idle_ttl=0, max_sessions=2)
+    manager.on_evict = evicted.append
+    for user_id in (1, 2, 3):
+        manager[user_id] = sessions.TestSession()
+    assert evicted == [1]
+
+    manager.sweep()
+    assert evicted == [1, 2, 3]
+    assert len(manager) == 0
@@ -0,0 +1,201 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+import rate_limiter
+from rate_limiter import PriorityRateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def no_retry_pause(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'RETRY_JITTER', 0)
+    monkeypatch.setattr(rate_limiter, 'MAX_BACKOFF', 0)
+
+
+def test_token_bucket_burst_then_steady_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Каждая следующая отправка резервирует время на 1/rate позже
+    assert [bucket.reserve() for _ in range(3)] == [0.5, 1.0, 1.5]
+
+    clock.now += 10
+    assert bucket.reserve() == 0.0
+    assert bucket.is_full(clock.now) is False
+    clock.now += 1
+    assert bucket.is_full(clock.now) is True
+
+
+def test_edits_use_their_own_chat_bucket(clock):
+    limiter = PriorityRateLimiter(global_rate=30, per_chat_rate=1, chat_burst=3, max_retries=0, edit_rate=20)
+    send_delays = [limiter._chat_bucket(7, False).reserve() for _ in range(5)]
+    edit_delays = [limiter._chat_bucket(7, True).reserve() for _ in range(5)]
+    assert send_delays == [0.0, 0.0, 0.0, 1.0, 2.0]
+    assert edit_delays == [0.0] * 5
+
+
+def limited(coroutine_function):
+    """Запуск сценария с запущенным диспетчером ограничителя"""
+    async def scenario(limiter):
+        await limiter.initialize()
+        try:
+            return await coroutine_function(limiter)
+        finally:
+            await limiter.shutdown()
+    return scenario
+
+
+def call(limiter, callback, endpoint='sendMessage', chat_id=1, rate_limit_args=None):
+    return limiter.process_request(callback, (), {}, endpoint, {'chat_id': chat_id}, rate_limit_args)
+
+
+def test_unlimited_methods_are_not_queued():
+    limiter = PriorityRateLimiter(global_rate=1, per_chat_rate=1, chat_burst=1, max_retries=0)
+
+    async def answer():
+        return 'ok'
+
+    @limited
+    async def scenario(limiter):
+        limiter.global_bucket.tokens = -100
+        return await asyncio.wait_for(call(limiter, answer, endpoint='answerCallbackQuery'), 0.5)
+
+    assert asyncio.run(scenario(limiter)) == 'ok'
+
+
+def test_global_tokens_go_to_higher_priority_first():
+    limiter = PriorityRateLimiter(global_rate=50, per_chat_rate=100, chat_burst=100, max_retries=0)
+    order = []
+
+    def sender(name):
+        async def send():
+            order.append(name)
+        return send
+
+    @limited
+    async def scenario(limiter):
+        # Общие токены исчерпаны: запросы ждут в очереди по приоритетам
+        limiter.global_bucket.tokens = 0
+        await asyncio.gather(
+            call(limiter, sender('photo'), endpoint='sendPhoto', chat_id=1),
+            call(limiter, sender('message'), endpoint='sendMessage', chat_id=2),
+        )
+
+    asyncio.run(scenario(limiter))
+    assert order == ['message', 'photo']
+
+
+def test_edits_do_not_wait_for_global_tokens():
+    limiter = PriorityRateLimiter(global_rate=1, per_chat_rate=1, chat_burst=1, max_retries=0, edit_rate=20)
+    edited = []
+
+    async def edit():
+        edited.append(None)
+
+    @limited
+    async def scenario(limiter):
+        # Общие токены исчерпаны надолго, а нажатия в разных чатах идут пачкой
+        limiter.global_bucket.tokens = -100
+        edits = [call(limiter, edit, endpoint='editMessageText', chat_id=chat_id)
+                 for chat_id in range(20) for _ in range(3)]
+        await asyncio.wait_for(asyncio.gather(*edits), 0.5)
+        return limiter.queue_lengths()
+
+    lengths = asyncio.run(scenario(limiter))
+    assert len(edited) == 60
+    assert lengths['interactive'] == 0
+
+
+def test_explicit_priority_overrides_endpoint():
+    limiter = PriorityRateLimiter(global_rate=50, per_chat_rate=100, chat_burst=100, max_retries=0)
+    order = []
+
+    def sender(name):
+        async def send():
+            order.append(name)
+        return send
+
+    @limited
+    async def scenario(limiter):
+        limiter.global_bucket.tokens = 0
+        await asyncio.gather(
+            call(limiter, sender('message'), endpoint='sendMessage', chat_id=1),
+            call(limiter, sender('urgent photo'), endpoint='sendPhoto', chat_id=2,
+                 rate_limit_args={'priority': rate_limiter.PRIORITY_INTERACTIVE}),
+        )
+
+    asyncio.run(scenario(limiter))
+    assert order == ['urgent photo', 'message']
+
+
+def flaky(errors):
+    """Колбэк, который сначала выбрасывает ошибки из списка, потом отвечает 'ok'"""
+    calls = []
+
+    async def callback():
+        calls.append(None)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+
+    return callback, calls
+
+
+@pytest.mark.parametrize('error', [RetryAfter(0), NetworkError('connection reset')])
+def test_retryable_errors_are_retried(error, no_retry_pause):
+    limiter = PriorityRateLimiter(global_rate=100, per_chat_rate=100, chat_burst=100, max_retries=2)
+    callback, calls = flaky([error, error])
+
+    assert asyncio.run(limited(lambda limiter: call(limiter, callback))(limiter)) == 'ok'
+    assert len(calls) == 3
+    assert limiter.retries == 2
+    assert limiter.flood_waits == (2 if isinstance(error, RetryAfter) else 0)
+
+
+def test_retries_stop_after_max_retries(no_retry_pause):
+    limiter = PriorityRateLimiter(global_rate=100, per_chat_rate=100, chat_burst=100, max_retries=1)
+    callback, calls = flaky([RetryAfter(0)] * 3)
+
+    with pytest.raises(RetryAfter):
+        asyncio.run(limited(lambda limiter: call(limiter, callback))(limiter))
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize('error', [BadRequest('message is not modified'), TimedOut()])
+def test_request_errors_and_timeouts_are_not_retried(error, no_retry_pause):
+    limiter = PriorityRateLimiter(global_rate=100, per_chat_rate=100, chat_burst=100, max_retries=3)
+    callback, calls = flaky([error])
+
+    with pytest.raises(type(error)):
+        asyncio.run(limited(lambda limiter: call(limiter, callback))(limiter))
+    assert len(calls) == 1
+    assert limiter.retries == 0
+
+
+def test_retry_after_pauses_all_sends(no_retry_pause):
+    limiter = PriorityRateLimiter(global_rate=100, per_chat_rate=100, chat_burst=100, max_retries=1)
+    callback, _ = flaky([RetryAfter(1)])
+
+    @limited
+    async def scenario(limiter):
+        await call(limiter, callback)
+        return limiter.paused_until - rate_limiter.time.monotonic()
+
+    # Пауза выставлена на retry_after и к моменту повтора уже истекла
+    assert -0.5 < asyncio.run(scenario(limiter)) <= 0
@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from config import TEST_QUESTIONS, SCORING_KEYS, THRESHOLDS, TOTAL_SCORE_THRESHOLDS, AVERAGE_SCORE_THRESHOLDS
+from scoring import LEVEL_NAMES, PHASE_NAMES, ScoreResult, rescore_results, score_batch, score_session
+from sessions import PHASE_OFFSETS, PHASE_SIZES, TOTAL_QUESTIONS, TestSession as Session
+
+
+def level_by(value, thresholds: dict) -> str:
+    if value <= thresholds["low"]:
+        return "low"
+    if value <= thresholds["medium"]:
+        return "medium"
+    return "high"
+
+
+def reference_result(answers: int, answered: int) -> dict:
+    """Подсчет результатов по фазам циклом, как в show_results до пакетного подсчета"""
+    phase_scores = {}
+    phase_levels = {}
+    total_score = 0
+    completed_phases = 0
+    for phase_index, phase_data in enumerate(TEST_QUESTIONS):
+        phase_name = phase_data["phase"]
+        offset = PHASE_OFFSETS[phase_index]
+        phase_answers = {question_index: (answers >> (offset + question_index)) & 1
+                         for question_index in range(len(phase_data["questions"]))
+                         if (answered >> (offset + question_index)) & 1}
+        if len(phase_answers) != len(phase_data["questions"]):
+            continue
+        completed_phases += 1
+        score = sum(1 for question_index, answer in phase_answers.items()
+                    if answer == SCORING_KEYS[phase_name][question_index])
+        phase_scores[phase_name] = score
+        total_score += score
+        if score <= THRESHOLDS[phase_name]["medium"]:
+            phase_levels[phase_name] = "low"
+        elif score <= THRESHOLDS[phase_name]["high"]:
+            phase_levels[phase_name] = "medium"
+        else:
+            phase_levels[phase_name] = "high"
+
+    total_level = level_by(total_score, TOTAL_SCORE_THRESHOLDS)
+    if completed_phases == len(TEST_QUESTIONS):
+        level = total_level
+    else:
+        average = total_score / completed_phases if completed_phases > 0 else 0
+        level = level_by(average, AVERAGE_SCORE_THRESHOLDS)
+    return {
+        'phase_scores': phase_scores,
+        'phase_levels': phase_levels,
+        'total_score': total_score,
+        'completed_phases': completed_phases,
+        'total_level': total_level,
+        'level': level,
+    }
+
+
+def as_dict(result: ScoreResult) -> dict:
+    return {name: getattr(result, name) for name in
+            ('phase_scores', 'phase_levels', 'total_score', 'completed_phases', 'total_level', 'level')}
+
+
+def random_masks(rng: random.Random) -> tuple:
+    answered = 0
+    for offset, size in zip(PHASE_OFFSETS, PHASE_SIZES):
+        # Фаза пройдена полностью, частично или не начата
+        kind = rng.randrange(3)
+        if kind == 0:
+            answered |= ((1 << size) - 1) << offset
+        elif kind == 1:
+            answered |= (rng.getrandbits(size) & ((1 << size) - 2)) << offset
+    return rng.getrandbits(TOTAL_QUESTIONS), answered
+
+
+def test_batch_matches_reference_on_random_sessions():
+    rng = random.Random(20240601)
+    masks = [random_masks(rng) for _ in range(3000)]
+    batch = score_batch([answers for answers, _ in masks], [answered for _, answered in masks])
+    assert len(batch) == len(masks)
+    for row, (answers, answered) in enumerate(masks):
+        assert as_dict(ScoreResult(batch, row)) == reference_result(answers, answered)
+
+
+@pytest.mark.parametrize('phase_index', range(len(PHASE_NAMES)))
+def test_every_phase_score_matches_reference(phase_index):
+    offset = PHASE_OFFSETS[phase_index]
+    size = PHASE_SIZES[phase_index]
+    answered = ((1 << size) - 1) << offset
+    for bits in range(1 << size):
+        answers = bits << offset
+        session = Session(answers=answers, answered=answered, full_test=False)
+        assert as_dict(score_session(session)) == reference_result(answers, answered)
+
+
+def test_full_test_extremes():
+    all_answered = (1 << TOTAL_QUESTIONS) - 1
+    key_answers = sum(1 << (PHASE_OFFSETS[index] + question)
+                      for index, name in enumerate(PHASE_NAMES)
+                      for question, key in enumerate(SCORING_KEYS[name]) if key)
+    best = score_session(Session(answers=key_answers, answered=all_answered))
+    worst = score_session(Session(answers=key_answers ^ all_answered, answered=all_answered))
+    assert best.is_full_test and best.total_score == sum(PHASE_SIZES)
+    assert worst.total_score == 0 and worst.level == 'low'
+
+
+def test_empty_session_and_empty_batch():
+    assert as_dict(score_session(Session())) == reference_result(0, 0)
+    assert len(score_batch([], [])) == 0
+
+
+def test_rescore_results_uses_answers_or_score():
+    all_answered = (1 << TOTAL_QUESTIONS) - 1
+    reference = reference_result(0, all_answered)
+    rescored = rescore_results([
+        {'level': 'старый', 'score': 3, 'answers': (0, all_answered)},
+        {'level': 'старый', 'score': 30},
+        {'level': 'старый', 'score': None},
+    ])
+    assert rescored == [
+        (LEVEL_NAMES[reference['level']], reference['total_score']),
+        (LEVEL_NAMES[level_by(30, TOTAL_SCORE_THRESHOLDS)], 30),
+        ('старый', None),
+    ]
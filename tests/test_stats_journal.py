@@ -0,0 +1,192 @@
+import json
+
+import pytest
+
+from stats_store import JournalStatsStore, read_journal
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'stats.json'), str(tmp_path / 'stats.journal')
+
+
+def open_store(paths) -> JournalStatsStore:
+    store = JournalStatsStore(*paths)
+    store.load()
+    return store
+
+
+def record(store: JournalStatsStore, user_id: int, score: int = 10, level: str = 'Средний Пиздец') -> None:
+    store.record_completion(user_id, level, score, {'username': f'user{user_id}'})
+
+
+def test_records_get_increasing_sequence(paths):
+    store = open_store(paths)
+    for user_id in (1, 2, 3):
+        record(store, user_id)
+    store.flush()
+
+    assert [entry['q'] for entry in read_journal(paths[1])] == [1, 2, 3]
+    assert store.seq == 3
+
+
+def test_reload_replays_journal_and_continues_sequence(paths):
+    store = open_store(paths)
+    record(store, 1, score=5)
+    record(store, 2, score=15)
+    store.flush()
+
+    reloaded = open_store(paths)
+    assert reloaded.seq == 2
+    assert reloaded.data['completed_tests'] == 2
+    assert reloaded.data['score_sum'] == 20
+
+    record(reloaded, 3)
+    reloaded.flush()
+    assert [entry['q'] for entry in read_journal(paths[1])] == [1, 2, 3]
+
+
+def test_replay_skips_records_already_in_snapshot(paths):
+    store = open_store(paths)
+    for user_id in (1, 2, 3):
+        record(store, user_id)
+    store.compact()
+    record(store, 4)
+    store.flush()
+
+    with open(paths[0], encoding='utf-8') as f:
+        assert json.load(f)['last_seq'] == 3
+
+    reloaded = open_store(paths)
+    assert reloaded.data['completed_tests'] == 4
+    assert reloaded.data['total_users'] == 4
+    assert reloaded.seq == 4
+
+
+def test_repeated_user_counts_every_completion(paths):
+    store = open_store(paths)
+    record(store, 1, score=10, level='Средний Пиздец')
+    record(store, 1, score=25, level='Большой Пиздец')
+    store.flush()
+
+    reloaded = open_store(paths)
+    assert reloaded.data['completed_tests'] == 2
+    assert reloaded.data['total_users'] == 1
+    assert dict(reloaded.data['test_results']) == {'Средний Пиздец': 1, 'Большой Пиздец': 1}
+    assert reloaded.data['users']['1']['test_result']['score'] == 25
+
+
+def test_truncated_last_line_is_skipped(paths):
+    store = open_store(paths)
+    record(store, 1)
+    store.flush()
+    with open(paths[1], 'a', encoding='utf-8') as f:
+        f.write('{"q":2,"t":"2026-')
+
+    reloaded = open_store(paths)
+    assert reloaded.data['completed_tests'] == 1
+    assert reloaded.seq == 1
+
+
+def test_failed_load_keeps_sequence_after_stored_records(paths):
+    store = open_store(paths)
+    for user_id in (1, 2):
+        record(store, user_id)
+    store.compact()
+    record(store, 3)
+    store.flush()
+    # Запись, на которой проигрывание журнала падает
+    with open(paths[1], 'a', encoding='utf-8') as f:
+        f.write('{"q":"broken"}\n')
+
+    failed = open_store(paths)
+    assert failed.seq == 3
+    record(failed, 4)
+    failed.flush()
+
+    # После исправления журнала новая запись не теряется при проигрывании
+    with open(paths[1], encoding='utf-8') as f:
+        lines = [line for line in f if 'broken' not in line]
+    with open(paths[1], 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    reloaded = open_store(paths)
+    assert reloaded.data['completed_tests'] == 4
+    assert '4' in reloaded.data['users']
+
+
+def test_unreadable_snapshot_disables_writes(paths):
+    store = open_store(paths)
+    record(store, 1)
+    store.compact()
+    with open(paths[0], 'w', encoding='utf-8') as f:
+        f.write('{broken')
+
+    failed = open_store(paths)
+    assert failed.seq is None
+    record(failed, 2)
+    assert failed.flush() == 0
+
+
+def test_legacy_snapshot_average_uses_latest_results_only(paths):
+    legacy = {
+        'total_users': 2,
+        'completed_tests': 5,
+        'test_results': {'Средний Пиздец': 5},
+        'users': {
+            '1': {'test_date': '2024-01-01T10:00:00', 'test_result': {'level': 'Средний Пиздец', 'score': 10}},
+            '2': {'test_date': '2024-01-02T10:00:00', 'test_result': {'level': 'Средний Пиздец', 'score': 20}},
+        }
+    }
+    with open(paths[0], 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    store = open_store(paths)
+    assert store.data['completed_tests'] == 5
+    assert (store.data['score_sum'], store.data['score_count']) == (30, 2)
+    record(store, 3, score=30)
+    assert (store.data['score_sum'], store.data['score_count']) == (60, 3)
+
+
+def fixed_rescorer(level: str, score: int):
+    def rescorer(results):
+        return [(level, score) for _ in results]
+    return rescorer
+
+
+def test_rescore_changes_latest_results_and_keeps_counters(paths):
+    store = open_store(paths)
+    record(store, 1, score=10, level='Средний Пиздец')
+    record(store, 1, score=12, level='Средний Пиздец')
+    record(store, 2, score=5, level='Маленький Пиздец')
+    store.flush()
+    counters = (store.data['completed_tests'], dict(store.data['test_results']),
+                store.data['score_sum'], store.data['score_count'])
+
+    changes = store.rescore(fixed_rescorer('Большой Пиздец', 25))
+    assert changes == {('Средний Пиздец', 'Большой Пиздец'): 1, ('Маленький Пиздец', 'Большой Пиздец'): 1}
+    assert store.data['users']['1']['test_result'] == {'level': 'Большой Пиздец', 'score': 25}
+
+    reloaded = open_store(paths)
+    assert reloaded.data['users'] == store.data['users']
+    assert (reloaded.data['completed_tests'], dict(reloaded.data['test_results']),
+            reloaded.data['score_sum'], reloaded.data['score_count']) == counters
+    assert sum(reloaded.data['test_results'].values()) == reloaded.data['completed_tests']
+
+
+def test_answers_stay_in_journal_and_feed_rescore(paths):
+    store = open_store(paths)
+    store.record_completion(1, 'Средний Пиздец', 10, {}, answers=(5, 7))
+    store.flush()
+    assert [entry['a'] for entry in read_journal(paths[1])] == [[5, 7]]
+    assert 'answers' not in store.data['users']['1']['test_result']
+
+    seen = []
+
+    def rescorer(results):
+        seen.extend(result.get('answers') for result in results)
+        return [(result['level'], result['score']) for result in results]
+
+    assert store.rescore(rescorer) == {}
+    assert seen == [[5, 7]]
+    with open(paths[0], encoding='utf-8') as f:
+        assert 'answers' not in json.load(f)['users']['1']['test_result']
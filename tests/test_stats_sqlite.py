@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from scoring import LEVEL_NAMES, rescore_results
+from sessions import TOTAL_QUESTIONS
+from stats_store import JournalStatsStore, SQLiteStatsStore
+
+MEDIUM = LEVEL_NAMES['medium']
+HIGH = LEVEL_NAMES['high']
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStatsStore(str(tmp_path / 'stats.db'))
+    store.load()
+    yield store
+    store.conn.close()
+
+
+def summary(store) -> dict:
+    return asyncio.run(store.summary())
+
+
+def test_counters_follow_completions(store):
+    store.record_completion(1, MEDIUM, 18, {'username': 'one'})
+    store.record_completion(2, HIGH, 25, {'username': 'two'})
+    store.record_completion(1, HIGH, 22, {'username': 'one'})
+    assert store.flush() == 3
+
+    totals = summary(store)
+    assert totals['total_users'] == 2
+    assert totals['completed_tests'] == 3
+    assert totals['test_results'] == {MEDIUM: 1, HIGH: 2}
+    assert (totals['score_sum'], totals['score_count']) == (65, 3)
+    assert totals['windows']['24h'] == 3
+
+    user = asyncio.run(store.get_user(1))
+    assert (user['test_result']['level'], user['test_result']['score']) == (HIGH, 22)
+    recent = asyncio.run(store.recent_users(10))
+    assert [user_id for user_id, _ in recent] == ['1', '2', '1']
+
+
+def test_counters_survive_reopen(store):
+    store.record_completion(1, MEDIUM, 18)
+    store.compact()
+
+    reopened = SQLiteStatsStore(store.db_path)
+    reopened.load()
+    try:
+        assert summary(reopened)['completed_tests'] == 1
+        assert summary(reopened)['score_count'] == 1
+    finally:
+        reopened.conn.close()
+
+
+def test_import_matches_journal_summary(tmp_path, store):
+    journal = JournalStatsStore(str(tmp_path / 'stats.json'), str(tmp_path / 'stats.journal'))
+    journal.load()
+    for user_id, (level, score) in enumerate([(MEDIUM, 17), (HIGH, 24), (MEDIUM, 19)]):
+        journal.record_completion(user_id, level, score)
+
+    store.import_stats(journal.data)
+    imported = summary(store)
+    expected = asyncio.run(journal.summary())
+    for name in ('total_users', 'completed_tests', 'test_results', 'score_sum', 'score_count'):
+        assert imported[name] == expected[name]
+
+
+def test_rescore_shifts_level_counts_and_score_sum(store):
+    store.record_completion(1, MEDIUM, 18)
+    store.record_completion(2, MEDIUM, 19)
+    store.record_completion(3, HIGH, 25)
+    store.flush()
+
+    def promote(results):
+        return [(HIGH, result['score'] + 1) if result['level'] == MEDIUM else (result['level'], result['score'])
+                for result in results]
+
+    changes = store.rescore(promote, dry_run=True)
+    assert changes == {(MEDIUM, HIGH): 2}
+    assert summary(store)['test_results'] == {MEDIUM: 2, HIGH: 1}
+
+    assert store.rescore(promote) == {(MEDIUM, HIGH): 2}
+    totals = summary(store)
+    assert totals['test_results'] == {HIGH: 3}
+    assert (totals['score_sum'], totals['score_count']) == (64, 3)
+    assert asyncio.run(store.get_user(1))['test_result'] == {'level': HIGH, 'score': 19}
+    assert store.rescore(promote) == {}
+
+
+def test_rescore_uses_stored_answers(store):
+    all_answered = (1 << TOTAL_QUESTIONS) - 1
+    # Сохранен устаревший уровень: по ответам он пересчитывается заново
+    store.record_completion(1, 'старый уровень', 0, answers=(0, all_answered))
+    store.flush()
+
+    expected_level, expected_score = rescore_results([{'answers': (0, all_answered)}])[0]
+    store.rescore(rescore_results)
+    user = asyncio.run(store.get_user(1))
+    assert user['test_result'] == {'level': expected_level, 'score': expected_score}
+    assert summary(store)['score_sum'] == expected_score
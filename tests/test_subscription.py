@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+from subscription import SubscriptionChecker
+
+
+class FakeBot:
+    def __init__(self, status='member'):
+        self.status = status
+        self.calls = []
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls.append(user_id)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(status=self.status)
+
+
+def test_cache_is_bounded_and_evicts_least_recently_checked():
+    checker = SubscriptionChecker('channel', positive_ttl=600, negative_ttl=60, max_size=3)
+    bot = FakeBot()
+
+    async def scenario():
+        for user_id in (1, 2, 3):
+            await checker.is_subscribed(bot, user_id)
+        # Пользователь 1 проверен снова и стал самым свежим; вытеснится 2
+        await checker.is_subscribed(bot, 1)
+        await checker.is_subscribed(bot, 4)
+
+    asyncio.run(scenario())
+    assert list(checker.cache) == [3, 1, 4]
+    assert (checker.hits, checker.misses) == (1, 4)
+
+
+def test_concurrent_checks_share_one_request():
+    checker = SubscriptionChecker('channel', positive_ttl=600, negative_ttl=60)
+    bot = FakeBot(status='left')
+
+    async def scenario():
+        return await asyncio.gather(*(checker.is_subscribed(bot, 7) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [False] * 5
+    assert bot.calls == [7]
+    assert (checker.hits, checker.misses, checker.coalesced) == (0, 1, 4)
@@ -0,0 +1,115 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import update_processor
+from update_processor import PerUserUpdateProcessor
+
+
+def make_update(user_id: int):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+
+
+def run_updates(processor: PerUserUpdateProcessor, updates, handler):
+    async def scenario():
+        tasks = []
+        for update in updates:
+            tasks.append(asyncio.create_task(processor.process_update(update, handler(update))))
+            # Обновления приходят по одному, как из очереди Application
+            await asyncio.sleep(0)
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+def test_updates_of_one_user_run_in_order_without_overlap():
+    processor = PerUserUpdateProcessor(8)
+    rng = random.Random(7)
+    updates = [make_update(user_id) for _ in range(20) for user_id in (1, 2, 3)]
+    for number, update in enumerate(updates):
+        update.number = number
+    seen = {1: [], 2: [], 3: []}
+    running = {1: 0, 2: 0, 3: 0}
+    overlaps = []
+
+    async def handle(update):
+        user_id = update.effective_user.id
+        running[user_id] += 1
+        if running[user_id] > 1:
+            overlaps.append(update.number)
+        await asyncio.sleep(rng.uniform(0, 0.002))
+        seen[user_id].append(update.number)
+        running[user_id] -= 1
+
+    run_updates(processor, updates, handle)
+    assert overlaps == []
+    for user_id, numbers in seen.items():
+        assert numbers == sorted(numbers) and len(numbers) == 20
+    assert processor.user_locks == {}
+    assert processor.processed == len(updates)
+
+
+def test_different_users_run_concurrently_up_to_limit():
+    processor = PerUserUpdateProcessor(4)
+
+    async def handle(update):
+        await asyncio.sleep(0.01)
+
+    run_updates(processor, [make_update(user_id) for user_id in range(12)], handle)
+    assert processor.peak_in_flight == 4
+    assert processor.in_flight == 0 and processor.pending == 0
+
+
+def test_failed_update_does_not_block_user_queue():
+    processor = PerUserUpdateProcessor(2)
+    handled = []
+
+    async def handle(update):
+        if update.number == 0:
+            raise RuntimeError("ошибка обработчика")
+        handled.append(update.number)
+
+    updates = [make_update(5) for _ in range(3)]
+    for number, update in enumerate(updates):
+        update.number = number
+    results = run_updates(processor, updates, handle)
+    assert isinstance(results[0], RuntimeError)
+    assert handled == [1, 2]
+    assert processor.user_locks == {}
+
+
+def test_updates_without_user_are_not_serialized():
+    processor = PerUserUpdateProcessor(4)
+    update = SimpleNamespace(effective_user=None, effective_chat=None)
+
+    async def handle(_):
+        await asyncio.sleep(0.01)
+
+    run_updates(processor, [update] * 4, handle)
+    assert processor.peak_in_flight == 4
+
+
+def test_fast_tapping_user_does_not_take_all_admission_slots():
+    processor = PerUserUpdateProcessor(2)
+    handled = []
+
+    async def handle(update):
+        await asyncio.sleep(0.01)
+        handled.append(update.effective_user.id)
+
+    # Один пользователь нажимает кнопки намного быстрее, чем они обрабатываются
+    taps = [make_update(1) for _ in range(30)]
+    for tap in taps:
+        tap.callback_query = object()
+    other = make_update(2)
+
+    async def scenario():
+        tasks = [asyncio.create_task(processor.process_update(tap, handle(tap))) for tap in taps]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(processor.process_update(other, handle(other)), 0.05)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert handled.count(1) == update_processor.USER_CALLBACK_LIMIT
+    assert processor.dropped == 30 - update_processor.USER_CALLBACK_LIMIT
+    assert 2 in handled
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger('burncheckbot.update_processor')
+
+# Во сколько раз число принятых в обработку обновлений может превышать число
+# одновременно выполняемых: остальные ждут очереди своего пользователя
+ADMITTED_FACTOR = 4
+
+# Сколько нажатий кнопок одного пользователя может быть принято в обработку;
+# лишние отбрасываются, чтобы один пользователь не занял все места в очереди
+USER_CALLBACK_LIMIT = 4
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений с сохранением порядка для каждого пользователя
+
+    Обновления разных пользователей обрабатываются одновременно, но не больше
+    max_concurrent_updates сразу. Обновления одного пользователя выполняются
+    строго по очереди в порядке поступления: два быстрых нажатия не могут
+    одновременно менять его сессию. Пока обновление ждет очереди своего
+    пользователя, оно не занимает слот выполнения. Нажатия кнопок сверх
+    USER_CALLBACK_LIMIT у одного пользователя отбрасываются.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates * ADMITTED_FACTOR)
+        self.concurrency_limit = max_concurrent_updates
+        self.running_slots = asyncio.Semaphore(max_concurrent_updates)
+        self.user_locks = {}  # user_id -> [блокировка, число ожидающих и выполняемых обновлений]
+        self.pending = 0  # Приняты в обработку и ждут своей очереди
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.processed = 0
+        self.dropped = 0
+
+    @staticmethod
+    def _user_key(update):
+        user = getattr(update, 'effective_user', None)
+        if user is not None:
+            return user.id
+        chat = getattr(update, 'effective_chat', None)
+        return chat.id if chat is not None else None
+
+    def _user_lock(self, user_key):
+        entry = self.user_locks.get(user_key)
+        if entry is None:
+            entry = self.user_locks[user_key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_user(self, user_key) -> None:
+        entry = self.user_locks[user_key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.user_locks[user_key]
+
+    async def do_process_update(self, update, coroutine) -> None:
+        user_key = self._user_key(update)
+        entry = self.user_locks.get(user_key)
+        if (entry is not None and entry[1] >= USER_CALLBACK_LIMIT
+                and getattr(update, 'callback_query', None) is not None):
+            # Пользователь нажимает быстрее, чем обрабатываются его нажатия
+            self.dropped += 1
+            logger.debug(f"Отброшено нажатие пользователя {user_key}: в очереди уже {entry[1]}")
+            coroutine.close()
+            return
+        lock = self._user_lock(user_key) if user_key is not None else None
+
+        # Сначала очередь пользователя, затем свободный слот выполнения
+        self.pending += 1
+        try:
+            if lock is not None:
+                await lock.acquire()
+            try:
+                await self.running_slots.acquire()
+            except BaseException:
+                if lock is not None:
+                    lock.release()
+                raise
+        except BaseException:
+            self.pending -= 1
+            if lock is not None:
+                self._release_user(user_key)
+            coroutine.close()
+            raise
+        self.pending -= 1
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await coroutine
+        finally:
+            self.in_flight -= 1
+            self.processed += 1
+            self.running_slots.release()
+            if lock is not None:
+                lock.release()
+                self._release_user(user_key)
+
+    async def initialize(self) -> None:
+        logger.info(f"Параллельная обработка обновлений: до {self.concurrency_limit} одновременно")
+
+    async def shutdown(self) -> None:
+        pass
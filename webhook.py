@@ -0,0 +1,103 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+
+from telegram import Update
+
+from http_server import HttpResponse, HttpServer
+
+logger = logging.getLogger('burncheckbot.webhook')
+
+SECRET_TOKEN_HEADER = 'x-telegram-bot-api-secret-token'
+
+
+class WebhookServer:
+    """Прием обновлений от Telegram по вебхуку
+
+    Проверяет секретный токен из заголовка X-Telegram-Bot-Api-Secret-Token,
+    разбирает JSON обновления и ставит его в очередь Application. Ответ
+    отправляется сразу, обработка идет в обычном порядке. GET /healthz
+    отвечает 200 для проверок балансировщика.
+    """
+
+    def __init__(self, application, path: str, secret_token: str):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.received = 0
+        self.rejected = 0
+
+    async def handle(self, request) -> HttpResponse:
+        if request.path == '/healthz':
+            return HttpResponse(200, b'ok')
+        if request.path != self.path:
+            return HttpResponse(404, b'Not Found')
+        if request.method != 'POST':
+            return HttpResponse(405, b'Method Not Allowed')
+
+        if self.secret_token:
+            token = request.headers.get(SECRET_TOKEN_HEADER, '')
+            if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+                self.rejected += 1
+                logger.warning("Отклонен запрос вебхука с неверным секретным токеном")
+                return HttpResponse(403, b'Forbidden')
+
+        try:
+            update = Update.de_json(json.loads(request.body), self.application.bot)
+        except Exception as e:
+            self.rejected += 1
+            logger.warning(f"Не удалось разобрать обновление вебхука: {e}")
+            return HttpResponse(400, b'Bad Request')
+
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return HttpResponse(200, b'ok')
+
+
+async def run_webhook(application, listen: str, port: int, path: str, url: str, secret_token: str,
+                      max_connections: int) -> None:
+    """Запуск бота в режиме вебхука до сигнала остановки
+
+    Повторяет жизненный цикл run_polling: initialize, post_init, start и
+    остановку с post_shutdown. Если задан url, вебхук регистрируется в
+    Telegram без сброса накопившихся обновлений.
+    """
+    webhook = WebhookServer(application, path, secret_token)
+    server = HttpServer(listen, port, webhook.handle, max_connections, name='Webhook')
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    if not secret_token:
+        logger.warning("WEBHOOK_SECRET_TOKEN не задан: запросы к вебхуку не проверяются")
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await server.start()
+        if url:
+            await application.bot.set_webhook(
+                url=f"{url.rstrip('/')}{path}",
+                secret_token=secret_token or None,
+                # Telegram допускает от 1 до 100 одновременных соединений
+                max_connections=min(max_connections, 100),
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Вебхук зарегистрирован: {url.rstrip('/')}{path}")
+        await application.start()
+        logger.info("Бот работает в режиме вебхука")
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,210 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import signal
+import sys
+
+from telegram import Bot, Update
+
+from http_server import HttpClient, HttpResponse, HttpServer
+from webhook import SECRET_TOKEN_HEADER
+
+logger = logging.getLogger('burncheckbot.workers')
+
+# Пауза перед перезапуском упавшего процесса и интервал проверки процессов (секунды)
+RESTART_DELAY = 5
+MONITOR_INTERVAL = 1
+# Время на штатную остановку процесса до SIGKILL (секунды)
+STOP_TIMEOUT = 20
+
+
+def update_user_id(update: dict):
+    """Ключ маршрутизации обновления: id пользователя, иначе id чата, иначе update_id
+
+    Разбирается только верхний уровень JSON: первое вложенное
+    сообщение или событие с полем from (или chat).
+    """
+    for key, value in update.items():
+        if isinstance(value, dict):
+            sender = value.get('from') or value.get('user')
+            if isinstance(sender, dict) and 'id' in sender:
+                return sender['id']
+            chat = value.get('chat')
+            if isinstance(chat, dict) and 'id' in chat:
+                return chat['id']
+    return update.get('update_id', 0)
+
+
+class WebhookRouter:
+    """Прием вебхука в главном процессе и пересылка обновления процессу пользователя
+
+    Все обновления одного пользователя попадают в процесс user_id % N:
+    его сессия теста и разговор живут в памяти одного процесса, а общая база
+    нужна только для восстановления после перезапуска.
+    """
+
+    def __init__(self, path: str, secret_token: str, worker_ports: list):
+        self.path = path
+        self.secret_token = secret_token
+        self.clients = [HttpClient('127.0.0.1', port) for port in worker_ports]
+        self.forwarded = [0] * len(worker_ports)
+        self.failed = 0
+        self.rejected = 0
+
+    def worker_for(self, user_id: int) -> int:
+        return user_id % len(self.clients)
+
+    async def handle(self, request) -> HttpResponse:
+        if request.path == '/healthz':
+            return HttpResponse(200, b'ok')
+        if request.path != self.path:
+            return HttpResponse(404, b'Not Found')
+        if request.method != 'POST':
+            return HttpResponse(405, b'Method Not Allowed')
+
+        if self.secret_token:
+            token = request.headers.get(SECRET_TOKEN_HEADER, '')
+            if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+                self.rejected += 1
+                logger.warning("Отклонен запрос вебхука с неверным секретным токеном")
+                return HttpResponse(403, b'Forbidden')
+
+        try:
+            update = json.loads(request.body)
+            index = self.worker_for(update_user_id(update))
+        except Exception as e:
+            self.rejected += 1
+            logger.warning(f"Не удалось разобрать обновление вебхука: {e}")
+            return HttpResponse(400, b'Bad Request')
+
+        headers = {'Content-Type': 'application/json'}
+        if self.secret_token:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = self.secret_token
+        # Одна повторная попытка: keep-alive соединение могло быть закрыто процессом
+        for attempt in range(2):
+            try:
+                response = await self.clients[index].request('POST', self.path, headers, request.body)
+                break
+            except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+                if attempt:
+                    self.failed += 1
+                    logger.error(f"Процесс {index} недоступен: {e}")
+                    # Telegram повторит доставку обновления позже
+                    return HttpResponse(502, b'Bad Gateway')
+        self.forwarded[index] += 1
+        return HttpResponse(response.status, response.body)
+
+    async def close(self) -> None:
+        for client in self.clients:
+            await client.close()
+
+
+class WorkerProcess:
+    """Процесс бота, обрабатывающий обновления своей части пользователей"""
+
+    def __init__(self, index: int, count: int, port: int, env: dict):
+        self.index = index
+        self.count = count
+        self.port = port
+        self.env = env
+        self.process = None
+        self.restarts = 0
+        self.restart_at = None  # Время перезапуска упавшего процесса по loop.time()
+
+    async def start(self) -> None:
+        env = dict(self.env)
+        env.update({
+            'BOT_WORKER_INDEX': str(self.index),
+            'BOT_RUN_MODE': 'webhook',
+            'WEBHOOK_LISTEN': '127.0.0.1',
+            'WEBHOOK_PORT': str(self.port),
+            # Вебхук в Telegram регистрирует главный процесс
+            'WEBHOOK_URL': '',
+        })
+        self.process = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(sys.argv[0]), env=env)
+        logger.info(f"Запущен процесс {self.index}/{self.count} (pid {self.process.pid}, порт {self.port})")
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def stop(self) -> None:
+        if not self.alive:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Процесс {self.index} не остановился за {STOP_TIMEOUT} с, завершаем принудительно")
+            self.process.kill()
+            await self.process.wait()
+
+
+async def run_master(token: str, workers: int, base_port: int, listen: str, port: int, path: str, url: str,
+                     secret_token: str, max_connections: int) -> None:
+    """Запуск workers процессов бота и маршрутизатора вебхука до сигнала остановки
+
+    Процессы слушают 127.0.0.1:base_port+i и получают только обновления своих
+    пользователей. Упавший процесс перезапускается через RESTART_DELAY секунд.
+    """
+    env = dict(os.environ)
+    worker_ports = [base_port + index for index in range(workers)]
+    processes = []
+    for index, worker_port in enumerate(worker_ports):
+        worker_env = dict(env)
+        # Кэш file_id пишется в файл целиком, поэтому у каждого процесса он свой
+        cache_path = env.get('FILE_ID_CACHE_PATH', 'file_id_cache.json')
+        root, ext = os.path.splitext(cache_path)
+        worker_env['FILE_ID_CACHE_PATH'] = f"{root}.{index}{ext}"
+        processes.append(WorkerProcess(index, workers, worker_port, worker_env))
+
+    router = WebhookRouter(path, secret_token, worker_ports)
+    server = HttpServer(listen, port, router.handle, max_connections, name='Router')
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    if not secret_token:
+        logger.warning("WEBHOOK_SECRET_TOKEN не задан: запросы к вебхуку не проверяются")
+
+    try:
+        for process in processes:
+            await process.start()
+        await server.start()
+        if url:
+            async with Bot(token) as bot:
+                await bot.set_webhook(
+                    url=f"{url.rstrip('/')}{path}",
+                    secret_token=secret_token or None,
+                    max_connections=min(max_connections, 100),
+                    allowed_updates=Update.ALL_TYPES
+                )
+            logger.info(f"Вебхук зарегистрирован: {url.rstrip('/')}{path}")
+        logger.info(f"Бот работает в {workers} процессах")
+
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), MONITOR_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            if stop_event.is_set():
+                break
+            for process in processes:
+                if process.restart_at is not None:
+                    if loop.time() >= process.restart_at:
+                        process.restart_at = None
+                        process.restarts += 1
+                        await process.start()
+                elif not process.alive:
+                    logger.error(f"Процесс {process.index} завершился с кодом {process.process.returncode}, "
+                                 f"перезапуск через {RESTART_DELAY} с")
+                    process.restart_at = loop.time() + RESTART_DELAY
+    finally:
+        await server.stop()
+        await router.close()
+        await asyncio.gather(*(process.stop() for process in processes))
+        logger.info("Все процессы бота остановлены")